@@ -0,0 +1,247 @@
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+# keys per "IN (...)" lookup, below SQLite's bound-parameter limit
+_SQLITE_BATCH = 500
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with LRU eviction and a per-entry time-to-live.
+    maxsize <= 0 disables the cache (every get is a miss, set is a no-op).
+    ttl None / <= 0 keeps entries until they are evicted.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+def _tag(value: Any) -> Any:
+    """JSON-ready copy of a cached value; tuples, dates and Decimals are tagged so they come back as such."""
+    if isinstance(value, dict):
+        return {str(k): _tag(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_tag(v) for v in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [_tag(v) for v in value]}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"__decimal__": str(value)}
+    return value
+
+
+def _untag(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        key, value = next(iter(obj.items()))
+        if key == "__tuple__":
+            return tuple(value)
+        if key == "__datetime__":
+            return datetime.fromisoformat(value)
+        if key == "__date__":
+            return date.fromisoformat(value)
+        if key == "__decimal__":
+            return Decimal(value)
+    return obj
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(_tag(value), ensure_ascii=False, separators=(",", ":"))
+
+
+def _loads(text: Any) -> Any:
+    return json.loads(text, object_hook=_untag)
+
+
+class SharedCache:
+    """
+    Cache shared by every process on the host (e.g. gunicorn workers): one SQLite table
+    in WAL mode holding JSON values (dicts, lists, tuples, str / numbers, dates, Decimals)
+    with a wall-clock expiry, so a value computed by one worker is served to the others.
+    Nothing read from the file is unpickled or executed; rows that do not decode are misses.
+    ttl None / <= 0 keeps entries until they are pruned; maxsize <= 0 means unbounded,
+    otherwise the oldest rows beyond maxsize are deleted every `prune_every` writes.
+    """
+
+    def __init__(self, path: str, table: str, ttl: Optional[float] = None, maxsize: int = 0, prune_every: int = 256):
+        if not table.isidentifier():
+            raise ValueError(f"invalid table name: {table!r}")
+        self.path = path
+        self.table = table
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.maxsize = maxsize
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # timeout: wait for another process's write lock instead of failing
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values of the keys that are cached and not expired (missing keys are left out)."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Any] = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _SQLITE_BATCH):
+                chunk = keys[i:i + _SQLITE_BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({','.join('?' * len(chunk))}) "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    (*chunk, now),
+                ).fetchall()
+                for key, value in rows:
+                    try:
+                        found[key] = _loads(value)
+                    except (ValueError, TypeError):
+                        # written by an older version (or not by this service): recomputed and replaced
+                        continue
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if not items:
+            return
+        ttl = ttl if ttl is not None else self.ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        rows = [(key, _dumps(value), expires_at, now) for key, value in items.items()]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            before = self._writes
+            self._writes += len(rows)
+            prune = self._writes // self.prune_every != before // self.prune_every
+        if prune:
+            self.prune()
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Drop every entry, for all processes sharing the file."""
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table}")
+
+    def prune(self) -> None:
+        """Delete expired rows and the oldest rows beyond maxsize."""
+        with self._lock:
+            self._db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+            if self.maxsize > 0:
+                self._db.execute(
+                    f"""
+                    DELETE FROM {self.table} WHERE key IN (
+                        SELECT key FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.maxsize,),
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._db.execute(f"SELECT count(*) FROM {self.table}").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "size": size,
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
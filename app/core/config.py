@@ -1,4 +1,6 @@
 import os, json
+from pathlib import Path
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,21 +26,185 @@ def parse_dataset_ids(raw: str) -> list[str]:
     return [x.strip().strip('"').strip("'") for x in raw.split(",") if x.strip()]
 
 
+class ConfigError(ValueError):
+    """An environment variable is set to a value of the wrong type or out of range."""
+
+
+def _env(name: str) -> Optional[str]:
+    # unset and empty ("TOP_K=") both mean "use the default"
+    raw = os.getenv(name)
+    return raw.strip() if raw and raw.strip() else None
+
+
+def _check_range(name: str, value, minimum=None, maximum=None):
+    if (minimum is not None and value < minimum) or (maximum is not None and value > maximum):
+        bounds = f"[{'-inf' if minimum is None else minimum}, {'inf' if maximum is None else maximum}]"
+        raise ConfigError(f"{name}={value} is outside {bounds}")
+    return value
+
+
+def env_int(name: str, default: int, minimum: int = None, maximum: int = None) -> int:
+    raw = _env(name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ConfigError(f"{name}={raw!r} is not an integer") from None
+    return _check_range(name, value, minimum, maximum)
+
+
+def env_float(name: str, default: float, minimum: float = None, maximum: float = None) -> float:
+    raw = _env(name)
+    if raw is None:
+        return float(default)
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ConfigError(f"{name}={raw!r} is not a number") from None
+    return _check_range(name, value, minimum, maximum)
+
+
+def env_bool(name: str, default: bool) -> bool:
+    raw = _env(name)
+    if raw is None:
+        return default
+    if raw.lower() in ("1", "true", "yes", "on"):
+        return True
+    if raw.lower() in ("0", "false", "no", "off"):
+        return False
+    raise ConfigError(f"{name}={raw!r} is not a boolean (true / false)")
+
+
+def env_choice(name: str, default: str, choices: Tuple[str, ...]) -> str:
+    raw = _env(name)
+    if raw is None:
+        return default
+    if raw.lower() not in choices:
+        raise ConfigError(f"{name}={raw!r} must be one of: {', '.join(choices)}")
+    return raw.lower()
+
+
 MODEL_URL = os.getenv("MODEL_URL")
 MODEL_NAME = os.getenv("MODEL_NAME")
-MODEL_TEMPERATURE = float(os.getenv("MODEL_TEMPERATURE"))
+MODEL_TEMPERATURE = env_float("MODEL_TEMPERATURE", 0.0, minimum=0.0, maximum=2.0)
 MODEL_API_KEY = os.getenv("MODEL_API_KEY")
+# items per batched selection call (1 = one chat completion per item) and how long to wait for a batch to fill
+LLM_BATCH_SIZE = env_int("LLM_BATCH_SIZE", 1, minimum=1)
+LLM_BATCH_WAIT_MS = env_float("LLM_BATCH_WAIT_MS", 25)
 
 RAGFLOW_URL = os.getenv("RAGFLOW_URL")
 RAGFLOW_API_KEY = os.getenv("RAGFLOW_API_KEY")
 RAGFLOW_ITEM_NAME_IDS = parse_dataset_ids(os.getenv("RAGFLOW_ITEM_NAME_IDS", ""))
+# retrieval HTTP client: connect / read timeouts, per-attempt retrieve budget (capped to fit ITEM_TIMEOUT
+# below), max concurrent retrievals
+RAGFLOW_CONNECT_TIMEOUT = env_float("RAGFLOW_CONNECT_TIMEOUT", 5)
+RAGFLOW_READ_TIMEOUT = env_float("RAGFLOW_READ_TIMEOUT", 45)
+RAGFLOW_TIMEOUT = env_float("RAGFLOW_TIMEOUT", 45)
+RAGFLOW_MAX_IN_FLIGHT = env_int("RAGFLOW_MAX_IN_FLIGHT", 16)
+# resilience: RAGFLOW_TIMEOUT / LLM_TIMEOUT are upper bounds, the effective timeout follows
+# TIMEOUT_PERCENTILE of recent latencies x TIMEOUT_MULTIPLIER (not below the *_MIN_TIMEOUT)
+RAGFLOW_MIN_TIMEOUT = env_float("RAGFLOW_MIN_TIMEOUT", 2)
+LLM_TIMEOUT = env_float("LLM_TIMEOUT", 60)
+LLM_MIN_TIMEOUT = env_float("LLM_MIN_TIMEOUT", 5)
+TIMEOUT_PERCENTILE = env_float("TIMEOUT_PERCENTILE", 0.99, minimum=0.0, maximum=1.0)
+TIMEOUT_MULTIPLIER = env_float("TIMEOUT_MULTIPLIER", 3)
+# retrieve retries (jittered exponential backoff) and hedging: a second retrieve is sent when the
+# first is slower than this latency percentile (0 disables hedging)
+RAGFLOW_RETRIES = env_int("RAGFLOW_RETRIES", 2)
+RETRY_BACKOFF = env_float("RETRY_BACKOFF", 0.2)
+RAGFLOW_HEDGE_PERCENTILE = env_float("RAGFLOW_HEDGE_PERCENTILE", 0.95, minimum=0.0, maximum=1.0)
+# circuit breaker per backend: open after N consecutive failures, probe again after the reset timeout (0 disables)
+BREAKER_FAILURE_THRESHOLD = env_int("BREAKER_FAILURE_THRESHOLD", 5)
+BREAKER_RESET_TIMEOUT = env_float("BREAKER_RESET_TIMEOUT", 30)
+# candidates while RagFlow is unavailable: "local" (in-process catalog retriever) | "none"
+RETRIEVAL_FALLBACK = env_choice("RETRIEVAL_FALLBACK", "local", ("local", "none"))
+# candidate retrieval backend: "ragflow" (HTTP retrieval API) | "local" (in-process TF-IDF over the catalog)
+RETRIEVAL_BACKEND = env_choice("RETRIEVAL_BACKEND", "ragflow", ("ragflow", "local"))
+
+# input item name -> selected categorylv5 (memory LRU + optional SQLite file, size 0 disables)
+RESOLUTION_CACHE_SIZE = env_int("RESOLUTION_CACHE_SIZE", 2048)
+RESOLUTION_CACHE_TTL = env_float("RESOLUTION_CACHE_TTL", 7 * 24 * 3600)
+# workers pointed at the same file share resolutions (gunicorn.conf.py sets one by default)
+RESOLUTION_CACHE_PATH = os.getenv("RESOLUTION_CACHE_PATH", "")
+# (item, candidate list, prompt, model) -> LLM selection, reused whenever retrieval returns the
+# same candidates again (memory LRU + optional SQLite file, size 0 disables)
+SELECTION_CACHE_SIZE = env_int("SELECTION_CACHE_SIZE", 4096)
+SELECTION_CACHE_PATH = os.getenv("SELECTION_CACHE_PATH", "")
 
-TOP_K = int(os.getenv("TOP_K"))
-CONCURRENCY = int(os.getenv("CONCURRENCY"))
+# local categorylv5 index used to resolve exact / near-exact inputs without RagFlow + LLM
+# CATALOG_SOURCE: "csv" | "db" | "none"
+CATALOG_SOURCE = env_choice("CATALOG_SOURCE", "csv", ("csv", "db", "none"))
+CATALOG_CSV_PATH = os.getenv(
+    "CATALOG_CSV_PATH",
+    str(Path(__file__).resolve().parents[2] / "pre_data" / "unique_item_demand_forecast.csv"),
+)
+# reload the catalog every N seconds in long-lived processes (new names reach pre-matching and
+# the local retriever without a restart); 0 disables
+CATALOG_RELOAD_INTERVAL = env_float("CATALOG_RELOAD_INTERVAL", 600)
+# fuzzy matches need this edit-distance ratio and lead over the runner-up (score > 1 disables fuzzy)
+PREMATCH_MIN_SCORE = env_float("PREMATCH_MIN_SCORE", 0.9)
+PREMATCH_MIN_MARGIN = env_float("PREMATCH_MIN_MARGIN", 0.05)
+
+# pre-LLM candidate pruning: minimum retrieval similarity, parsed fields shown besides the name
+# (comma separated, empty = name only), token budget of the candidate list, and the similarity at
+# which a single remaining candidate is taken without an LLM call (> 1 disables the shortcut)
+CANDIDATE_MIN_SIMILARITY = env_float("CANDIDATE_MIN_SIMILARITY", 0.2)
+CANDIDATE_FIELDS = [f.strip() for f in os.getenv("CANDIDATE_FIELDS", "").split(",") if f.strip()]
+CANDIDATE_TOKEN_BUDGET = env_int("CANDIDATE_TOKEN_BUDGET", 1024)
+CANDIDATE_SHORTCUT_SIMILARITY = env_float("CANDIDATE_SHORTCUT_SIMILARITY", 0.9)
+
+# keep-alive HTTP connection pools shared by all requests (RagFlow + LLM clients)
+HTTP_MAX_CONNECTIONS = env_int("HTTP_MAX_CONNECTIONS", 100)
+HTTP_MAX_KEEPALIVE = env_int("HTTP_MAX_KEEPALIVE", 20)
+
+TOP_K = env_int("TOP_K", 5, minimum=1)
+CONCURRENCY = env_int("CONCURRENCY", 10, minimum=1)
+# per-item budget (seconds) for matching one item (retrieve + select) inside a pipeline run, <= 0 disables
+ITEM_TIMEOUT = env_float("ITEM_TIMEOUT", 90)
+# every retrieve attempt (RAGFLOW_RETRIES + 1, with the longest backoffs between them) has to fit in
+# ITEM_TIMEOUT, otherwise the item times out before the last retry or the local fallback runs
+if ITEM_TIMEOUT > 0:
+    _max_backoff = RETRY_BACKOFF * (2 ** RAGFLOW_RETRIES - 1)
+    RAGFLOW_TIMEOUT = min(RAGFLOW_TIMEOUT, max(0.1, (ITEM_TIMEOUT - _max_backoff) / (RAGFLOW_RETRIES + 1)))
 
 PG_HOST = os.getenv("PG_HOST")
-PG_PORT = int(os.getenv("PG_PORT", 5432))
+PG_PORT = env_int("PG_PORT", 5432)
 PG_USER = os.getenv("PG_USER")
 PG_PASSWORD = os.getenv("PG_PASSWORD")
 PG_DBNAME = os.getenv("PG_DBNAME")
+# connection pool shared by all DB lookups (opened on app startup, closed on shutdown)
+PG_POOL_MIN = env_int("PG_POOL_MIN", 1)
+PG_POOL_MAX = env_int("PG_POOL_MAX", 10, minimum=1)
+PG_CONNECT_TIMEOUT = env_int("PG_CONNECT_TIMEOUT", 10)
+# after a failed pool open, lookups fail fast for this many seconds before connecting again
+PG_RECONNECT_INTERVAL = env_float("PG_RECONNECT_INTERVAL", 5)
+
+# in-process cache for latest-forecast lookups (size 0 disables it)
+FORECAST_CACHE_SIZE = env_int("FORECAST_CACHE_SIZE", 4096)
+FORECAST_CACHE_TTL = env_float("FORECAST_CACHE_TTL", 3600)
+# optional SQLite file shared by every worker process on the host (second cache tier, "" disables)
+FORECAST_CACHE_PATH = os.getenv("FORECAST_CACHE_PATH", "")
+# how often (seconds) to compare the history's max(forecast_date) with the last one seen: a new
+# batch drops the cache and brings the snapshot up to date (0 disables)
+FORECAST_CACHE_CHECK_INTERVAL = env_float("FORECAST_CACHE_CHECK_INTERVAL", 300)
+# read latest forecasts from the snapshot table (python -m app.services.forecast_snapshot) instead of the history table
+FORECAST_USE_SNAPSHOT = env_bool("FORECAST_USE_SNAPSHOT", True)
+# while the freshness check finds the snapshot behind the history, latest forecasts are read from
+# the history; with this on, the snapshot is also refreshed (incrementally) on a background thread,
+# which needs write access to it (turn off for a read-only DB user and refresh from the loading job)
+FORECAST_SNAPSHOT_AUTO_REFRESH = env_bool("FORECAST_SNAPSHOT_AUTO_REFRESH", True)
+# forecast history queries (POST /forecast/history, get_forecast_history tool): rows per
+# server-side cursor fetch, and the most rows one request may return
+FORECAST_HISTORY_ITERSIZE = env_int("FORECAST_HISTORY_ITERSIZE", 10000, minimum=1)
+FORECAST_HISTORY_MAX_ROWS = env_int("FORECAST_HISTORY_MAX_ROWS", 1000000, minimum=1)
+
+# stdio MCP server: import the pipeline and build its clients in a background thread at start-up
+# instead of on the first tool call
+MCP_WARMUP = env_bool("MCP_WARMUP", True)
 
+# logging: LOG_LEVEL=DEBUG shows per-item pipeline steps; LOG_FORMAT "text" | "json"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = env_choice("LOG_FORMAT", "text", ("text", "json"))
+# per-stage latency histograms / counters exposed on GET /metrics
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
@@ -0,0 +1,46 @@
+import json
+import logging
+import sys
+
+from app.core import config
+
+# attributes every LogRecord has; anything else came in through `extra=`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = None, fmt: str = None) -> None:
+    """
+    Configure the "app" logger once. Logs go to stderr so the stdio MCP transport
+    (stdout) is never polluted. Per-item hot-path messages are DEBUG, so the
+    default INFO level keeps them off.
+    """
+    logger = logging.getLogger("app")
+    if getattr(logger, "_configured", False):
+        return
+    handler = logging.StreamHandler(sys.stderr)
+    if (fmt or config.LOG_FORMAT).lower() == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel((level or config.LOG_LEVEL).upper())
+    logger.propagate = False
+    logger._configured = True
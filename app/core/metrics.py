@@ -0,0 +1,187 @@
+"""
+Per-stage latency histograms, event counters and a pluggable hook API.
+
+    with timed("retrieve", item=item_name):
+        ...
+    count("timeouts", stage="retrieve")
+    add_hook(lambda timing: ...)   # StageTiming(stage, seconds, item, ok)
+
+render_prometheus() produces the text exposed on GET /metrics.
+"""
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.core import config
+
+PREFIX = "demand_forecast"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class StageTiming(NamedTuple):
+    stage: str
+    seconds: float
+    item: Optional[str]
+    ok: bool
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, hits in zip(self.buckets, series):
+                cumulative += hits
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._series: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._series.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._series.items())
+        lines.extend(f"{self.name}{_format_labels(key)} {value}" for key, value in items)
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.stage_seconds = Histogram(f"{PREFIX}_stage_duration_seconds", "Latency of each pipeline stage.")
+        self._counters: Dict[str, Counter] = {}
+        self._hooks: List[Callable[[StageTiming], None]] = []
+        # name -> callable returning current gauge values keyed by label dict
+        self._gauges: Dict[str, Callable[[], Dict[LabelKey, float]]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str) -> Counter:
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(name, Counter(f"{PREFIX}_{name}_total", f"Number of {name.replace('_', ' ')}."))
+        return counter
+
+    def add_hook(self, hook: Callable[[StageTiming], None]) -> None:
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[StageTiming], None]) -> None:
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def add_gauge(self, name: str, collect: Callable[[], Dict[LabelKey, float]]) -> None:
+        self._gauges[name] = collect
+
+    def observe(self, timing: StageTiming) -> None:
+        self.stage_seconds.observe(timing.seconds, stage=timing.stage, outcome="ok" if timing.ok else "error")
+        for hook in list(self._hooks):
+            try:
+                hook(timing)
+            except Exception:
+                # a broken hook must never break the request it is measuring
+                pass
+
+    def render_prometheus(self) -> str:
+        lines = self.stage_seconds.render()
+        for name in sorted(self._counters):
+            lines.extend(self._counters[name].render())
+        for name, collect in sorted(self._gauges.items()):
+            try:
+                values = collect()
+            except Exception:
+                continue
+            metric = f"{PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.extend(f"{metric}{_format_labels(key)} {value}" for key, value in sorted(values.items()))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def timed(stage: str, item: Optional[str] = None) -> Iterator[None]:
+    """Time the enclosed block as one observation of `stage` (works around awaits too)."""
+    if not config.METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        registry.observe(StageTiming(stage, time.perf_counter() - start, item, ok))
+
+
+def count(name: str, amount: float = 1, **labels: str) -> None:
+    if config.METRICS_ENABLED and amount:
+        registry.counter(name).inc(amount, **labels)
+
+
+def add_hook(hook: Callable[[StageTiming], None]) -> None:
+    registry.add_hook(hook)
+
+
+def remove_hook(hook: Callable[[StageTiming], None]) -> None:
+    registry.remove_hook(hook)
+
+
+def add_gauge(name: str, collect: Callable[[], Dict[str, float]], label: str = "stat") -> None:
+    """Register a gauge family computed at scrape time, e.g. cache stats {"size": 10, "hits": 3}."""
+    registry.add_gauge(name, lambda: {((label, k),): v for k, v in collect().items() if isinstance(v, (int, float))})
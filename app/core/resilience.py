@@ -0,0 +1,233 @@
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+from app.core.metrics import count, add_gauge
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class BackendUnavailable(RuntimeError):
+    """Raised without calling the backend while its circuit breaker is open."""
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies (seconds)."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds; then lets a single probe call through (half open),
+    closing again on success or re-opening on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED or self.failure_threshold <= 0:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """The probe call was cancelled before it could tell anything about the backend."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or (self.failure_threshold > 0 and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+class Backend:
+    """
+    Resilience wrapper for calls to one remote backend (RagFlow retrieve, LLM selection):
+
+    - timeout adapts to the observed latency: the `percentile` of recent calls times
+      `multiplier`, clamped to [min_timeout, max_timeout] (max_timeout until there are
+      enough samples; timed-out calls count as a sample at the timeout so it can grow back)
+    - failed calls are retried up to `retries` times with jittered exponential backoff
+      (only enable retries for idempotent calls); errors `retryable` rejects are raised
+      at once, and nothing is retried while the breaker is not closed
+    - with `hedge_percentile` set, a second identical call is started when the first one
+      is slower than that percentile of recent latencies, and the first result wins
+    - a circuit breaker fails fast with BackendUnavailable while the backend is unhealthy;
+      it counts failed calls, not attempts
+    """
+
+    def __init__(
+        self,
+        name: str,
+        stage: str,
+        max_timeout: float,
+        min_timeout: float = 1.0,
+        percentile: float = 0.99,
+        multiplier: float = 3.0,
+        retries: int = 0,
+        backoff: float = 0.2,
+        hedge_percentile: float = 0.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        timeout_errors: Tuple[Type[BaseException], ...] = (asyncio.TimeoutError,),
+        min_samples: int = 20,
+        retryable: Optional[Callable[[BaseException], bool]] = None,
+    ):
+        self.name = name
+        self.stage = stage
+        self.max_timeout = max_timeout
+        self.min_timeout = min(min_timeout, max_timeout)
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.hedge_percentile = hedge_percentile
+        self.timeout_errors = timeout_errors
+        self.min_samples = min_samples
+        self.retryable = retryable
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        _backends[name] = self
+        add_gauge(f"backend_{name}", self.stats)
+
+    def timeout(self) -> float:
+        observed = self.latency.percentile(self.percentile)
+        if observed is None or len(self.latency) < self.min_samples:
+            return self.max_timeout
+        return max(self.min_timeout, min(self.max_timeout, observed * self.multiplier))
+
+    def hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile <= 0 or len(self.latency) < self.min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], timeout: float) -> T:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        tasks = [asyncio.ensure_future(fn())]
+        try:
+            delay = self.hedge_delay()
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    count("hedged_requests", stage=self.stage)
+                    tasks.append(asyncio.ensure_future(fn()))
+
+            error: Optional[BaseException] = None
+            while tasks:
+                remaining = deadline - loop.time()
+                done, _ = await asyncio.wait(tasks, timeout=max(0.0, remaining), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # the losing hedge / timed-out call is cancelled (closes its HTTP request)
+            for task in tasks:
+                task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() (a fresh awaitable per attempt) under the adaptive timeout, retries and breaker."""
+        if not self.breaker.allow():
+            count("breaker_rejections", stage=self.stage)
+            raise BackendUnavailable(f"{self.name} is unavailable (circuit open)")
+
+        for attempt in range(self.retries + 1):
+            timeout = self.timeout()
+            start = time.monotonic()
+            try:
+                result = await self._attempt(fn, timeout)
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if isinstance(e, self.timeout_errors):
+                    # censored sample: the call took at least this long
+                    self.latency.add(timeout)
+                    count("timeouts", stage=self.stage)
+                    logger.warning("%s call timed out after %.1fs (attempt %d).", self.name, timeout, attempt + 1)
+                else:
+                    count("errors", stage=self.stage)
+                    logger.warning("%s call failed (attempt %d): %s", self.name, attempt + 1, e)
+                if (
+                    attempt >= self.retries
+                    or (self.retryable is not None and not self.retryable(e))
+                    # other calls opened the breaker, or this call is its half-open probe
+                    or self.breaker.state != CLOSED
+                ):
+                    self.breaker.record_failure()
+                    raise
+                count("retries", stage=self.stage)
+                await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+                continue
+
+            self.latency.add(time.monotonic() - start)
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "open": 0 if self.breaker.state == CLOSED else 1,
+            "consecutive_failures": self.breaker.failures,
+            "timeout_seconds": round(self.timeout(), 3),
+            "latency_p50_seconds": self.latency.percentile(0.5),
+            "latency_p99_seconds": self.latency.percentile(0.99),
+            "samples": len(self.latency),
+        }
+
+
+# name -> most recently created backend, reported by GET /health
+_backends: Dict[str, Backend] = {}
+
+
+def backend_states() -> Dict[str, Dict[str, Any]]:
+    return {name: backend.stats() for name, backend in _backends.items()}
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Set, TypeVar
+
+from app.core.metrics import count
+
+T = TypeVar("T")
+
+
+def _retrieve_exception(future: asyncio.Future) -> None:
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the work,
+    callers arriving while it is in flight await the same result.
+
+    Waiters are shielded, so one caller timing out / being cancelled does not cancel
+    the shared work for the others. If every waiter goes away, the shared result's
+    exception is still retrieved so asyncio does not log it as never retrieved.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        future = self._in_flight.get(key)
+        if future is not None:
+            self._record_coalesced(1)
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._forget(key, task))
+        task.add_done_callback(_retrieve_exception)
+        return await asyncio.shield(task)
+
+    async def do_many(
+        self,
+        keys: Iterable[Hashable],
+        fn: Callable[[List[Hashable]], Awaitable[Dict[Hashable, T]]],
+    ) -> Dict[Hashable, T]:
+        """
+        Batch variant: keys already in flight are awaited, the remaining ones are fetched
+        with a single fn(missing_keys) call that returns {key: value}.
+        """
+        keys = list(dict.fromkeys(keys))
+        missing = [key for key in keys if key not in self._in_flight]
+        self._record_coalesced(len(keys) - len(missing))
+
+        if missing:
+            self.calls += 1
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            for future in futures.values():
+                future.add_done_callback(_retrieve_exception)
+            self._in_flight.update(futures)
+
+            async def _run():
+                try:
+                    results = await fn(missing)
+                    for key, future in futures.items():
+                        future.set_result(results.get(key))
+                except asyncio.CancelledError:
+                    for future in futures.values():
+                        future.cancel()
+                    raise
+                except Exception as e:
+                    for future in futures.values():
+                        if not future.done():
+                            future.set_exception(e)
+                finally:
+                    for key, future in futures.items():
+                        self._forget(key, future)
+
+            task = asyncio.ensure_future(_run())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        # every key is in flight now (ours or another caller's); nothing has awaited yet
+        pending = [self._in_flight[key] for key in keys]
+        values = await asyncio.gather(*(asyncio.shield(future) for future in pending))
+        return dict(zip(keys, values))
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    def _record_coalesced(self, n: int) -> None:
+        if n:
+            self.coalesced += n
+            count("coalesced", n, scope=self.name)
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
@@ -0,0 +1,33 @@
+import re
+import unicodedata
+
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff"))
+_WHITESPACE = re.compile(r"\s+")
+# NIKHAHIT + SARA AA typed as two code points -> SARA AM (NFC does not compose them)
+_THAI_SARA_AM = re.compile("\u0e4d\u0e32")
+# the same Thai combining mark (tone marks, upper/lower vowels) typed twice in a row
+_THAI_REPEATED_MARK = re.compile(r"([\u0e31\u0e34-\u0e3a\u0e47-\u0e4e])\1+")
+_SEPARATORS = re.compile(r"[\s\-_/.,()\[\]\"']+")
+
+
+def normalize_item_name(name: str) -> str:
+    """
+    Canonical form of a free-text item name used as a cache / lookup key:
+    NFC-normalized, zero-width characters removed, common Thai typing variants folded,
+    case-folded, whitespace collapsed.
+    """
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFC", str(name)).translate(_ZERO_WIDTH)
+    text = _THAI_SARA_AM.sub("\u0e33", text)
+    text = _THAI_REPEATED_MARK.sub(r"\1", text)
+    text = text.casefold()
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def compact_item_name(name: str) -> str:
+    """
+    normalize_item_name with spaces and punctuation removed.
+    Thai is written without word spaces, so "กระติก น้ำ" and "กระติกน้ำ" should compare equal.
+    """
+    return _SEPARATORS.sub("", normalize_item_name(name))
@@ -1,15 +1,35 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.fastapi.schemas import PipelineInput, PipelineResponse
-from app.pipeline.demand_forecast_pipeline import DemandForecastPipeline
+import json
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse, PlainTextResponse
+from app.core.metrics import registry
+from app.core.resilience import backend_states
+from app.fastapi.schemas import PipelineInput, PipelineResponse, ForecastHistoryInput
+from app.pipeline.demand_forecast_pipeline import DemandForecastPipeline, get_shared_pipeline
 
 router = APIRouter()
 
-def get_pipeline():
-    return DemandForecastPipeline()
+def get_pipeline(request: Request) -> DemandForecastPipeline:
+    # created once in the app lifespan; fall back to the process-wide instance otherwise
+    pipeline = getattr(request.app.state, "pipeline", None)
+    return pipeline or get_shared_pipeline()
 
 @router.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    """
+    Process health plus the circuit breaker state / adaptive timeout of each backend;
+    status is "degraded" while any breaker is not closed.
+    """
+    backends = backend_states()
+    degraded = any(state["state"] != "closed" for state in backends.values())
+    return {"status": "degraded" if degraded else "ok", "backends": backends}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus text format: per-stage latency histograms, timeout / error / cache counters.
+    """
+    return PlainTextResponse(registry.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 @router.post("/pipeline/run", response_model=PipelineResponse)
 async def run_pipeline(data: PipelineInput, pipeline: DemandForecastPipeline = Depends(get_pipeline)):
@@ -21,3 +41,36 @@ async def run_pipeline(data: PipelineInput, pipeline: DemandForecastPipeline = D
         return PipelineResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/pipeline/stream")
+async def stream_pipeline(data: PipelineInput, pipeline: DemandForecastPipeline = Depends(get_pipeline)):
+    """
+    Run the pipeline and stream results as NDJSON: one "item" event per item as soon as
+    it is done, then a "summary" event carrying the formatted demand_forecast text.
+    """
+    async def events():
+        async for event in pipeline.run_stream(data.input_data):
+            yield json.dumps(jsonable_encoder(event), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.post("/forecast/history")
+async def forecast_history(data: ForecastHistoryInput, pipeline: DemandForecastPipeline = Depends(get_pipeline)):
+    """
+    Forecast series of one or more items between start_date and end_date, as parallel
+    arrays per matched category ("series": {name: {"forecast_date": [...],
+    "demand_forecast": [...]}}). Serialized directly with compact separators: the arrays
+    can hold years of rows per category and are not run through response_model validation.
+    """
+    try:
+        result = await pipeline.run_history(data.input_data, data.start_date, data.end_date, data.resolve)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    body = json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+    return Response(body, media_type="application/json")
@@ -1,8 +1,30 @@
+from datetime import date
 from pydantic import BaseModel
-from typing import List, Union
+from typing import Any, Dict, List, Optional, Union
 
 class PipelineInput(BaseModel):
     input_data: Union[str, List[str]]
 
+class ItemResult(BaseModel):
+    input_item: str
+    selected_item: Optional[str] = None
+    # exact / normalized / fuzzy (local catalog), cache, shortcut, llm (RagFlow + LLM),
+    # llm_cache (RagFlow + reused LLM answer), fallback
+    resolved_by: Optional[str] = None
+    demand_forecast: Optional[Dict[str, Any]] = None
+    message: Optional[str] = None
+
 class PipelineResponse(BaseModel):
     demand_forecast: str
+    results: List[ItemResult] = []
+    # LLM selections answered from the selection cache in this request, and the summed latency
+    # those calls took when they were made (calls made concurrently overlap in wall time)
+    llm_calls_avoided: int = 0
+    llm_latency_saved_ms: float = 0.0
+
+class ForecastHistoryInput(BaseModel):
+    input_data: Union[str, List[str]]
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    # False: input_data are exact categorylv5 names, skip RagFlow / LLM matching
+    resolve: bool = True
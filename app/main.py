@@ -1,14 +1,46 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.fastapi.routers import router as pipeline_router
 from dotenv import load_dotenv
+from app.core.log import setup_logging
 from app.mcp_server import mcp
+from app.services import db_service
+from app.services.catalog_index import load_catalog_index, start_catalog_reloader, stop_catalog_reloader
+from app.pipeline.demand_forecast_pipeline import get_shared_pipeline, close_shared_pipeline
 
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await asyncio.to_thread(db_service.init_pool)
+    except Exception as e:
+        # keep serving; the pool is opened lazily on the first lookup instead
+        logger.warning("Could not open DB connection pool on startup: %s", e)
+    # build the categorylv5 pre-match index before the first request needs it
+    await asyncio.to_thread(load_catalog_index)
+    start_catalog_reloader()
+    # one pipeline (RagFlow + LLM clients, prompts) shared by every request and the MCP tools
+    app.state.pipeline = get_shared_pipeline()
+    logger.info("Worker %d ready.", os.getpid())
+    try:
+        yield
+    finally:
+        # runs once per worker process (gunicorn / uvicorn --workers) on shutdown
+        stop_catalog_reloader()
+        await close_shared_pipeline()
+        await asyncio.to_thread(db_service.close_pool)
 
 app = FastAPI(
     title="Demand Forecast Agent API",
     description="API for the Demand Forecast Agent Pipeline",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.include_router(pipeline_router, tags=["Pipeline"])
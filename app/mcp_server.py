@@ -1,21 +1,54 @@
-import asyncio
-from typing import Any
-from fastmcp import FastMCP
-from app.pipeline.demand_forecast_pipeline import DemandForecastPipeline
+import json
+import time
+from datetime import date
+import logging
+import threading
+from typing import Optional, TYPE_CHECKING
+from fastmcp import FastMCP, Context
 from dotenv import load_dotenv
+from app.core import config
+from app.core.log import setup_logging
+from app.services.catalog_index import start_catalog_reloader
+
+if TYPE_CHECKING:
+    from app.pipeline.demand_forecast_pipeline import DemandForecastPipeline
 
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 
 mcp = FastMCP("Demand Forecast Agent")
 
-pipeline = None
+def get_pipeline() -> "DemandForecastPipeline":
+    """
+    Get the shared pipeline instance (same one the FastAPI routes use).
+    Imported here rather than at module load: the pipeline pulls in langchain, the OpenAI
+    SDK and psycopg2, which would otherwise delay every stdio server start.
+    """
+    from app.pipeline.demand_forecast_pipeline import get_shared_pipeline
+    return get_shared_pipeline()
 
-def get_pipeline() -> DemandForecastPipeline:
-    """Get or create the pipeline instance."""
-    global pipeline
-    if pipeline is None:
-        pipeline = DemandForecastPipeline()
-    return pipeline
+
+def _warm_up() -> None:
+    start = time.perf_counter()
+    try:
+        get_pipeline()
+    except Exception as e:
+        logger.warning("MCP warm-up failed, the first tool call will build the pipeline: %s", e)
+        return
+    logger.info("MCP warm-up done in %.2fs.", time.perf_counter() - start)
+
+
+def start_warmup() -> Optional[threading.Thread]:
+    """
+    Build the pipeline in a background thread while the MCP client is still connecting
+    (MCP_WARMUP=false disables this; the first tool call then pays for it).
+    """
+    if not config.MCP_WARMUP:
+        return None
+    thread = threading.Thread(target=_warm_up, name="mcp-warmup", daemon=True)
+    thread.start()
+    return thread
 
 
 @mcp.tool()
@@ -59,5 +92,95 @@ async def get_demand_forecast(item_names: str | list[str]) -> str:
         return f"Error processing demand forecast: {str(e)}"
 
 
+@mcp.tool()
+async def stream_demand_forecast(item_names: str | list[str], ctx: Context) -> str:
+    """
+    Get demand forecast for one or more items, reporting progress as each item finishes.
+
+    Same input and output as get_demand_forecast, but every finished item is sent to the
+    client right away as a progress notification and log message, so one slow item does
+    not hide the others. Prefer this tool for many items.
+
+    Args:
+        item_names: Single item name, comma-separated items, or list of items.
+
+    Returns:
+        Formatted demand forecast results for all items (same format as get_demand_forecast).
+    """
+    try:
+        forecast_pipeline = get_pipeline()
+        done = 0
+
+        async for event in forecast_pipeline.run_stream(item_names):
+            if event["event"] == "error":
+                return f"Error: {event['error']}"
+
+            if event["event"] == "item":
+                done += 1
+                res = event["result"]
+                forecast = res.get("demand_forecast") or {}
+                await ctx.report_progress(progress=done, total=event["total"])
+                await ctx.info(
+                    f"{res['input_item']} -> {res['selected_item']}: "
+                    f"{forecast.get('demand_forecast', res.get('message', 'No forecast data found.'))}"
+                )
+
+            elif event["event"] == "summary":
+                return event.get("demand_forecast", "No forecast data available")
+
+        return "No forecast data available"
+
+    except Exception as e:
+        return f"Error processing demand forecast: {str(e)}"
+
+
+@mcp.tool()
+async def get_forecast_history(
+    item_names: str | list[str],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    resolve: bool = True,
+) -> str:
+    """
+    Get the demand forecast series of one or more items over a date range.
+
+    Items are matched against the knowledge base like in get_demand_forecast, then every
+    forecast row between start_date and end_date (inclusive) is returned per matched item.
+    With resolve=False the names are taken as exact categorylv5 values and not matched.
+
+    Args:
+        item_names: Single item name, comma-separated items, or list of items.
+        start_date: First forecast date (YYYY-MM-DD), or omit for no lower bound.
+        end_date: Last forecast date (YYYY-MM-DD), or omit for no upper bound.
+        resolve: Match the names first (default); False skips matching for exact categorylv5 names.
+
+    Returns:
+        Compact JSON: {"start_date", "end_date", "rows", "results": [{input_item,
+        selected_item, resolved_by, ...}], "series": {selected_item: {"forecast_date": [...],
+        "demand_forecast": [...]}}} with one pair of parallel arrays per matched item.
+
+    Examples:
+        >>> await get_forecast_history("กระติกน้ำ", "2024-01-01", "2024-12-31")
+        >>> await get_forecast_history(["กระติกน้ำ", "flap box"], start_date="2023-01-01")
+        >>> await get_forecast_history("กระติกน้ำสแตนเลส 1 ลิตร", resolve=False)
+    """
+    try:
+        start = date.fromisoformat(start_date) if start_date else None
+        end = date.fromisoformat(end_date) if end_date else None
+    except ValueError as e:
+        return f"Error: invalid date ({e}). Use YYYY-MM-DD."
+
+    try:
+        result = await get_pipeline().run_history(item_names, start, end, resolve=resolve)
+        if "error" in result:
+            return f"Error: {result['error']}"
+        return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+
+    except Exception as e:
+        return f"Error processing forecast history: {str(e)}"
+
+
 if __name__ == "__main__":
+    start_warmup()
+    start_catalog_reloader()
     mcp.run()
@@ -0,0 +1,366 @@
+"""
+Offline bulk export: run a CSV / JSONL file of free-text item names through the pipeline
+and write one result row per input row.
+
+    python -m app.pipeline.bulk_export items.csv -o forecasts.jsonl
+    python -m app.pipeline.bulk_export items.jsonl --column name -o forecasts.csv --concurrency 40
+    python -m app.pipeline.bulk_export items.csv -o forecasts.parquet   # needs pyarrow
+
+Input is read lazily in chunks; each chunk goes through DemandForecastPipeline.run
+(duplicates matched once, one batched forecast query per chunk) and rows are appended to
+the output in input order, so memory stays flat regardless of the file size.
+
+CSV input must start with a header row: --column picks the column by name, otherwise the
+first column is used (and the header row itself is never exported).
+
+After every written chunk a checkpoint (<output>.checkpoint.json) records how many input
+rows are done and how far the output is valid. Re-running the same command after a crash
+resumes from there; --overwrite starts over. Parquet output is a directory of part files
+named after their first input row; on resume, parts starting at or after the checkpointed
+row are removed, so redone chunks never overlap them (even with a different --chunk-size).
+
+Rows that fail (forecast query error, item timeout / error) are retried --retries times.
+A chunk that still has failed rows is neither written nor checkpointed: the export stops
+there, reports failed_rows, and exits 1, so re-running it later picks the chunk up again.
+"""
+import os
+import io
+import csv
+import json
+import time
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core import config
+from app.pipeline.demand_forecast_pipeline import DemandForecastPipeline
+from app.services import db_service
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ["row", "input_item", "selected_item", "resolved_by", "forecast_date", "demand_forecast", "message"]
+
+
+def iter_input_items(path: str, column: Optional[str] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (row, item_name) from a CSV (column name or the first column; the first line is
+    always the header) or JSONL file (objects with that key, or bare JSON strings). Rows are
+    numbered from 0 and blank names keep their number so checkpoints stay aligned with the file.
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for row, line in enumerate(f):
+                value = json.loads(line) if line.strip() else ""
+                if isinstance(value, dict):
+                    value = value.get(column or "item_name", "")
+                yield row, str(value or "").strip()
+        else:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            if column and column not in header:
+                raise SystemExit(f"Column {column!r} not found in the header of {path}: {', '.join(header)}")
+            index = header.index(column) if column else 0
+            for row, values in enumerate(reader):
+                yield row, values[index].strip() if index < len(values) else ""
+
+
+def _failed(result: Dict[str, Any]) -> bool:
+    """Rows the pipeline could not finish (DB error, item timeout / error), as opposed to "no match"."""
+    return (result.get("message") or "").startswith(("Error", "Timed out"))
+
+
+def to_row(row: int, result: Dict[str, Any]) -> Dict[str, Any]:
+    forecast = result.get("demand_forecast") or {}
+    value = forecast.get("demand_forecast")
+    forecast_date = forecast.get("forecast_date")
+    return {
+        "row": row,
+        "input_item": result.get("input_item"),
+        "selected_item": result.get("selected_item"),
+        "resolved_by": result.get("resolved_by"),
+        "forecast_date": forecast_date.isoformat() if isinstance(forecast_date, (date, datetime)) else forecast_date,
+        "demand_forecast": float(value) if isinstance(value, Decimal) else value,
+        "message": result.get("message"),
+    }
+
+
+class _LineWriter:
+    """JSONL / CSV output; the checkpoint position is the byte offset after the last full chunk."""
+
+    def __init__(self, path: str, fmt: str, position: int = 0):
+        self.fmt = fmt
+        self._file = open(path, "ab")
+        # anything after the checkpointed offset belongs to a chunk that will be redone
+        self._file.truncate(position)
+        self._file.seek(position)
+        if fmt == "csv" and position == 0:
+            self._write_csv([dict(zip(FIELDS, FIELDS))])
+
+    def _write_csv(self, rows: List[Dict[str, Any]]) -> None:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=FIELDS, lineterminator="\n")
+        writer.writerows(rows)
+        self._file.write(buffer.getvalue().encode("utf-8"))
+
+    def write(self, rows: List[Dict[str, Any]]) -> int:
+        if self.fmt == "csv":
+            self._write_csv(rows)
+        else:
+            self._file.write("".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in rows).encode("utf-8"))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetWriter:
+    """
+    Parquet output: one part file per chunk in the output directory. rows_done is the
+    checkpointed row count; parts from chunks after it are deleted, as _LineWriter truncates.
+    """
+
+    def __init__(self, path: str, rows_done: int = 0):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)") from e
+        self._pa, self._pq = pyarrow, pyarrow.parquet
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        for part in chain(self.path.glob("part-*.parquet"), self.path.glob("part-*.tmp")):
+            if int(part.stem.split("-", 1)[1]) >= rows_done:
+                part.unlink()
+        self._schema = pyarrow.schema([
+            ("row", pyarrow.int64()),
+            ("input_item", pyarrow.string()),
+            ("selected_item", pyarrow.string()),
+            ("resolved_by", pyarrow.string()),
+            ("forecast_date", pyarrow.string()),
+            ("demand_forecast", pyarrow.float64()),
+            ("message", pyarrow.string()),
+        ])
+
+    def write(self, rows: List[Dict[str, Any]]) -> int:
+        part = self.path / f"part-{rows[0]['row']:010d}.parquet"
+        tmp = part.with_suffix(".tmp")
+        self._pq.write_table(self._pa.Table.from_pylist(rows, schema=self._schema), tmp)
+        os.replace(tmp, part)
+        return 0
+
+    def close(self) -> None:
+        return None
+
+
+def _open_writer(path: str, fmt: str, checkpoint: Dict[str, Any]):
+    if fmt == "parquet":
+        return _ParquetWriter(path, checkpoint["rows_done"])
+    return _LineWriter(path, fmt, checkpoint["position"])
+
+
+def _load_checkpoint(path: str, input_path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"rows_done": 0, "position": 0}
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input") != os.path.abspath(input_path):
+        raise SystemExit(f"{path} belongs to {checkpoint.get('input')}; use --overwrite to start over")
+    return checkpoint
+
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def _remove_output(output_path: str, checkpoint_path: str) -> None:
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    if os.path.isdir(output_path):
+        for part in Path(output_path).glob("part-*.parquet"):
+            part.unlink()
+    elif os.path.exists(output_path):
+        os.remove(output_path)
+
+
+async def export(
+    input_path: str,
+    output_path: str,
+    fmt: Optional[str] = None,
+    column: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    chunk_size: int = 200,
+    prefetch: int = 1,
+    overwrite: bool = False,
+    pipeline: Optional[DemandForecastPipeline] = None,
+    retries: int = 2,
+    retry_delay: float = 5.0,
+) -> Dict[str, Any]:
+    """
+    Export forecasts for every row of input_path to output_path, resuming from the
+    checkpoint if there is one. Up to 1 + prefetch chunks are matched at a time, each
+    with the pipeline's concurrency, so the next chunk fills while a slow one finishes.
+    Failed rows are retried up to `retries` times (retry_delay * attempt apart); the export
+    stops before the first chunk that still has failed rows.
+    Returns the run summary (rows, failed_rows, complete, seconds, resolved_by, ...).
+    """
+    fmt = fmt or Path(output_path).suffix.lstrip(".") or "jsonl"
+    if fmt not in ("jsonl", "csv", "parquet"):
+        raise ValueError(f"Unsupported output format: {fmt}")
+    # read the first row before touching the output, so a bad --column fails cleanly
+    items = iter_input_items(input_path, column)
+    first = next(items, None)
+    items = chain([first] if first else [], items)
+    checkpoint_path = f"{output_path}.checkpoint.json"
+    if overwrite:
+        _remove_output(output_path, checkpoint_path)
+    elif os.path.exists(output_path) and not os.path.exists(checkpoint_path):
+        raise SystemExit(f"{output_path} exists without a checkpoint; use --overwrite to replace it")
+
+    checkpoint = _load_checkpoint(checkpoint_path, input_path)
+    skip = checkpoint["rows_done"]
+    if skip:
+        logger.info("Resuming %s after %d rows.", input_path, skip)
+    items = islice(items, skip, None)
+
+    own_pipeline = pipeline is None
+    pipeline = pipeline or DemandForecastPipeline(concurrency=concurrency)
+    writer = _open_writer(output_path, fmt, checkpoint)
+
+    stats = Counter()
+    rows_done = skip
+    start = last_report = time.perf_counter()
+
+    async def _run_chunk(chunk: List[Tuple[int, str]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Result rows of the chunk and how many of them still failed after the retries."""
+        results: Dict[int, Dict[str, Any]] = {}
+        todo = [(row, name) for row, name in chunk if name]
+        for attempt in range(max(0, retries) + 1):
+            if attempt:
+                logger.warning(
+                    "%d rows of the chunk starting at row %d failed, retry %d/%d in %.1fs.",
+                    len(todo), chunk[0][0], attempt, retries, retry_delay * attempt,
+                )
+                await asyncio.sleep(retry_delay * attempt)
+            output = (await pipeline.run([name for _, name in todo]))["results"] if todo else []
+            for (row, _), result in zip(todo, output):
+                results[row] = result
+            todo = [(row, name) for row, name in todo if _failed(results[row])]
+            if not todo:
+                break
+        rows = [
+            to_row(row, results[row] if name else {"input_item": name, "message": "Empty item name."})
+            for row, name in chunk
+        ]
+        return rows, len(todo)
+
+    try:
+        pending: List[asyncio.Task] = []
+        exhausted = False
+        while pending or not exhausted:
+            # keep 1 + prefetch chunks in flight, written strictly in input order
+            while not exhausted and len(pending) < 1 + max(0, prefetch):
+                chunk = list(islice(items, chunk_size))
+                if not chunk:
+                    exhausted = True
+                    break
+                pending.append(asyncio.ensure_future(_run_chunk(chunk)))
+            if not pending:
+                break
+
+            rows, failed = await pending.pop(0)
+            if failed:
+                # not written, not checkpointed: a later run redoes this chunk
+                stats["failed_rows"] += failed
+                logger.error(
+                    "%d rows of the chunk starting at row %d failed after %d retries; stopping. "
+                    "Re-run the same command to resume from row %d.",
+                    failed, rows[0]["row"], retries, rows[0]["row"],
+                )
+                break
+            position = writer.write(rows)
+            rows_done = rows[-1]["row"] + 1
+            _save_checkpoint(checkpoint_path, {
+                "input": os.path.abspath(input_path),
+                "format": fmt,
+                "rows_done": rows_done,
+                "position": position,
+            })
+            stats["rows"] += len(rows)
+            stats.update(f"resolved_by:{r['resolved_by']}" for r in rows)
+            stats["with_forecast"] += sum(1 for r in rows if r["demand_forecast"] is not None)
+
+            now = time.perf_counter()
+            if now - last_report >= 10:
+                last_report = now
+                logger.info("%d rows done (%.1f rows/s)", rows_done, stats["rows"] / (now - start))
+    finally:
+        for task in pending:
+            task.cancel()
+        writer.close()
+        if own_pipeline:
+            await pipeline.aclose()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": stats["rows"],
+        "resumed_after": skip,
+        "rows_total": rows_done,
+        "with_forecast": stats["with_forecast"],
+        "failed_rows": stats["failed_rows"],
+        "complete": not stats["failed_rows"],
+        "resolved_by": {k.split(":", 1)[1]: v for k, v in stats.items() if k.startswith("resolved_by:")},
+        "seconds": elapsed,
+        "rows_per_second": stats["rows"] / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    from app.core.log import setup_logging
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or JSONL file of item names")
+    parser.add_argument("-o", "--output", required=True, help="output .jsonl / .csv file or .parquet directory")
+    parser.add_argument("--format", choices=["jsonl", "csv", "parquet"], help="default: from the output suffix")
+    parser.add_argument(
+        "--column",
+        help="CSV header column / JSONL key holding the item name (default: first column / item_name; "
+             "CSV files always start with a header row)",
+    )
+    parser.add_argument("--concurrency", type=int, default=config.CONCURRENCY, help="items matched at a time per chunk")
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--prefetch", type=int, default=1, help="extra chunks started while one is still running")
+    parser.add_argument("--overwrite", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--retries", type=int, default=2, help="retries of rows that failed (DB error, timeout)")
+    parser.add_argument("--retry-delay", type=float, default=5.0, help="seconds before the first retry (grows per retry)")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        summary = asyncio.run(export(
+            args.input,
+            args.output,
+            fmt=args.format,
+            column=args.column,
+            concurrency=args.concurrency,
+            chunk_size=args.chunk_size,
+            prefetch=args.prefetch,
+            overwrite=args.overwrite,
+            retries=args.retries,
+            retry_delay=args.retry_delay,
+        ))
+    finally:
+        db_service.close_pool()
+    print(json.dumps(summary, indent=2))
+    if not summary["complete"]:
+        raise SystemExit(1)
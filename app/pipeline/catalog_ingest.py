@@ -0,0 +1,332 @@
+"""
+Incremental catalog ingestion for the RagFlow item-name dataset (replaces
+pre_data/convert_csv_to_md.py, which rewrote one Markdown file per row on every run).
+
+    python -m app.pipeline.catalog_ingest -o ingest/                       # CATALOG_CSV_PATH
+    python -m app.pipeline.catalog_ingest --source db -o ingest/           # categories with a forecast
+    python -m app.pipeline.catalog_ingest catalog.csv -o ingest/ --format ragflow --batch-size 500
+    python -m app.pipeline.catalog_ingest catalog.csv -o ingest/ --dry-run
+
+Rows are streamed and compared by content hash against a manifest (SQLite file,
+<output>/manifest.sqlite by default) keyed on categorylv5, so a run only emits the
+categories added, changed or removed since the previous run. Each run with changes writes
+<output>/run-NNNNN/:
+
+    chunks   upsert-00001.csv ...    CSV documents of --batch-size rows; RagFlow's table
+                                     parser turns every row into one "header:values" chunk
+             delete.csv              key, reason: removed categories and the old version of changed ones
+    ragflow  upsert-00001.jsonl ...  one add-chunk request body per line (content, important_keywords)
+             delete.jsonl            {"key", "reason"} per chunk to delete
+
+plus summary.json. The manifest is committed only after the run's files are written, so an
+interrupted run is simply redone. Memory stays flat: rows are hashed and looked up in
+batches, and removed categories are read back from the manifest with a cursor.
+"""
+import io
+import os
+import csv
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import argparse
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+KEY_COLUMN = "categorylv5"
+# rows hashed and looked up in the manifest per round trip
+LOOKUP_BATCH = 500
+
+
+def iter_csv_rows(path: str) -> Iterator[Dict[str, str]]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            yield {k.strip(): (v or "").strip() for k, v in row.items() if k is not None}
+
+
+def iter_db_rows(itersize: int = 5000) -> Iterator[Dict[str, str]]:
+    """Every categorylv5 with a forecast, streamed through a server-side cursor."""
+    from app.services import db_service
+
+    with db_service.pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s)", (db_service.SNAPSHOT_TABLE,))
+            use_snapshot = config.FORECAST_USE_SNAPSHOT and cur.fetchone()[0] is not None
+        if use_snapshot:
+            sql = f"SELECT categorylv5 FROM {db_service.SNAPSHOT_TABLE} ORDER BY categorylv5"
+        else:
+            sql = (
+                f"SELECT DISTINCT categorylv5 FROM {db_service.FORECAST_TABLE} "
+                "WHERE categorylv5 IS NOT NULL ORDER BY categorylv5"
+            )
+        with conn.cursor(name="catalog_ingest") as cur:
+            cur.itersize = itersize
+            cur.execute(sql)
+            for (name,) in cur:
+                if name and name.strip():
+                    yield {KEY_COLUMN: name.strip()}
+
+
+def content_hash(row: Dict[str, str]) -> str:
+    payload = json.dumps(row, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _csv_line(values: Iterable[str]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="").writerow(values)
+    return buffer.getvalue()
+
+
+def chunk_content(row: Dict[str, str]) -> str:
+    """Same "header,...:value,..." text RagFlow's table parser stores per row (see CandidateParser)."""
+    return f"{_csv_line(row.keys())}:{_csv_line(row.values())}"
+
+
+class Manifest:
+    """key -> content hash of every ingested category, and the run that last saw it."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS manifest (key TEXT PRIMARY KEY, hash TEXT NOT NULL, run INTEGER NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS manifest_run ON manifest (run)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run INTEGER PRIMARY KEY, source TEXT, finished_at REAL, summary TEXT
+            )
+        """)
+
+    def begin(self) -> int:
+        self._db.execute("BEGIN IMMEDIATE")
+        last = self._db.execute(
+            "SELECT max(run) FROM (SELECT max(run) AS run FROM runs UNION ALL SELECT max(run) FROM manifest)"
+        ).fetchone()[0]
+        return (last or 0) + 1
+
+    def lookup(self, keys: List[str]) -> Dict[str, Tuple[str, int]]:
+        rows = self._db.execute(
+            f"SELECT key, hash, run FROM manifest WHERE key IN ({','.join('?' * len(keys))})", keys
+        )
+        return {key: (digest, run) for key, digest, run in rows}
+
+    def record(self, entries: List[Tuple[str, str, int]]) -> None:
+        self._db.executemany(
+            "INSERT INTO manifest (key, hash, run) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET hash = excluded.hash, run = excluded.run",
+            entries,
+        )
+
+    def iter_unseen(self, run: int) -> Iterator[str]:
+        """Keys not seen by this run (removed from the source)."""
+        for (key,) in self._db.execute("SELECT key FROM manifest WHERE run < ? ORDER BY key", (run,)):
+            yield key
+
+    def commit(self, run: int, source: str, summary: Dict[str, Any]) -> None:
+        self._db.execute("DELETE FROM manifest WHERE run < ?", (run,))
+        self._db.execute(
+            "INSERT INTO runs (run, source, finished_at, summary) VALUES (?, ?, ?, ?)",
+            (run, source, time.time(), json.dumps(summary)),
+        )
+        self._db.execute("COMMIT")
+
+    def rollback(self) -> None:
+        if self._db.in_transaction:
+            self._db.execute("ROLLBACK")
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class _RunWriter:
+    """Batched upsert documents + one delete list for one run, created on first write."""
+
+    def __init__(self, run_dir: Path, fmt: str, batch_size: int):
+        self.run_dir = run_dir
+        self.fmt = fmt
+        self.batch_size = max(1, batch_size)
+        self.files: List[str] = []
+        self._batch: List[Dict[str, str]] = []
+        self._delete = None
+
+    def _open(self, name: str):
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.files.append(name)
+        return open(self.run_dir / name, "w", encoding="utf-8", newline="")
+
+    def upsert(self, row: Dict[str, str]) -> None:
+        self._batch.append(row)
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def delete(self, key: str, reason: str) -> None:
+        if self._delete is None:
+            self._delete = self._open("delete.csv" if self.fmt == "chunks" else "delete.jsonl")
+            if self.fmt == "chunks":
+                self._delete.write("key,reason\n")
+        if self.fmt == "chunks":
+            self._delete.write(_csv_line((key, reason)) + "\n")
+        else:
+            self._delete.write(json.dumps({"key": key, "reason": reason}, ensure_ascii=False) + "\n")
+
+    def _flush(self) -> None:
+        if not self._batch:
+            return
+        number = sum(1 for name in self.files if name.startswith("upsert-")) + 1
+        with self._open(f"upsert-{number:05d}.{'csv' if self.fmt == 'chunks' else 'jsonl'}") as f:
+            if self.fmt == "chunks":
+                writer = csv.DictWriter(f, fieldnames=list(self._batch[0].keys()), lineterminator="\n", extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(self._batch)
+            else:
+                for row in self._batch:
+                    f.write(json.dumps({
+                        "key": row[KEY_COLUMN],
+                        "content": chunk_content(row),
+                        "important_keywords": [row[KEY_COLUMN]],
+                    }, ensure_ascii=False) + "\n")
+        self._batch = []
+
+    def close(self) -> None:
+        self._flush()
+        if self._delete is not None:
+            self._delete.close()
+            self._delete = None
+
+
+def _batches(rows: Iterable[Dict[str, str]], size: int) -> Iterator[List[Dict[str, str]]]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ingest(
+    rows: Iterable[Dict[str, str]],
+    output_dir: str,
+    fmt: str = "chunks",
+    batch_size: int = 1000,
+    manifest_path: Optional[str] = None,
+    source: str = "",
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """Diff the rows against the manifest and write the changes; returns the run summary."""
+    start = time.perf_counter()
+    manifest = Manifest(manifest_path or os.path.join(output_dir, "manifest.sqlite"))
+    run = manifest.begin()
+    run_dir = Path(output_dir) / f"run-{run:05d}"
+    if run_dir.exists() and not dry_run:
+        # left behind by an interrupted run that never committed
+        shutil.rmtree(run_dir)
+    writer = _RunWriter(run_dir, fmt, batch_size)
+    stats = {"rows": 0, "added": 0, "changed": 0, "unchanged": 0, "removed": 0, "duplicates": 0, "skipped": 0}
+    try:
+        for batch in _batches(rows, LOOKUP_BATCH):
+            stats["rows"] += len(batch)
+            keyed = [(row.get(KEY_COLUMN, "").strip(), row) for row in batch]
+            known = manifest.lookup(list({key for key, _ in keyed if key}))
+            seen = set()
+            entries = []
+            for key, row in keyed:
+                if not key:
+                    stats["skipped"] += 1
+                    continue
+                # first occurrence wins; later batches see it recorded under this run
+                if key in seen or known.get(key, (None, 0))[1] == run:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(key)
+                digest = content_hash(row)
+                previous = known.get(key)
+                if previous is None:
+                    stats["added"] += 1
+                elif previous[0] != digest:
+                    stats["changed"] += 1
+                    if not dry_run:
+                        writer.delete(key, "changed")
+                else:
+                    stats["unchanged"] += 1
+                    entries.append((key, digest, run))
+                    continue
+                if not dry_run:
+                    writer.upsert(row)
+                entries.append((key, digest, run))
+            manifest.record(entries)
+
+        for key in manifest.iter_unseen(run):
+            stats["removed"] += 1
+            if not dry_run:
+                writer.delete(key, "removed")
+        writer.close()
+
+        elapsed = time.perf_counter() - start
+        summary = dict(
+            stats,
+            run=run,
+            source=source,
+            format=fmt,
+            dry_run=dry_run,
+            files=[str(run_dir / name) for name in writer.files],
+            seconds=elapsed,
+            rows_per_second=stats["rows"] / elapsed if elapsed > 0 else 0.0,
+        )
+        if dry_run:
+            manifest.rollback()
+            return summary
+        if writer.files:
+            with open(run_dir / "summary.json", "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2, ensure_ascii=False)
+        manifest.commit(run, source, stats)
+        return summary
+    except BaseException:
+        manifest.rollback()
+        raise
+    finally:
+        writer.close()
+        manifest.close()
+
+
+if __name__ == "__main__":
+    from app.core.log import setup_logging
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", help="catalog CSV (default: CATALOG_CSV_PATH; ignored with --source db)")
+    parser.add_argument("--source", choices=["csv", "db"], default="csv")
+    parser.add_argument("-o", "--output", default="ingest", help="output directory (runs + manifest)")
+    parser.add_argument("--format", choices=["chunks", "ragflow"], default="chunks")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per upsert document")
+    parser.add_argument("--manifest", help="manifest file (default: <output>/manifest.sqlite)")
+    parser.add_argument("--dry-run", action="store_true", help="report the diff without writing or updating the manifest")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.source == "db":
+        rows, source = iter_db_rows(), "db"
+    else:
+        path = args.input or config.CATALOG_CSV_PATH
+        rows, source = iter_csv_rows(path), os.path.abspath(path)
+    try:
+        summary = ingest(
+            rows,
+            args.output,
+            fmt=args.format,
+            batch_size=args.batch_size,
+            manifest_path=args.manifest,
+            source=source,
+            dry_run=args.dry_run,
+        )
+    finally:
+        if args.source == "db":
+            from app.services import db_service
+            db_service.close_pool()
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
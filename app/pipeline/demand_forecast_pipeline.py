@@ -1,11 +1,35 @@
 import asyncio
-from typing import Dict, Any, List, Union
+import logging
+import threading
+from datetime import date
+from typing import Dict, Any, List, Union, Optional, AsyncIterator
+from app.core import config
+from app.core.metrics import timed, count
+from app.core.singleflight import SingleFlight
+from app.core.text import normalize_item_name
 from app.services.ragflow_service import RagFlowService
-from app.services.db_service import get_demand_forecast
+from app.services.db_service import aget_demand_forecasts, aget_forecast_history
+from app.services.selection_cache import SelectionSavings, track_savings
+
+logger = logging.getLogger(__name__)
 
 class DemandForecastPipeline:
-    def __init__(self):
-        self.rag_service = RagFlowService()
+    def __init__(
+        self,
+        rag_service: Optional[RagFlowService] = None,
+        concurrency: Optional[int] = None,
+        item_timeout: Optional[float] = None,
+    ):
+        self.rag_service = rag_service or RagFlowService()
+        # max number of items processed at the same time within one run (1 = sequential)
+        self.concurrency = max(1, concurrency or config.CONCURRENCY)
+        self.item_timeout = item_timeout if item_timeout is not None else config.ITEM_TIMEOUT
+        # concurrent runs asking for the same item share one resolution / forecast fetch
+        self.resolve_flight = SingleFlight("resolution")
+        self.forecast_flight = SingleFlight("forecast")
+
+    async def aclose(self) -> None:
+        await self.rag_service.aclose()
 
     async def run(self, input_data: Union[str, List[str]]) -> Dict[str, Any]:
         """
@@ -15,57 +39,260 @@ class DemandForecastPipeline:
         3. Query DB for demand forecast
         4. Return formatted results
         """
-        print(f"--- Starting Demand Forecast Pipeline with input: {input_data} ---")
+        logger.debug("Starting Demand Forecast Pipeline with input: %s", input_data)
         
         # 1. Normalize Input
-        target_items = []
-        if isinstance(input_data, str):
-            if "," in input_data:
-                target_items = [item.strip() for item in input_data.split(",") if item.strip()]
-            else:
-                target_items = [input_data]
-        elif isinstance(input_data, list):
-            target_items = input_data
-        else:
+        target_items = self._normalize_input(input_data)
+        if target_items is None:
             return {"error": "Invalid input format. Expected string or list."}
 
-        # 2. Process Items
-        processed_results = []
-        for target_item in target_items:
-            # Retrieve + Select Best Match
-            selected_item = await self.rag_service.process_item(target_item)
-            
-            if not selected_item or selected_item == "None":
-                print(f"No valid item selected from RagFlow for {target_item}.")
-                processed_results.append({
-                    "input_item": target_item,
-                    "selected_item": None,
-                    "demand_forecast": None,
-                    "message": "Could not find a matching item in the RagFlow candidates."
-                })
-                continue
-
-            # Query DB
-            print(f"Querying DB for selected item: {selected_item}")
-            forecast = get_demand_forecast(selected_item)
-            
-            processed_results.append({
-                "input_item": target_item,
-                "selected_item": selected_item,
-                "demand_forecast": forecast
-            })
+        # 2. Match Items
+        savings = SelectionSavings()
+        processed_results = await self._match_items(target_items, savings)
+
+        # 3. Query DB once for all matched items
+        await self._attach_forecasts(processed_results)
 
-        # 3. Format Answer
-        answer = self._format_response(processed_results)
+        # 4. Format Answer
+        with timed("format"):
+            answer = self._format_response(processed_results)
         
         final_output = {
             "results": processed_results,
-            "demand_forecast": answer
+            "demand_forecast": answer,
+            **savings.as_dict(),
         }
         
-        print("--- Pipeline Finished ---")
+        logger.debug("Pipeline finished (%d items).", len(processed_results))
         return final_output
     
+    async def run_stream(self, input_data: Union[str, List[str]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of run: yields each item's result as soon as it is done
+        (match + its own forecast lookup), then a final summary event.
+
+        Events:
+        - {"event": "item", "index": i, "total": n, "result": {...}}   (completion order)
+        - {"event": "summary", "results": [...], "demand_forecast": "...",
+           "llm_calls_avoided": n, "llm_latency_saved_ms": x}   (input order)
+        - {"event": "error", "error": "..."}
+        """
+        logger.debug("Starting Demand Forecast Pipeline (stream) with input: %s", input_data)
+        target_items = self._normalize_input(input_data)
+        if target_items is None:
+            yield {"event": "error", "error": "Invalid input format. Expected string or list."}
+            return
+
+        groups = self._group_items(target_items)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        savings = SelectionSavings()
+
+        async def _bounded(indexes: List[int]):
+            track_savings(savings)
+            async with semaphore:
+                result = await self._match_item_safe(target_items[indexes[0]])
+            await self._attach_forecasts([result])
+            return indexes, result
+
+        tasks = [asyncio.ensure_future(_bounded(indexes)) for indexes in groups.values()]
+        processed_results: List[Optional[Dict[str, Any]]] = [None] * len(target_items)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indexes, result = await next_done
+                for index in indexes:
+                    processed_results[index] = dict(result, input_item=target_items[index])
+                    yield {
+                        "event": "item",
+                        "index": index,
+                        "total": len(target_items),
+                        "result": processed_results[index]
+                    }
+        finally:
+            # consumer went away (client disconnect): stop the remaining work
+            for task in tasks:
+                task.cancel()
+
+        with timed("format"):
+            answer = self._format_response(processed_results)
+        yield {
+            "event": "summary",
+            "results": processed_results,
+            "demand_forecast": answer,
+            **savings.as_dict(),
+        }
+        logger.debug("Pipeline finished (%d items).", len(processed_results))
+
+    async def run_history(
+        self,
+        input_data: Union[str, List[str]],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        resolve: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Forecast series of the given items between start_date and end_date (inclusive).
+        Items are matched like in run (resolve=False takes them as exact categorylv5 names),
+        then all matched categories are read in one history query.
+
+        Returns {"start_date", "end_date", "rows": n, "llm_calls_avoided", "llm_latency_saved_ms",
+        "results": [...], "series":
+        {selected_item: {"forecast_date": [...], "demand_forecast": [...]}}}; each series is
+        keyed by the matched name, so items resolving to the same category share it.
+        """
+        logger.debug("Starting forecast history query with input: %s", input_data)
+        target_items = self._normalize_input(input_data)
+        if target_items is None:
+            return {"error": "Invalid input format. Expected string or list."}
+
+        savings = SelectionSavings()
+        if resolve:
+            results = await self._match_items(target_items, savings)
+        else:
+            results = [
+                {"input_item": item, "selected_item": item, "resolved_by": "input"}
+                for item in target_items
+            ]
+        for res in results:
+            res.pop("demand_forecast", None)
+
+        selected_items = [res["selected_item"] for res in results if res["selected_item"]]
+        with timed("db_lookup"):
+            series = await aget_forecast_history(selected_items, start_date, end_date)
+
+        logger.debug("Forecast history finished (%d items, %d series).", len(results), len(series))
+        return {
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
+            "rows": sum(len(column["forecast_date"]) for column in series.values()),
+            **savings.as_dict(),
+            "results": results,
+            "series": series,
+        }
+
+    async def _match_items(self, target_items: List[str], savings: SelectionSavings) -> List[Dict[str, Any]]:
+        """
+        Match every target item (fan-out bounded by concurrency, duplicates processed once);
+        results keep input order. Selection cache hits are added to `savings`.
+        """
+        groups = self._group_items(target_items)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _bounded(target_item: str) -> Dict[str, Any]:
+            track_savings(savings)
+            async with semaphore:
+                return await self._match_item_safe(target_item)
+
+        unique_results = await asyncio.gather(*(_bounded(target_items[idx[0]]) for idx in groups.values()))
+        processed_results: List[Dict[str, Any]] = [None] * len(target_items)
+        for indexes, result in zip(groups.values(), unique_results):
+            for i in indexes:
+                processed_results[i] = dict(result, input_item=target_items[i])
+        return processed_results
+
+    @staticmethod
+    def _normalize_input(input_data: Union[str, List[str]]) -> Optional[List[str]]:
+        """Split the input into target items; None if the format is not supported."""
+        if isinstance(input_data, str):
+            if "," in input_data:
+                return [item.strip() for item in input_data.split(",") if item.strip()]
+            return [input_data]
+        if isinstance(input_data, list):
+            return input_data
+        return None
+
+    @staticmethod
+    def _group_items(target_items: List[str]) -> Dict[str, List[int]]:
+        """
+        Group input positions by normalized item name so duplicates inside one request
+        ("Flap box, flap box") are processed once and fanned back out.
+        """
+        groups: Dict[str, List[int]] = {}
+        for i, item in enumerate(target_items):
+            groups.setdefault(normalize_item_name(item) or item, []).append(i)
+        count("coalesced", len(target_items) - len(groups), scope="duplicate")
+        return groups
+
+    async def _match_item_safe(self, target_item: str) -> Dict[str, Any]:
+        """
+        Run _match_item under the per-item timeout.
+        Errors are turned into a result entry so one bad item never cancels the others.
+        """
+        try:
+            with timed("match", target_item):
+                if self.item_timeout and self.item_timeout > 0:
+                    return await asyncio.wait_for(self._match_item(target_item), timeout=self.item_timeout)
+                return await self._match_item(target_item)
+        except asyncio.TimeoutError:
+            count("timeouts", stage="match")
+            logger.warning("Timed out matching item %r (timeout=%ss)", target_item, self.item_timeout)
+            return {
+                "input_item": target_item,
+                "selected_item": None,
+                "resolved_by": None,
+                "demand_forecast": None,
+                "message": f"Timed out after {self.item_timeout}s while matching the item."
+            }
+        except Exception as e:
+            count("errors", stage="match")
+            logger.warning("Error while matching item %r: %s", target_item, e)
+            return {
+                "input_item": target_item,
+                "selected_item": None,
+                "resolved_by": None,
+                "demand_forecast": None,
+                "message": f"Error while matching the item: {e}"
+            }
+
+    async def _match_item(self, target_item: str) -> Dict[str, Any]:
+        # Catalog pre-match / cache, else Retrieve + Select Best Match
+        # (shared with any concurrent run resolving the same normalized name)
+        key = normalize_item_name(target_item) or target_item
+        selected_item, resolved_by = await self.resolve_flight.do(
+            key, lambda: self.rag_service.resolve_item(target_item)
+        )
+
+        if not selected_item or selected_item == "None":
+            logger.debug("No valid item selected from RagFlow for %r.", target_item)
+            return {
+                "input_item": target_item,
+                "selected_item": None,
+                "resolved_by": resolved_by,
+                "demand_forecast": None,
+                "message": "Could not find a matching item in the RagFlow candidates."
+            }
+
+        return {
+            "input_item": target_item,
+            "selected_item": selected_item,
+            "resolved_by": resolved_by,
+            "demand_forecast": None
+        }
+
+    async def _attach_forecasts(self, results: List[Dict[str, Any]]) -> None:
+        """
+        Fetch the latest forecast of every matched item with a single batched query
+        (items already being fetched by a concurrent run are awaited instead)
+        and fill it into the result entries in place.
+        """
+        matched = [res for res in results if res["selected_item"]]
+        if not matched:
+            return
+
+        selected_items = [res["selected_item"] for res in matched]
+        logger.debug("Querying DB for selected items: %s", selected_items)
+        try:
+            with timed("db_lookup"):
+                forecasts = await self.forecast_flight.do_many(selected_items, aget_demand_forecasts)
+        except Exception as e:
+            count("errors", stage="db_lookup")
+            logger.warning("Error while querying demand forecasts: %s", e)
+            for res in matched:
+                res["message"] = f"Error while querying the demand forecast: {e}"
+            return
+
+        for res in matched:
+            res["demand_forecast"] = forecasts.get(res["selected_item"])
+
     def _format_response(self, results: List[Dict[str, Any]]) -> str:
         if not results:
             return "No results processed."
@@ -106,6 +333,28 @@ class DemandForecastPipeline:
         
         return "\n\n".join(lines)
 
+_shared_pipeline: Optional[DemandForecastPipeline] = None
+_shared_lock = threading.Lock()
+
+def get_shared_pipeline() -> DemandForecastPipeline:
+    """
+    Process-wide pipeline reused by the HTTP routes and the MCP tools, so the RagFlow /
+    LLM clients, their connection pools and the prompts are created once.
+    """
+    global _shared_pipeline
+    if _shared_pipeline is None:
+        # the stdio MCP server may build it from its warm-up thread while a tool call arrives
+        with _shared_lock:
+            if _shared_pipeline is None:
+                _shared_pipeline = DemandForecastPipeline()
+    return _shared_pipeline
+
+async def close_shared_pipeline() -> None:
+    global _shared_pipeline
+    if _shared_pipeline is not None:
+        await _shared_pipeline.aclose()
+        _shared_pipeline = None
+
 if __name__ == "__main__":
     async def main():
         pipeline = DemandForecastPipeline()
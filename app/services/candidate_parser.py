@@ -0,0 +1,269 @@
+import csv
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.core import config
+from app.core.metrics import count
+
+# where the chunk text lives on a retrieval result, in order of preference
+CONTENT_KEYS = ("content_with_weight", "content", "text_content")
+# parsed chunk field holding the candidate name the LLM has to answer with
+NAME_KEYS = ("categorylv5", "category", "item_name")
+
+
+def _norm_key(key: str) -> str:
+    return "".join(ch for ch in key.lower() if ch.isalnum())
+
+
+_NORM_CONTENT_KEYS = tuple(_norm_key(k) for k in CONTENT_KEYS)
+
+
+def _split(text: str) -> List[str]:
+    """Comma split; csv quoting rules only when the text actually contains quotes."""
+    if not text:
+        return []
+    if '"' in text:
+        try:
+            return next(csv.reader([text]), [])
+        except csv.Error:
+            pass
+    return text.split(",")
+
+
+def _lookup(mapping: Any, keys: Tuple[str, ...], norm_keys: Tuple[str, ...]) -> Any:
+    if not isinstance(mapping, dict) or not mapping:
+        return None
+    for key in keys:
+        if mapping.get(key) is not None:
+            return mapping[key]
+    # key variants ("Content", "text-content", ...)
+    normalized = {_norm_key(k): v for k, v in mapping.items() if isinstance(k, str)}
+    for key in norm_keys:
+        if normalized.get(key) is not None:
+            return normalized[key]
+    return None
+
+
+def _generic_content(candidate: Any) -> Any:
+    """Content of a result of unknown shape: top-level keys / attributes, then its metadata."""
+    if isinstance(candidate, dict):
+        value = _lookup(candidate, CONTENT_KEYS, _NORM_CONTENT_KEYS)
+        if value is not None:
+            return value
+        return _lookup(candidate.get("metadata"), CONTENT_KEYS, _NORM_CONTENT_KEYS)
+    for key in CONTENT_KEYS:
+        value = getattr(candidate, key, None)
+        if value is not None:
+            return value
+    return _lookup(getattr(candidate, "metadata", None), CONTENT_KEYS, _NORM_CONTENT_KEYS)
+
+
+class _Schema:
+    """Parsed chunk header: field names plus the columns of the candidate name and prompt fields."""
+
+    __slots__ = ("headers", "positions", "name_indexes", "_field_indexes")
+
+    def __init__(self, header_part: str):
+        self.headers = tuple(h.strip() for h in _split(header_part))
+        # header -> column; the last one wins on duplicate headers, like dict(zip(headers, values))
+        self.positions = {h: i for i, h in enumerate(self.headers)}
+        self.name_indexes = tuple(self.positions[k] for k in NAME_KEYS if k in self.positions)
+        self._field_indexes: Dict[Tuple[str, ...], Tuple[Tuple[str, int], ...]] = {}
+
+    def field_indexes(self, fields: Tuple[str, ...]) -> Tuple[Tuple[str, int], ...]:
+        indexes = self._field_indexes.get(fields)
+        if indexes is None:
+            indexes = self._field_indexes[fields] = tuple((f, self.positions[f]) for f in fields if f in self.positions)
+        return indexes
+
+
+class CandidateParser:
+    """
+    Turns retrieval results into the candidate lines of the selection prompt.
+
+    RagFlow chunk text looks like "header1,header2:value1,value2". The result shape
+    (which key holds the text) is detected once per candidate list, parsed headers are
+    cached per dataset (with the columns of the name and prompt fields), and each
+    candidate is rendered as one compact line, "name (field: value; ...)", straight
+    from its value row instead of a JSON object.
+    """
+
+    def __init__(self, max_schemas: int = 256):
+        self.max_schemas = max_schemas
+        self._schemas: Dict[str, Dict[str, _Schema]] = {}
+
+    def _schema(self, dataset_id: str, header_part: str) -> _Schema:
+        schemas = self._schemas.setdefault(dataset_id, {})
+        schema = schemas.get(header_part)
+        if schema is None:
+            if len(schemas) >= self.max_schemas:
+                schemas.clear()
+            schema = schemas[header_part] = _Schema(header_part)
+        return schema
+
+    def parse(self, text: str, dataset_id: str = "") -> Dict[str, str]:
+        """Parse "header1,...,headerN:value1,...,valueN" into {header: value}; {} if not in that form."""
+        if not text or ":" not in text:
+            return {}
+        header_part, value_part = text.split(":", 1)
+        headers = self._schema(dataset_id, header_part).headers
+        return {h: v.strip() for h, v in zip(headers, _split(value_part))}
+
+    @staticmethod
+    def name(parsed: Dict[str, str]) -> Optional[str]:
+        for key in NAME_KEYS:
+            if parsed.get(key):
+                return parsed[key]
+        return None
+
+    def render(self, text: str, dataset_id: str = "", fields: Tuple[str, ...] = ()) -> Tuple[Optional[str], str]:
+        """
+        (candidate name, prompt line) for a chunk: the name first, then the given fields that
+        are set and differ from it. Text that is not in header:value form or has no name
+        field comes back as is, with name None.
+        """
+        if not text or ":" not in text:
+            return None, text
+        header_part, value_part = text.split(":", 1)
+        schema = self._schema(dataset_id, header_part)
+        values = _split(value_part)
+        n = min(len(values), len(schema.headers))
+
+        name = None
+        for i in schema.name_indexes:
+            if i < n:
+                name = values[i].strip()
+                if name:
+                    break
+        if not name:
+            return None, text
+        extras = []
+        for field, i in schema.field_indexes(fields):
+            if i < n:
+                value = values[i].strip()
+                if value and value != name:
+                    extras.append(f"{field}: {value}")
+        return name, f"{name} ({'; '.join(extras)})" if extras else name
+
+    def iter_contents(self, candidates: List[Any]):
+        """Yield (candidate, content, dataset_id), detecting the result shape from the first candidate."""
+        if not candidates:
+            return
+        first = candidates[0]
+        key = None
+        if isinstance(first, dict):
+            key = next((k for k in CONTENT_KEYS if first.get(k) is not None), None)
+
+        for c in candidates:
+            if key is not None and type(c) is dict:
+                content = c.get(key)
+                dataset_id = c.get("dataset_id") or c.get("kb_id") or ""
+            else:
+                content = None
+                dataset_id = ""
+            if content is None:
+                content = _generic_content(c)
+            yield c, content, dataset_id
+
+
+def _dedupe_key(name: str) -> str:
+    """
+    Case and whitespace folded name. Candidate names come from one catalog column, so the
+    NFC / Thai typing folds of normalize_item_name (several times slower) find nothing more.
+    """
+    return " ".join(name.casefold().split())
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough prompt token count without a tokenizer: ~4 UTF-8 bytes per token, which also
+    covers Thai (3 bytes per character, roughly one token per character).
+    """
+    return len(text.encode("utf-8")) // 4 + 1
+
+
+def _similarity(candidate: Any) -> Optional[float]:
+    value = candidate.get("similarity") if isinstance(candidate, dict) else getattr(candidate, "similarity", None)
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class PrunedCandidates(NamedTuple):
+    text: str                   # candidate lines for the selection prompt
+    names: List[Optional[str]]  # candidate name per kept line (None for unstructured chunks)
+    shortcut: Optional[str]     # the single clear candidate, when the LLM call can be skipped
+    dropped: int
+
+
+class CandidatePruner:
+    """
+    Pre-LLM candidate stage: drops candidates below the similarity threshold, dedupes them
+    by case / whitespace folded name (keeping retrieval order), renders only the configured fields and
+    skips lines that would exceed the token budget (the first candidate always fits).
+    A single remaining candidate at or above the shortcut similarity is returned as the
+    answer so the caller can skip the LLM.
+    """
+
+    def __init__(
+        self,
+        parser: Optional[CandidateParser] = None,
+        min_similarity: Optional[float] = None,
+        fields: Optional[Sequence[str]] = None,
+        token_budget: Optional[int] = None,
+        shortcut_similarity: Optional[float] = None,
+    ):
+        self.parser = parser or CandidateParser()
+        self.min_similarity = config.CANDIDATE_MIN_SIMILARITY if min_similarity is None else min_similarity
+        self.fields = tuple(config.CANDIDATE_FIELDS if fields is None else fields)
+        self.token_budget = config.CANDIDATE_TOKEN_BUDGET if token_budget is None else token_budget
+        self.shortcut_similarity = (
+            config.CANDIDATE_SHORTCUT_SIMILARITY if shortcut_similarity is None else shortcut_similarity
+        )
+
+    def _line(self, candidate: Any, content: Any, dataset_id: str) -> Tuple[Optional[str], str]:
+        if not isinstance(content, str) or not content:
+            return None, str(candidate)
+        return self.parser.render(content, dataset_id, self.fields)
+
+    def prune(self, candidates: List[Any]) -> PrunedCandidates:
+        seen = set()
+        names: List[Optional[str]] = []
+        lines: List[str] = []
+        similarities: List[Optional[float]] = []
+        dropped = {"similarity": 0, "duplicate": 0, "budget": 0}
+        tokens = 0
+
+        for c, content, dataset_id in self.parser.iter_contents(candidates):
+            similarity = _similarity(c)
+            if similarity is not None and similarity < self.min_similarity:
+                dropped["similarity"] += 1
+                continue
+            name, line = self._line(c, content, dataset_id)
+            key = _dedupe_key(name) if name else line
+            if key in seen:
+                dropped["duplicate"] += 1
+                continue
+            line_tokens = estimate_tokens(line) + 1
+            if lines and self.token_budget > 0 and tokens + line_tokens > self.token_budget:
+                dropped["budget"] += 1
+                continue
+            seen.add(key)
+            tokens += line_tokens
+            names.append(name)
+            lines.append(line)
+            similarities.append(similarity)
+
+        for reason, n in dropped.items():
+            if n:
+                count("candidates_dropped", n, reason=reason)
+
+        shortcut = None
+        if len(lines) == 1 and names[0] and similarities[0] is not None and similarities[0] >= self.shortcut_similarity:
+            shortcut = names[0]
+        return PrunedCandidates(
+            text="\n".join(f"- {line}" for line in lines),
+            names=names,
+            shortcut=shortcut,
+            dropped=sum(dropped.values()),
+        )
@@ -0,0 +1,183 @@
+import csv
+import logging
+import threading
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from app.core import config
+from app.core.text import normalize_item_name, compact_item_name
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogMatch(NamedTuple):
+    name: str       # categorylv5 value as stored in the DB
+    method: str     # "exact" | "normalized" | "fuzzy"
+    score: float
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CatalogIndex:
+    """
+    In-memory index of known categorylv5 names used to resolve inputs without RagFlow / LLM:
+    - exact: input equals a catalog name
+    - normalized: equal after normalize_item_name / compact_item_name
+    - fuzzy: character-trigram candidates re-scored with an edit-distance ratio
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = list(dict.fromkeys(n.strip() for n in names if n and n.strip()))
+        self._exact = set(self.names)
+        self._by_normalized: Dict[str, str] = {}
+        self._by_compact: Dict[str, str] = {}
+        self._normalized: List[str] = []
+        self._grams: List[Set[str]] = []
+        self._postings: Dict[str, List[int]] = {}
+        for idx, name in enumerate(self.names):
+            norm = normalize_item_name(name)
+            self._by_normalized.setdefault(norm, name)
+            self._by_compact.setdefault(compact_item_name(name), name)
+            grams = _trigrams(norm)
+            self._normalized.append(norm)
+            self._grams.append(grams)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(idx)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def from_csv(cls, path: str, column: str = "categorylv5") -> "CatalogIndex":
+        with open(path, mode="r", encoding="utf-8") as f:
+            return cls(row.get(column, "") for row in csv.DictReader(f))
+
+    @classmethod
+    def from_db(cls) -> "CatalogIndex":
+        from app.services.db_service import get_distinct_categories
+        return cls(get_distinct_categories())
+
+    def match_exact(self, item_name: str) -> Optional[CatalogMatch]:
+        if item_name in self._exact:
+            return CatalogMatch(item_name, "exact", 1.0)
+        name = self._by_normalized.get(normalize_item_name(item_name)) or \
+            self._by_compact.get(compact_item_name(item_name))
+        if name:
+            return CatalogMatch(name, "normalized", 1.0)
+        return None
+
+    def match_fuzzy(self, item_name: str, min_score: float, min_margin: float = 0.0, shortlist: int = 8) -> Optional[CatalogMatch]:
+        norm = normalize_item_name(item_name)
+        grams = _trigrams(norm)
+        shared = Counter()
+        for gram in grams:
+            for idx in self._postings.get(gram, ()):
+                shared[idx] += 1
+        if not shared:
+            return None
+
+        # Dice coefficient on trigrams to shortlist, edit-distance ratio to decide
+        dice = sorted(
+            ((2 * count / (len(grams) + len(self._grams[idx])), idx) for idx, count in shared.items()),
+            reverse=True,
+        )[:shortlist]
+        scored = sorted(
+            ((SequenceMatcher(None, norm, self._normalized[idx], autojunk=False).ratio(), idx) for _, idx in dice),
+            reverse=True,
+        )
+        best_score, best_idx = scored[0]
+        runner_up = scored[1][0] if len(scored) > 1 else 0.0
+        if best_score < min_score or best_score - runner_up < min_margin:
+            return None
+        return CatalogMatch(self.names[best_idx], "fuzzy", round(best_score, 4))
+
+    def match(self, item_name: str, min_score: float = None, min_margin: float = None) -> Optional[CatalogMatch]:
+        """Return a high-confidence catalog match, or None when RagFlow + LLM should decide."""
+        if not item_name or not self.names:
+            return None
+        found = self.match_exact(item_name)
+        if found:
+            return found
+        min_score = config.PREMATCH_MIN_SCORE if min_score is None else min_score
+        min_margin = config.PREMATCH_MIN_MARGIN if min_margin is None else min_margin
+        if min_score > 1:
+            return None
+        return self.match_fuzzy(item_name, min_score, min_margin)
+
+
+_shared_index: Optional[CatalogIndex] = None
+_shared_lock = threading.Lock()
+
+
+_reloader: Optional[threading.Thread] = None
+_reloader_stop = threading.Event()
+
+
+def load_catalog_index(source: str = None) -> CatalogIndex:
+    """
+    (Re)build the process-wide catalog index from CATALOG_SOURCE:
+    "csv" -> CATALOG_CSV_PATH, "db" -> SELECT DISTINCT categorylv5, "" / "none" -> empty index.
+    A reload that fails, or finds the same names, keeps the current index object.
+    """
+    global _shared_index
+    source = (config.CATALOG_SOURCE if source is None else source).lower()
+    try:
+        if source == "db":
+            index = CatalogIndex.from_db()
+        elif source == "csv":
+            index = CatalogIndex.from_csv(config.CATALOG_CSV_PATH)
+        else:
+            index = CatalogIndex([])
+    except Exception as e:
+        if _shared_index is not None:
+            logger.warning("Could not reload catalog from %r: %s. Keeping the current index.", source, e)
+            return _shared_index
+        logger.warning("Could not load catalog from %r: %s. Pre-matching disabled.", source, e)
+        index = CatalogIndex([])
+    with _shared_lock:
+        # unchanged: followers (local retriever) compare by identity and skip a resync
+        if _shared_index is not None and _shared_index.names == index.names:
+            return _shared_index
+        logger.info("Loaded %d categorylv5 names from %r.", len(index), source)
+        _shared_index = index
+    return index
+
+
+def _reload_loop(interval: float) -> None:
+    while not _reloader_stop.wait(interval):
+        load_catalog_index()
+
+
+def start_catalog_reloader(interval: float = None) -> Optional[threading.Thread]:
+    """
+    Reload the shared index every CATALOG_RELOAD_INTERVAL seconds in a daemon thread, so
+    names added to the catalog reach pre-matching and the local retriever (which indexes
+    only the new names) without a restart. 0 disables it; a second call is a no-op.
+    """
+    global _reloader
+    interval = config.CATALOG_RELOAD_INTERVAL if interval is None else interval
+    if interval <= 0 or (_reloader is not None and _reloader.is_alive()):
+        return None
+    _reloader_stop.clear()
+    _reloader = threading.Thread(target=_reload_loop, args=(interval,), name="catalog-reload", daemon=True)
+    _reloader.start()
+    return _reloader
+
+
+def stop_catalog_reloader() -> None:
+    global _reloader
+    _reloader_stop.set()
+    _reloader = None
+
+
+def get_catalog_index() -> CatalogIndex:
+    if _shared_index is None:
+        with _shared_lock:
+            loaded = _shared_index is not None
+        if not loaded:
+            return load_catalog_index()
+    return _shared_index
@@ -1,49 +1,576 @@
+import time
+import uuid
+import atexit
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Optional, Dict, Any, List
+from datetime import date
+from decimal import Decimal
+from functools import partial
+from typing import Optional, Dict, Any, List, Callable, Tuple, TypeVar
 import psycopg2
+import psycopg2.errors
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 
 from app.core import config
+from app.core.cache import TTLCache, SharedCache
+from app.core.metrics import timed, count, add_gauge
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+FORECAST_TABLE = "taokae_internal_data.demand_forecast"
+# one row per categorylv5 with its latest forecast, maintained by app.services.forecast_snapshot
+SNAPSHOT_TABLE = "taokae_internal_data.demand_forecast_latest"
+
+_pool: Optional[ThreadedConnectionPool] = None
+_pool_slots: Optional[threading.BoundedSemaphore] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+# monotonic time of the last failed pool open; further opens fail fast for PG_RECONNECT_INTERVAL
+_pool_failed_at: Optional[float] = None
+
+# latest forecast per categorylv5; None results are cached too ("no forecast for this item")
+_forecast_cache = TTLCache(maxsize=config.FORECAST_CACHE_SIZE, ttl=config.FORECAST_CACHE_TTL)
+_MISSING = object()
+# second tier shared with the other worker processes (FORECAST_CACHE_PATH), opened on first use
+_shared_forecasts: Optional[SharedCache] = None
+_shared_forecasts_lock = threading.Lock()
+# same file: token of the last invalidation by any worker; a token other than the one this
+# process saw last means another worker cleared the cache, so the memory tier is dropped too
+_shared_generation: Optional[SharedCache] = None
+_shared_generation_seen: Optional[str] = None
+# bumped whenever the cache is invalidated so lookups started before that don't refill stale rows
+_cache_generation = 0
+_latest_forecast_date = None
+_last_freshness_check = 0.0
+_freshness_lock = threading.Lock()
+# monotonic time the snapshot table was last found missing (reads fall back to the history table)
+_snapshot_missing_at: Optional[float] = None
+# the snapshot is older than the history (not refreshed yet): read the history instead
+_snapshot_stale = False
+# background thread running forecast_snapshot.refresh_snapshot, at most one per process
+_snapshot_refresher: Optional[threading.Thread] = None
+_snapshot_refresher_lock = threading.Lock()
+
+
+def init_pool(minconn: int = None, maxconn: int = None) -> None:
+    """
+    Open the shared connection pool and the DB worker threads.
+    Safe to call more than once; the first call wins. Connects (blocking), so async
+    code reaches it through run_in_db_executor only. After a failed open, calls within
+    PG_RECONNECT_INTERVAL raise right away instead of waiting on the connect timeout again.
+    """
+    global _pool, _pool_slots, _executor, _pool_failed_at
+    with _pool_lock:
+        if _pool is not None:
+            return
+        if _pool_failed_at is not None:
+            retry_in = _pool_failed_at + config.PG_RECONNECT_INTERVAL - time.monotonic()
+            if retry_in > 0:
+                raise psycopg2.OperationalError(
+                    f"database unavailable, next connection attempt in {retry_in:.1f}s"
+                )
+        minconn = config.PG_POOL_MIN if minconn is None else minconn
+        maxconn = config.PG_POOL_MAX if maxconn is None else maxconn
+        maxconn = max(1, maxconn)
+        minconn = max(0, min(minconn, maxconn))
+        try:
+            _pool = ThreadedConnectionPool(
+                minconn,
+                maxconn,
+                host=config.PG_HOST,
+                port=config.PG_PORT,
+                user=config.PG_USER,
+                password=config.PG_PASSWORD,
+                dbname=config.PG_DBNAME,
+                connect_timeout=config.PG_CONNECT_TIMEOUT,
+            )
+        except psycopg2.OperationalError:
+            _pool_failed_at = time.monotonic()
+            raise
+        _pool_failed_at = None
+        # ThreadedConnectionPool raises when exhausted, so callers wait on a slot instead
+        _pool_slots = threading.BoundedSemaphore(maxconn)
+        # one worker per connection: async callers never queue on a busy pool thread
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=maxconn, thread_name_prefix="pg")
+        logger.info("Connection pool opened (min=%d, max=%d).", minconn, maxconn)
+
+
+def close_pool() -> None:
+    """Close every pooled connection and stop the DB worker threads."""
+    global _pool, _pool_slots, _executor
+    with _pool_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        if _pool is not None:
+            _pool.closeall()
+            logger.info("Connection pool closed.")
+        _pool, _pool_slots, _executor = None, None, None
+
+
+atexit.register(close_pool)
+
+
+def _get_pool() -> ThreadedConnectionPool:
+    # lazy init for entry points without a startup hook (stdio MCP server, scripts)
+    if _pool is None:
+        init_pool()
+    return _pool
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # the DB threads exist before the pool does: the pool is opened on one of them
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, config.PG_POOL_MAX), thread_name_prefix="pg")
+    return _executor
+
 
 @contextmanager
 def pg_conn():
-    conn = psycopg2.connect(
-        host=config.PG_HOST,
-        port=config.PG_PORT,
-        user=config.PG_USER,
-        password=config.PG_PASSWORD,
-        dbname=config.PG_DBNAME,
-    )
+    pool = _get_pool()
+    slots = _pool_slots
+    slots.acquire()
+    conn = None
+    broken = False
     try:
+        conn = pool.getconn()
         yield conn
         conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # connection is unusable (server restart, network drop): drop it from the pool
+        broken = True
+        raise
     except Exception:
-        conn.rollback()
+        if conn is not None and not conn.closed:
+            conn.rollback()
         raise
     finally:
-        conn.close()
+        if conn is not None:
+            pool.putconn(conn, close=broken or bool(conn.closed))
+        slots.release()
+
+
+async def run_in_db_executor(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a blocking DB function on the dedicated DB threads so the event loop
+    (FastAPI / MCP handlers) is never blocked on database I/O, including opening
+    the pool when it is not open yet.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(fn, *args, **kwargs))
+
+def _use_snapshot() -> bool:
+    if not config.FORECAST_USE_SNAPSHOT or _snapshot_stale:
+        return False
+    # retry a missing snapshot now and then so a later refresh run is picked up without a restart
+    return _snapshot_missing_at is None or time.monotonic() - _snapshot_missing_at > config.FORECAST_CACHE_CHECK_INTERVAL
+
+def _query_forecasts(snapshot_sql: str, history_sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+    """
+    Run a latest-forecast query against the snapshot table, or against the history
+    table when the snapshot is disabled or has not been created yet.
+    """
+    global _snapshot_missing_at
+    if _use_snapshot():
+        try:
+            with pg_conn() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(snapshot_sql, params)
+                    rows = [dict(row) for row in cur.fetchall()]
+            _snapshot_missing_at = None
+            return rows
+        except psycopg2.errors.UndefinedTable:
+            if _snapshot_missing_at is None:
+                logger.warning(
+                    "%s does not exist, reading latest forecasts from %s "
+                    "(create it with: python -m app.services.forecast_snapshot).",
+                    SNAPSHOT_TABLE, FORECAST_TABLE,
+                )
+            _snapshot_missing_at = time.monotonic()
+
+    with pg_conn() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(history_sql, params)
+            return [dict(row) for row in cur.fetchall()]
+
+def get_latest_forecast_date():
+    """Return the newest forecast_date being served (None if there are no forecasts)."""
+    rows = _query_forecasts(
+        f"SELECT max(forecast_date) AS forecast_date FROM {SNAPSHOT_TABLE}",
+        f"SELECT max(forecast_date) AS forecast_date FROM {FORECAST_TABLE}",
+    )
+    return rows[0]["forecast_date"] if rows else None
+
+def _max_forecast_date(table: str):
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT max(forecast_date) FROM {table}")
+            return cur.fetchone()[0]
+
+def _refresh_snapshot_in_background() -> None:
+    """Run refresh_snapshot on its own thread; lookups keep reading the history until it commits."""
+    global _snapshot_refresher
+
+    def run():
+        global _snapshot_stale, _snapshot_refresher
+        from app.services.forecast_snapshot import refresh_snapshot
+        try:
+            refresh_snapshot()
+            _snapshot_stale = False
+            logger.info("%s refreshed, latest forecasts are read from it again.", SNAPSHOT_TABLE)
+        except Exception as e:
+            logger.warning("Could not refresh %s: %s", SNAPSHOT_TABLE, e)
+        finally:
+            _snapshot_refresher = None
+
+    with _snapshot_refresher_lock:
+        if _snapshot_refresher is not None:
+            return
+        _snapshot_refresher = threading.Thread(target=run, name="forecast-snapshot-refresh", daemon=True)
+        _snapshot_refresher.start()
+
+def _sync_snapshot(history_latest) -> None:
+    """
+    Check whether the history holds a newer batch than the snapshot. If so, read latest
+    forecasts from the history until the snapshot has caught up, and start a background
+    refresh of it (FORECAST_SNAPSHOT_AUTO_REFRESH); the lookup that noticed does not wait.
+    """
+    global _snapshot_stale
+    if not config.FORECAST_USE_SNAPSHOT or history_latest is None:
+        return
+    try:
+        snapshot_latest = _max_forecast_date(SNAPSHOT_TABLE)
+    except psycopg2.errors.UndefinedTable:
+        # no snapshot yet: _query_forecasts already reads the history
+        return
+    if snapshot_latest is not None and snapshot_latest >= history_latest:
+        _snapshot_stale = False
+        return
+
+    if not _snapshot_stale:
+        logger.warning(
+            "%s is behind %s (forecast_date %s < %s), reading latest forecasts from the history "
+            "until it is refreshed%s.",
+            SNAPSHOT_TABLE, FORECAST_TABLE, snapshot_latest, history_latest,
+            "" if config.FORECAST_SNAPSHOT_AUTO_REFRESH else " (python -m app.services.forecast_snapshot)",
+        )
+    _snapshot_stale = True
+    if config.FORECAST_SNAPSHOT_AUTO_REFRESH:
+        _refresh_snapshot_in_background()
+
+def check_forecast_freshness(force: bool = False) -> bool:
+    """
+    Compare the history's max(forecast_date) with the value seen last time and, when a new
+    forecast batch has landed, bring the snapshot up to date and clear the forecast cache.
+    Runs at most once per FORECAST_CACHE_CHECK_INTERVAL unless force=True.
+    Returns True if the cache was invalidated.
+    """
+    global _latest_forecast_date, _last_freshness_check
+    interval = config.FORECAST_CACHE_CHECK_INTERVAL
+    if not force:
+        if interval <= 0:
+            return False
+        if time.monotonic() - _last_freshness_check < interval:
+            return False
+
+    # only one thread runs the check; the others keep serving from the cache
+    if not _freshness_lock.acquire(blocking=False):
+        return False
+    try:
+        _last_freshness_check = time.monotonic()
+        latest = _max_forecast_date(FORECAST_TABLE)
+        stale = _latest_forecast_date is not None and latest != _latest_forecast_date
+        first = _latest_forecast_date is None
+        _latest_forecast_date = latest
+        if stale or first or _snapshot_stale:
+            _sync_snapshot(latest)
+        if stale:
+            invalidate_forecast_cache()
+            logger.info("New forecast batch detected (forecast_date=%s), forecast cache cleared.", latest)
+        return stale
+    except Exception as e:
+        logger.warning("Could not check latest forecast_date: %s", e)
+        return False
+    finally:
+        _freshness_lock.release()
+
+def _get_shared_forecasts() -> Optional[SharedCache]:
+    global _shared_forecasts, _shared_generation
+    if not config.FORECAST_CACHE_PATH or config.FORECAST_CACHE_SIZE <= 0:
+        return None
+    if _shared_forecasts is None:
+        with _shared_forecasts_lock:
+            if _shared_forecasts is None:
+                _shared_forecasts = SharedCache(
+                    config.FORECAST_CACHE_PATH,
+                    "forecasts",
+                    ttl=config.FORECAST_CACHE_TTL,
+                    # the shared tier serves every worker, so it may hold more than one worker's memory tier
+                    maxsize=config.FORECAST_CACHE_SIZE * 4,
+                )
+                _shared_generation = SharedCache(config.FORECAST_CACHE_PATH, "forecast_generation")
+                add_gauge("forecast_cache_shared", _shared_forecasts.stats)
+    return _shared_forecasts
+
+def _sync_shared_generation() -> None:
+    """Drop the memory tier if another worker invalidated the cache since the last check."""
+    global _cache_generation, _shared_generation_seen
+    if _shared_generation is None:
+        return
+    token = _shared_generation.get("generation")
+    if token != _shared_generation_seen:
+        _shared_generation_seen = token
+        _cache_generation += 1
+        _forecast_cache.clear()
+
+def invalidate_forecast_cache() -> None:
+    """
+    Clear the forecast cache. The shared tier is cleared and a new invalidation token is
+    stored next to it, so the other workers drop their memory tier on their next lookup.
+    """
+    global _cache_generation, _shared_generation_seen
+    _cache_generation += 1
+    _forecast_cache.clear()
+    shared = _get_shared_forecasts()
+    if shared is not None:
+        shared.clear()
+        _shared_generation_seen = uuid.uuid4().hex
+        _shared_generation.set("generation", _shared_generation_seen)
+
+def get_forecast_cache_stats() -> Dict[str, Any]:
+    stats = _forecast_cache.stats()
+    stats["latest_forecast_date"] = str(_latest_forecast_date) if _latest_forecast_date else None
+    shared = _get_shared_forecasts()
+    if shared is not None:
+        stats["shared"] = shared.stats()
+    return stats
+
+add_gauge("forecast_cache", _forecast_cache.stats)
+
+def _cached_forecasts(names: List[str]) -> Tuple[Dict[str, Optional[Dict[str, Any]]], List[str]]:
+    """Look names up in the memory tier, then the shared tier. Returns (found, missing)."""
+    if _get_shared_forecasts() is not None:
+        _sync_shared_generation()
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    missing = []
+    for name in names:
+        cached = _forecast_cache.get(name, _MISSING)
+        if cached is _MISSING:
+            missing.append(name)
+        else:
+            results[name] = cached
+    count("cache_hits", len(results), cache="forecast")
+    count("cache_misses", len(missing), cache="forecast")
+
+    shared = _get_shared_forecasts() if missing else None
+    if shared is not None:
+        generation = _cache_generation
+        found = shared.get_many(missing)
+        count("cache_hits", len(found), cache="forecast_shared")
+        count("cache_misses", len(missing) - len(found), cache="forecast_shared")
+        if generation == _cache_generation:
+            for name, record in found.items():
+                _forecast_cache.set(name, record)
+        results.update(found)
+        missing = [name for name in missing if name not in found]
+    return results, missing
+
+def _cache_forecasts(records: Dict[str, Optional[Dict[str, Any]]], generation: int) -> None:
+    # skip rows read before an invalidation (here or in another worker) so they don't refill
+    # the cache with stale data
+    _sync_shared_generation()
+    if generation != _cache_generation:
+        return
+    for name, record in records.items():
+        _forecast_cache.set(name, record)
+    shared = _get_shared_forecasts()
+    if shared is not None:
+        shared.set_many(records)
 
 def get_demand_forecast(item_name: str) -> Optional[Dict[str, Any]]:
     """
     Get the most recent demand forecast for a specific item (categorylv5).
     Returns a single record with forecast details, or None if not found.
+    Served from the forecast cache when possible.
     """
-    sql = """
+    check_forecast_freshness()
+    cached, missing = _cached_forecasts([item_name])
+    if not missing:
+        return cached[item_name]
+
+    snapshot_sql = f"""
+        SELECT forecast_date, categorylv5, demand_forecast
+        FROM {SNAPSHOT_TABLE}
+        WHERE categorylv5 = %s
+    """
+    history_sql = f"""
         SELECT 
             forecast_date,
             categorylv5,
             demand_forecast
-        FROM taokae_internal_data.demand_forecast
+        FROM {FORECAST_TABLE}
         WHERE categorylv5 = %s
         ORDER BY forecast_date DESC
         LIMIT 1
     """
     
-    with pg_conn() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(sql, (item_name,))
-            row = cur.fetchone()
-            return dict(row) if row else None
+    generation = _cache_generation
+    with timed("db_query", item_name):
+        rows = _query_forecasts(snapshot_sql, history_sql, (item_name,))
+    record = rows[0] if rows else None
+
+    _cache_forecasts({item_name: record}, generation)
+    return record
+
+def get_demand_forecasts(item_names: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Get the most recent demand forecast for many items (categorylv5) in one round trip.
+    Returns a dict mapping every requested item name -> record (None if not found).
+    Only the names missing from the forecast cache are queried.
+    """
+    names = list(dict.fromkeys(n for n in item_names if n))
+    if not names:
+        return {}
+
+    check_forecast_freshness()
+    results, missing = _cached_forecasts(names)
+    if not missing:
+        return results
+
+    snapshot_sql = f"""
+        SELECT forecast_date, categorylv5, demand_forecast
+        FROM {SNAPSHOT_TABLE}
+        WHERE categorylv5 = ANY(%s)
+    """
+    history_sql = f"""
+        SELECT DISTINCT ON (categorylv5)
+            forecast_date,
+            categorylv5,
+            demand_forecast
+        FROM {FORECAST_TABLE}
+        WHERE categorylv5 = ANY(%s)
+        ORDER BY categorylv5, forecast_date DESC
+    """
+
+    generation = _cache_generation
+    fetched: Dict[str, Optional[Dict[str, Any]]] = {name: None for name in missing}
+    with timed("db_query"):
+        for row in _query_forecasts(snapshot_sql, history_sql, (missing,)):
+            fetched[row["categorylv5"]] = row
+
+    _cache_forecasts(fetched, generation)
+    results.update(fetched)
+    return results
+
+def get_distinct_categories() -> List[str]:
+    """All categorylv5 values that have at least one forecast (used to build the local catalog index)."""
+    rows = _query_forecasts(
+        f"SELECT categorylv5 FROM {SNAPSHOT_TABLE}",
+        f"SELECT DISTINCT categorylv5 FROM {FORECAST_TABLE} WHERE categorylv5 IS NOT NULL",
+    )
+    return [row["categorylv5"] for row in rows]
+
+def get_forecast_history(
+    item_names: List[str],
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    max_rows: Optional[int] = None,
+) -> Dict[str, Dict[str, list]]:
+    """
+    Forecast series of many items (categorylv5) between start_date and end_date (inclusive,
+    either bound may be open), in columnar form:
+
+        {name: {"forecast_date": ["2024-01-01", ...], "demand_forecast": [12.0, ...]}}
+
+    Every requested name is present (empty arrays when it has no rows in the range).
+    Rows come from a server-side cursor in batches of FORECAST_HISTORY_ITERSIZE and are
+    appended straight to the arrays, so no per-row dicts are built and memory stays at
+    one batch plus the result. Raises ValueError when more than max_rows rows match
+    (default FORECAST_HISTORY_MAX_ROWS).
+    """
+    names = list(dict.fromkeys(n for n in item_names if n))
+    series: Dict[str, Dict[str, list]] = {
+        name: {"forecast_date": [], "demand_forecast": []} for name in names
+    }
+    if not names:
+        return series
+    if start_date and end_date and start_date > end_date:
+        raise ValueError(f"start_date {start_date} is after end_date {end_date}.")
+    if max_rows is None:
+        max_rows = config.FORECAST_HISTORY_MAX_ROWS
+
+    # only add the bounds that are set so the (categorylv5, forecast_date) index range applies
+    conditions = ["categorylv5 = ANY(%s)"]
+    params: List[Any] = [names]
+    if start_date:
+        conditions.append("forecast_date >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("forecast_date <= %s")
+        params.append(end_date)
+    sql = f"""
+        SELECT categorylv5, forecast_date, demand_forecast
+        FROM {FORECAST_TABLE}
+        WHERE {" AND ".join(conditions)}
+        ORDER BY categorylv5, forecast_date
+    """
+
+    rows = 0
+    current = None
+    dates: list = []
+    values: list = []
+    with timed("db_query"):
+        with pg_conn() as conn:
+            # named cursor = server-side: the result set is fetched itersize rows at a time
+            with conn.cursor(name="forecast_history") as cur:
+                cur.itersize = config.FORECAST_HISTORY_ITERSIZE
+                cur.execute(sql, params)
+                for name, forecast_date, value in cur:
+                    rows += 1
+                    if rows > max_rows:
+                        raise ValueError(
+                            f"More than {max_rows} forecast rows match; narrow the date range or the item list."
+                        )
+                    if name != current:
+                        current = name
+                        dates = series[name]["forecast_date"]
+                        values = series[name]["demand_forecast"]
+                    dates.append(forecast_date.isoformat() if forecast_date is not None else None)
+                    values.append(float(value) if isinstance(value, Decimal) else value)
+    count("forecast_history_rows", rows)
+    return series
+
+async def aget_demand_forecast(item_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Async version of get_demand_forecast, executed on the DB worker threads.
+    """
+    return await run_in_db_executor(get_demand_forecast, item_name)
+
+async def aget_demand_forecasts(item_names: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Async version of get_demand_forecasts, executed on the DB worker threads.
+    """
+    return await run_in_db_executor(get_demand_forecasts, item_names)
+
+async def aget_forecast_history(
+    item_names: List[str],
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    max_rows: Optional[int] = None,
+) -> Dict[str, Dict[str, list]]:
+    """
+    Async version of get_forecast_history, executed on the DB worker threads.
+    """
+    return await run_in_db_executor(get_forecast_history, item_names, start_date, end_date, max_rows)
 
 def get_forecast_for_item(item_name: str) -> Optional[Dict[str, Any]]:
     """
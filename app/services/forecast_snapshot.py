@@ -0,0 +1,128 @@
+"""
+Latest-forecast snapshot: one row per categorylv5 holding its most recent forecast,
+so lookups are a primary-key read instead of a sort over the whole forecast history.
+
+    python -m app.services.forecast_snapshot              # create if needed, then incremental refresh
+    python -m app.services.forecast_snapshot --full       # rebuild from the whole history
+    python -m app.services.forecast_snapshot --index-source
+
+An incremental refresh only reads history rows from the newest forecast_date already in the
+snapshot onwards (that date is re-read so a batch that was still loading is completed).
+Categories that disappear from the history are only dropped by --full.
+
+Run it after each forecast load (or from the loading job). Serving processes also check
+the history's max(forecast_date) every FORECAST_CACHE_CHECK_INTERVAL seconds; while the
+snapshot is behind they read latest forecasts from the history table, and start an
+incremental refresh on a background thread (FORECAST_SNAPSHOT_AUTO_REFRESH, needs write
+access to the snapshot table) instead of making a lookup wait for it.
+"""
+import time
+import logging
+import argparse
+from typing import Dict, Any
+
+from app.services.db_service import pg_conn, invalidate_forecast_cache, FORECAST_TABLE, SNAPSHOT_TABLE
+
+logger = logging.getLogger(__name__)
+
+_FULL_SQL = f"""
+    INSERT INTO {SNAPSHOT_TABLE} (forecast_date, categorylv5, demand_forecast)
+    SELECT DISTINCT ON (categorylv5)
+        forecast_date,
+        categorylv5,
+        demand_forecast
+    FROM {FORECAST_TABLE}
+    WHERE categorylv5 IS NOT NULL
+    ORDER BY categorylv5, forecast_date DESC
+"""
+
+_INCREMENTAL_SQL = f"""
+    INSERT INTO {SNAPSHOT_TABLE} AS s (forecast_date, categorylv5, demand_forecast)
+    SELECT DISTINCT ON (categorylv5)
+        forecast_date,
+        categorylv5,
+        demand_forecast
+    FROM {FORECAST_TABLE}
+    WHERE forecast_date >= %s AND categorylv5 IS NOT NULL
+    ORDER BY categorylv5, forecast_date DESC
+    ON CONFLICT (categorylv5) DO UPDATE SET
+        forecast_date = EXCLUDED.forecast_date,
+        demand_forecast = EXCLUDED.demand_forecast,
+        refreshed_at = now()
+    WHERE s.forecast_date <= EXCLUDED.forecast_date
+      AND (s.forecast_date, s.demand_forecast) IS DISTINCT FROM (EXCLUDED.forecast_date, EXCLUDED.demand_forecast)
+"""
+
+
+def _ensure_snapshot(cur, index_source: bool = False) -> bool:
+    """Create the snapshot table (column types copied from the history table). Returns True if created."""
+    if index_source:
+        # lets incremental refreshes range-scan the new forecast_date instead of reading all history
+        cur.execute(f"CREATE INDEX IF NOT EXISTS demand_forecast_forecast_date_idx ON {FORECAST_TABLE} (forecast_date)")
+
+    cur.execute("SELECT to_regclass(%s)", (SNAPSHOT_TABLE,))
+    if cur.fetchone()[0] is not None:
+        return False
+    cur.execute(f"""
+        CREATE TABLE {SNAPSHOT_TABLE} AS
+        SELECT forecast_date, categorylv5, demand_forecast FROM {FORECAST_TABLE}
+        WITH NO DATA
+    """)
+    cur.execute(f"""
+        ALTER TABLE {SNAPSHOT_TABLE}
+            ADD COLUMN refreshed_at timestamptz NOT NULL DEFAULT now(),
+            ADD PRIMARY KEY (categorylv5)
+    """)
+    cur.execute(f"CREATE INDEX demand_forecast_latest_forecast_date_idx ON {SNAPSHOT_TABLE} (forecast_date)")
+    logger.info("Created %s.", SNAPSHOT_TABLE)
+    return True
+
+
+def refresh_snapshot(full: bool = False, index_source: bool = False) -> Dict[str, Any]:
+    """
+    Bring the snapshot up to date with the forecast history in one transaction
+    (readers keep seeing the previous snapshot until it commits).
+    Returns {"mode", "since", "rows", "seconds"}.
+    """
+    start = time.perf_counter()
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            # one refresh at a time; a second caller waits and then finds little left to do
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (SNAPSHOT_TABLE,))
+            created = _ensure_snapshot(cur, index_source)
+
+            since = None
+            if not (full or created):
+                cur.execute(f"SELECT max(forecast_date) FROM {SNAPSHOT_TABLE}")
+                since = cur.fetchone()[0]
+
+            if since is None:
+                mode = "full"
+                cur.execute(f"DELETE FROM {SNAPSHOT_TABLE}")
+                cur.execute(_FULL_SQL)
+            else:
+                mode = "incremental"
+                cur.execute(_INCREMENTAL_SQL, (since,))
+            rows = cur.rowcount
+            cur.execute(f"ANALYZE {SNAPSHOT_TABLE}")
+
+    invalidate_forecast_cache()
+    stats = {"mode": mode, "since": since, "rows": rows, "seconds": time.perf_counter() - start}
+    logger.info("Refreshed %s (%s since %s): %d rows in %.2fs.", SNAPSHOT_TABLE, mode, since, rows, stats["seconds"])
+    return stats
+
+
+if __name__ == "__main__":
+    from app.core.log import setup_logging
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="rebuild from the whole forecast history")
+    parser.add_argument(
+        "--index-source", action="store_true",
+        help=f"also create an index on {FORECAST_TABLE}(forecast_date) for fast incremental refreshes",
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    result = refresh_snapshot(full=args.full, index_source=args.index_source)
+    print(f"{result['mode']} refresh: {result['rows']} rows written in {result['seconds']:.2f}s")
@@ -0,0 +1,173 @@
+import math
+import asyncio
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.text import normalize_item_name
+from app.services.catalog_index import CatalogIndex, get_catalog_index
+
+logger = logging.getLogger(__name__)
+
+
+def _char_ngrams(text: str, ngram_range: Tuple[int, int]) -> Counter:
+    padded = f" {normalize_item_name(text)} "
+    grams = Counter()
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for i in range(len(padded) - n + 1):
+            grams[padded[i:i + n]] += 1
+    return grams
+
+
+class LocalCatalogRetriever:
+    """
+    Candidate retrieval over the categorylv5 catalog without RagFlow: character n-gram
+    TF-IDF vectors (works for Thai, which has no word spaces), cosine top-K computed with
+    NumPy over an inverted index.
+
+    Same retrieve() signature and chunk shape as AsyncRagFlowClient, so it plugs into
+    RagFlowService._retrieve unchanged. sync() adds only unseen names: their n-grams are
+    counted once and only the weights are recomputed.
+    """
+
+    def __init__(self, names: Iterable[str] = (), ngram_range: Tuple[int, int] = (2, 4), follow_catalog: bool = False):
+        self.ngram_range = ngram_range
+        self.names: List[str] = []
+        self._known = set()
+        self._vocab: Dict[str, int] = {}
+        self._doc_terms: List[np.ndarray] = []
+        self._doc_counts: List[np.ndarray] = []
+        self._df = np.zeros(0, dtype=np.int64)
+        self._dirty = True
+        self._lock = threading.Lock()
+        # follow the shared catalog index: when it is reloaded (start_catalog_reloader,
+        # CATALOG_RELOAD_INTERVAL), new names are added on the next query
+        self.follow_catalog = follow_catalog
+        self._synced_catalog: Optional[CatalogIndex] = None
+        self.add(names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, names: Iterable[str]) -> int:
+        """Add names not indexed yet; returns how many were added."""
+        added = 0
+        with self._lock:
+            for name in names:
+                name = (name or "").strip()
+                if not name or name in self._known:
+                    continue
+                grams = _char_ngrams(name, self.ngram_range)
+                term_ids = np.fromiter((self._vocab.setdefault(g, len(self._vocab)) for g in grams), dtype=np.int64, count=len(grams))
+                self._doc_terms.append(term_ids)
+                self._doc_counts.append(np.fromiter(grams.values(), dtype=np.float64, count=len(grams)))
+                self.names.append(name)
+                self._known.add(name)
+                added += 1
+            if added:
+                df = np.zeros(len(self._vocab), dtype=np.int64)
+                df[: len(self._df)] = self._df
+                for term_ids in self._doc_terms[len(self.names) - added:]:
+                    df[term_ids] += 1
+                self._df = df
+                self._dirty = True
+        return added
+
+    def sync(self, names: Iterable[str]) -> int:
+        added = self.add(names)
+        if added:
+            logger.info("Local retriever index grew by %d names (%d total).", added, len(self.names))
+        return added
+
+    def _build(self) -> None:
+        """Recompute TF-IDF weights and the term -> (doc, weight) postings from the stored counts."""
+        n_docs = len(self.names)
+        self._idf = np.log((1 + n_docs) / (1 + self._df)) + 1.0
+        if not n_docs:
+            self._post_ptr = np.zeros(len(self._vocab) + 1, dtype=np.int64)
+            self._post_docs = np.zeros(0, dtype=np.int64)
+            self._post_weights = np.zeros(0, dtype=np.float64)
+            self._dirty = False
+            return
+
+        lengths = np.fromiter((len(t) for t in self._doc_terms), dtype=np.int64, count=n_docs)
+        terms = np.concatenate(self._doc_terms)
+        counts = np.concatenate(self._doc_counts)
+        docs = np.repeat(np.arange(n_docs), lengths)
+        weights = (1.0 + np.log(counts)) * self._idf[terms]
+        norms = np.sqrt(np.bincount(docs, weights=weights * weights, minlength=n_docs))
+        weights /= norms[docs]
+
+        order = np.argsort(terms, kind="stable")
+        self._post_docs = docs[order]
+        self._post_weights = weights[order]
+        self._post_ptr = np.zeros(len(self._vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self._vocab)), out=self._post_ptr[1:])
+        self._dirty = False
+
+    def search(self, question: str, top_k: int) -> List[Tuple[str, float]]:
+        self._follow_source()
+        with self._lock:
+            if self._dirty:
+                self._build()
+            grams = _char_ngrams(question, self.ngram_range)
+            known = [(self._vocab[g], c) for g, c in grams.items() if g in self._vocab]
+            if not known or not self.names:
+                return []
+            term_ids = np.array([t for t, _ in known], dtype=np.int64)
+            q = (1.0 + np.log(np.array([c for _, c in known], dtype=np.float64))) * self._idf[term_ids]
+            # grams unseen in the catalog still count towards the query norm (with the max idf)
+            max_idf = math.log(1 + len(self.names)) + 1.0
+            unseen = [(1.0 + math.log(c)) * max_idf for g, c in grams.items() if g not in self._vocab]
+            q /= math.sqrt(float(q @ q) + sum(w * w for w in unseen))
+
+            starts, ends = self._post_ptr[term_ids], self._post_ptr[term_ids + 1]
+            spans = ends - starts
+            idx = np.repeat(starts - np.cumsum(spans) + spans, spans) + np.arange(spans.sum())
+            scores = np.bincount(
+                self._post_docs[idx],
+                weights=self._post_weights[idx] * np.repeat(q, spans),
+                minlength=len(self.names),
+            )
+            k = min(top_k, len(self.names))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.names[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def _follow_source(self) -> None:
+        if not self.follow_catalog:
+            return
+        current = get_catalog_index()
+        if current is not self._synced_catalog:
+            self._synced_catalog = current
+            self.sync(current.names)
+
+    async def retrieve(
+        self,
+        dataset_ids: List[str],
+        question: str,
+        top_k: int = 1024,
+        page_size: int = 30,
+        similarity_threshold: float = 0.2,
+        **kwargs,
+    ) -> List[Dict[str, Any]]:
+        # RagFlow returns at most one page; dataset_ids and the remaining options do not apply here.
+        # Scoring (and a rebuild after the catalog grew) is CPU work, so keep it off the event loop.
+        hits = await asyncio.to_thread(self.search, question, min(top_k, page_size))
+        return [
+            {"content": f"categorylv5: {name}", "similarity": round(score, 4), "dataset_id": "local"}
+            for name, score in hits
+            if score >= similarity_threshold
+        ]
+
+    async def aclose(self) -> None:
+        return None
+
+    @classmethod
+    def from_catalog(cls) -> "LocalCatalogRetriever":
+        """Retriever that follows the shared catalog index (CATALOG_SOURCE) and grows when it is reloaded."""
+        return cls(follow_catalog=True)
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.core import config
+
+
+class RagFlowError(Exception):
+    """RagFlow answered, but with a non-zero "code"."""
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Whether a failed retrieve is worth retrying: timeouts, connection errors, 408 / 429
+    and 5xx responses are; other 4xx responses and RagFlow errors (code != 0) would only
+    fail again.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status in (408, 429) or status >= 500
+    return not isinstance(error, RagFlowError)
+
+
+class AsyncRagFlowClient:
+    """
+    Async client for the RagFlow retrieval HTTP API (POST /api/v1/retrieval).
+
+    - one keep-alive httpx.AsyncClient shared by every call
+    - separate connect / read timeouts
+    - at most max_in_flight concurrent retrievals; extra callers wait their turn
+    - cancelling the awaiting task (e.g. asyncio.wait_for timeout) aborts the HTTP request,
+      nothing keeps running in a worker thread
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        connect_timeout: float = None,
+        read_timeout: float = None,
+        max_in_flight: int = None,
+        max_connections: int = None,
+        max_keepalive: int = None,
+        version: str = "v1",
+    ):
+        connect_timeout = config.RAGFLOW_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+        read_timeout = config.RAGFLOW_READ_TIMEOUT if read_timeout is None else read_timeout
+        max_in_flight = config.RAGFLOW_MAX_IN_FLIGHT if max_in_flight is None else max_in_flight
+        self.api_url = f"{base_url.rstrip('/')}/api/{version}"
+        self._client = httpx.AsyncClient(
+            base_url=self.api_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections or config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=max_keepalive or config.HTTP_MAX_KEEPALIVE,
+            ),
+        )
+        self._in_flight = asyncio.Semaphore(max(1, max_in_flight))
+
+    async def retrieve(
+        self,
+        dataset_ids: List[str],
+        question: str,
+        top_k: int = 1024,
+        page_size: int = 30,
+        similarity_threshold: float = 0.2,
+        vector_similarity_weight: float = 0.3,
+        document_ids: Optional[List[str]] = None,
+        keyword: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Same request body and defaults as ragflow_sdk.RAGFlow.retrieve; returns the raw chunk dicts."""
+        payload = {
+            "page": 1,
+            "page_size": page_size,
+            "similarity_threshold": similarity_threshold,
+            "vector_similarity_weight": vector_similarity_weight,
+            "top_k": top_k,
+            "keyword": keyword,
+            "question": question,
+            "dataset_ids": dataset_ids,
+            "document_ids": document_ids or [],
+        }
+        async with self._in_flight:
+            response = await self._client.post("/retrieval", json=payload)
+        response.raise_for_status()
+        body = response.json()
+        if body.get("code") != 0:
+            raise RagFlowError(body.get("message") or f"RagFlow error code {body.get('code')}")
+        return list((body.get("data") or {}).get("chunks") or [])
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
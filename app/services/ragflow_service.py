@@ -1,215 +1,391 @@
-import csv
 import json
+import time
 import asyncio
+import logging
 from pathlib import Path
-from typing import List, Any, Optional, Dict
+from typing import List, Any, Optional, Dict, Tuple, Union
 
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from ragflow_sdk import RAGFlow
 
 from app.core.config import (
     RAGFLOW_URL,
     RAGFLOW_API_KEY,
     RAGFLOW_ITEM_NAME_IDS,
+    RAGFLOW_TIMEOUT,
+    RAGFLOW_MIN_TIMEOUT,
+    RAGFLOW_RETRIES,
+    RAGFLOW_HEDGE_PERCENTILE,
+    RETRIEVAL_BACKEND,
+    RETRIEVAL_FALLBACK,
+    LLM_TIMEOUT,
+    LLM_MIN_TIMEOUT,
+    TIMEOUT_PERCENTILE,
+    TIMEOUT_MULTIPLIER,
+    RETRY_BACKOFF,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
     TOP_K,
     MODEL_API_KEY,
     MODEL_URL,
     MODEL_NAME,
     MODEL_TEMPERATURE,
+    LLM_BATCH_SIZE,
+    LLM_BATCH_WAIT_MS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
 )
+from app.core.metrics import timed, count
+from app.core.resilience import Backend
+from app.services.ragflow_client import AsyncRagFlowClient, is_transient
+from app.services.local_retriever import LocalCatalogRetriever
+from app.services.resolution_cache import ResolutionCache, get_resolution_cache
+from app.services.selection_cache import SelectionCache, get_selection_cache, record_saving
+from app.services.catalog_index import CatalogIndex, get_catalog_index
+from app.services.selection_batcher import SelectionBatcher
+from app.services.candidate_parser import CandidatePruner
+
+logger = logging.getLogger(__name__)
 
 
 class RagFlowService:
-    def __init__(self):
+    def __init__(
+        self,
+        resolution_cache: Optional[ResolutionCache] = None,
+        catalog_index: Optional[CatalogIndex] = None,
+        llm_batch_size: Optional[int] = None,
+        candidate_pruner: Optional[CandidatePruner] = None,
+        selection_cache: Optional[SelectionCache] = None,
+    ):
         try:
-            self.rag_client = RAGFlow(
-                api_key=RAGFLOW_API_KEY,
-                base_url=RAGFLOW_URL,
-            )
-            print("[RAGFLOW] Client initialized successfully.")
+            if RETRIEVAL_BACKEND == "local":
+                # same retrieve() interface as the RagFlow client, served from the local catalog
+                self.rag_client = LocalCatalogRetriever.from_catalog()
+                logger.info("Local catalog retriever initialized.")
+            else:
+                self.rag_client = AsyncRagFlowClient(
+                    api_key=RAGFLOW_API_KEY,
+                    base_url=RAGFLOW_URL,
+                )
+                logger.info("RAGFlow client initialized.")
         except Exception as e:
-            print(f"[RAGFLOW] Could not initialize RAGFlow client: {e}. Falling back to empty results.")
+            logger.warning("Could not initialize retrieval client: %s. Falling back to empty results.", e)
             self.rag_client = None
 
+        # one pooled async HTTP client for every chat completion made by this service
+        self.llm_http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            timeout=None,  # the OpenAI client passes its own per-request timeout
+        )
         self.llm = ChatOpenAI(
             api_key=MODEL_API_KEY,
             base_url=MODEL_URL,
             model=MODEL_NAME,
-            temperature=MODEL_TEMPERATURE
+            temperature=MODEL_TEMPERATURE,
+            http_async_client=self.llm_http_client,
         )
         self.prompt_path = Path(__file__).parent.parent / "prompts" / "select_item.txt"
+        self.batch_prompt_path = Path(__file__).parent.parent / "prompts" / "select_items_batch.txt"
+        self._prompts: Dict[Path, str] = {}
+        # input name -> selected item; keyed on dataset IDs + prompt so either change invalidates it
+        if resolution_cache is None:
+            prompt_text = self._load_prompt() if self.prompt_path.exists() else ""
+            resolution_cache = get_resolution_cache(prompt_text)
+        self.resolution_cache = resolution_cache
+        # (item, candidate list, prompts, model) -> LLM answer: same candidates again, no chat completion
+        llm_batch_size = LLM_BATCH_SIZE if llm_batch_size is None else llm_batch_size
+        if selection_cache is None:
+            batch_prompt = None
+            if llm_batch_size > 1:
+                batch_prompt = self._load_prompt(self.batch_prompt_path) if self.batch_prompt_path.exists() else ""
+            selection_cache = get_selection_cache(
+                self._load_prompt() if self.prompt_path.exists() else "", batch_prompt
+            )
+        self.selection_cache = selection_cache
+        # known categorylv5 names: exact / near-exact inputs skip RagFlow + LLM entirely
+        # (the shared index is looked up per item, so periodic reloads are picked up)
+        self._catalog_index = catalog_index
+        if catalog_index is None:
+            get_catalog_index()
+        # retrieval results -> deduped, similarity-filtered candidate lines within the token budget
+        self.candidate_pruner = candidate_pruner or CandidatePruner()
+        # adaptive timeouts + circuit breakers; retrieves are idempotent, so they are also retried and hedged
+        self.retrieve_backend = Backend(
+            "ragflow",
+            stage="retrieve",
+            max_timeout=RAGFLOW_TIMEOUT,
+            min_timeout=RAGFLOW_MIN_TIMEOUT,
+            percentile=TIMEOUT_PERCENTILE,
+            multiplier=TIMEOUT_MULTIPLIER,
+            retries=RAGFLOW_RETRIES,
+            backoff=RETRY_BACKOFF,
+            hedge_percentile=RAGFLOW_HEDGE_PERCENTILE,
+            failure_threshold=BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=BREAKER_RESET_TIMEOUT,
+            timeout_errors=(asyncio.TimeoutError, httpx.TimeoutException),
+            retryable=is_transient,
+        )
+        self.llm_backend = Backend(
+            "llm",
+            stage="llm_select",
+            max_timeout=LLM_TIMEOUT,
+            min_timeout=LLM_MIN_TIMEOUT,
+            percentile=TIMEOUT_PERCENTILE,
+            multiplier=TIMEOUT_MULTIPLIER,
+            failure_threshold=BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=BREAKER_RESET_TIMEOUT,
+            timeout_errors=(asyncio.TimeoutError, httpx.TimeoutException),
+        )
+        # candidates from the local catalog while RagFlow is failing or its breaker is open
+        self.fallback_retriever = None
+        if RETRIEVAL_FALLBACK == "local" and not isinstance(self.rag_client, LocalCatalogRetriever):
+            self.fallback_retriever = LocalCatalogRetriever.from_catalog()
+        # concurrent selections are grouped into one chat completion when batch size > 1
+        self.selection_batcher = None
+        if llm_batch_size > 1:
+            self.selection_batcher = SelectionBatcher(self._select_batch, llm_batch_size, LLM_BATCH_WAIT_MS / 1000)
+
+    @property
+    def catalog_index(self) -> CatalogIndex:
+        return self._catalog_index if self._catalog_index is not None else get_catalog_index()
 
-    def _load_prompt(self) -> str:
-        if not self.prompt_path.exists():
-            raise FileNotFoundError(f"Prompt file not found at {self.prompt_path}")
-        return self.prompt_path.read_text().strip()
+    def _load_prompt(self, prompt_path: Optional[Path] = None) -> str:
+        """Read a prompt file once; later calls are served from memory."""
+        prompt_path = prompt_path or self.prompt_path
+        prompt = self._prompts.get(prompt_path)
+        if prompt is None:
+            if not prompt_path.exists():
+                raise FileNotFoundError(f"Prompt file not found at {prompt_path}")
+            prompt = self._prompts[prompt_path] = prompt_path.read_text().strip()
+        return prompt
+
+    async def aclose(self) -> None:
+        """Release the pooled HTTP connections (called on app shutdown)."""
+        if self.rag_client is not None and hasattr(self.rag_client, "aclose"):
+            await self.rag_client.aclose()
+        await self.llm_http_client.aclose()
 
     async def _retrieve(self, item_name: str, top_k: int = None) -> List[Any]:
-        if not self.rag_client:
+        """
+        Retrieve candidates through the retrieve backend (adaptive timeout, retries, hedging,
+        circuit breaker). Raises once every attempt failed or while the breaker is open.
+        """
+        if self.rag_client is None:
             return []
 
         if top_k is None:
             top_k = TOP_K
 
-        loop = asyncio.get_running_loop()
-
-        def _call():
-            # sync call into SDK
-            return self.rag_client.retrieve(
-                dataset_ids=RAGFLOW_ITEM_NAME_IDS,
-                question=item_name,
-                top_k=top_k,
+        # on timeout / a lost hedge the HTTP request itself is cancelled
+        with timed("retrieve", item_name):
+            result = await self.retrieve_backend.call(
+                lambda: self.rag_client.retrieve(
+                    dataset_ids=RAGFLOW_ITEM_NAME_IDS,
+                    question=item_name,
+                    top_k=top_k,
+                )
             )
+        return list(result or [])
 
+    async def _retrieve_candidates(self, item_name: str) -> Tuple[List[Any], bool]:
+        """Candidates for an item and whether they came from the fallback retriever."""
         try:
-            # hard timeout so no single RAG call can hang the whole pipeline
-            result = await asyncio.wait_for(
-                loop.run_in_executor(None, _call),
-                timeout=45,  # seconds
-            )
-            return list(result or [])
-        except asyncio.TimeoutError:
-            print(f"[RAGFLOW TIMEOUT] item_name='{item_name}' (top_k={top_k})")
-            return []
+            return await self._retrieve(item_name), False
         except Exception as e:
-            print(f"[RAGFLOW] Error during retrieve (item_name='{item_name}'): {e}")
-            return []
+            if self.fallback_retriever is None:
+                raise
+            count("fallbacks", stage="retrieve")
+            logger.warning("Retrieve unavailable for %r (%s), using the local catalog retriever.", item_name, e)
+            return list(await self.fallback_retriever.retrieve(RAGFLOW_ITEM_NAME_IDS, item_name, top_k=TOP_K)), True
 
-    @staticmethod
-    def _parse_chunk_text(text: str) -> Dict[str, Any]:
-        """
-        Parse RagFlow chunk text of the form:
-        header1,header2,...,headerN:value1,value2,...,valueN
+    async def select_best_match(self, item_name: str, candidates: List[Any]) -> str:
+        try:
+            selected_item, _ = await self._select(item_name, candidates)
+        except Exception as e:
+            logger.warning("LLM selection failed (item_name=%r): %s", item_name, e)
+            return "None"
+        return selected_item
 
-        Handles quoted headers/values and commas properly using csv.reader.
-        Returns dict mapping header -> value (both as strings).
+    async def _select(self, item_name: str, candidates: List[Any]) -> Tuple[str, str]:
         """
-        if not text or ":" not in text:
-            return {}
+        Pick the best candidate; returns (selected_item, resolved_by), resolved_by being
+        "shortcut" when a single clear candidate was left after pruning, "llm", "llm_cache"
+        (same item and candidate list answered before, no LLM call), or "fallback"
+        (top retrieval candidate) when the LLM call failed or its breaker is open.
+        Raises if the LLM is unavailable and there is no candidate to fall back to.
+        """
+        if not candidates:
+            return "None", "llm"
+        
+        with timed("parse_candidates", item_name):
+            pruned = self.candidate_pruner.prune(candidates)
+        if pruned.shortcut:
+            count("llm_skipped")
+            logger.debug("Single clear candidate for %r, skipping the LLM: %s", item_name, pruned.shortcut)
+            return pruned.shortcut, "shortcut"
+        if not pruned.text:
+            return "None", "llm"
 
-        header_part, value_part = text.split(":", 1)
+        key = self.selection_cache.key(item_name, pruned.text)
+        cached = await self.selection_cache.aget(key)
+        if cached:
+            selected_item, latency = cached
+            count("cache_hits", cache="selection")
+            record_saving(latency)
+            logger.debug("Selection cache hit: %r -> %s", item_name, selected_item)
+            return selected_item, "llm_cache"
+        count("cache_misses", cache="selection")
 
-        # Use csv.reader to correctly parse quotes and commas
-        header_reader = csv.reader([header_part])
-        value_reader = csv.reader([value_part])
+        def select():
+            if self.selection_batcher is not None:
+                return self.selection_batcher.submit(item_name, pruned.text)
+            return self._select_single(item_name, pruned.text)
 
+        start = time.perf_counter()
         try:
-            headers = next(header_reader)
-            values = next(value_reader)
-        except StopIteration:
-            return {}
-
-        # strip whitespace around headers/values
-        headers = [h.strip() for h in headers]
-        values = [v.strip() for v in values]
-
-        # zip into dict
-        row = {}
-        for h, v in zip(headers, values):
-            row[h] = v
+            with timed("llm_select", item_name):
+                selected_item = await self.llm_backend.call(select)
+        except Exception as e:
+            fallback = next((name for name in pruned.names if name), None)
+            if fallback is None:
+                raise
+            count("fallbacks", stage="llm_select")
+            logger.warning("LLM selection unavailable for %r (%s), using the top candidate %r.", item_name, e, fallback)
+            return fallback, "fallback"
+        await self.selection_cache.aset(key, selected_item, time.perf_counter() - start)
+        return selected_item, "llm"
 
-        return row
+    async def _select_single(self, item_name: str, candidate_list_str: str) -> str:
+        system_prompt = self._load_prompt()
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", "{system_prompt}"),
+            ("user", "User Input Item: {item_name}\n\nCandidate Items:\n{candidates}")
+        ])
+        
+        chain = prompt | self.llm
+        
+        result = await chain.ainvoke({
+            "system_prompt": system_prompt,
+            "item_name": item_name,
+            "candidates": candidate_list_str
+        })
+        return result.content.strip()
 
     @staticmethod
-    def _get_from_mapping(mapping, candidate_keys):
-        """Try multiple key variants against a dict-like mapping."""
-        if not mapping:
-            return None
-        for k in candidate_keys:
-            if k in mapping:
-                return mapping[k]
-        # normalized (lowercase, no spaces/quotes/underscores)
-        norm_map = {
-            "".join(ch for ch in key.lower() if ch.isalnum()): v
-            for key, v in mapping.items()
-        }
-        for k in candidate_keys:
-            norm_k = "".join(ch for ch in k.lower() if ch.isalnum())
-            if norm_k in norm_map:
-                return norm_map[norm_k]
-        return None
-
-    @classmethod
-    def _get_field(cls, rec: Any, candidate_keys: List[str]):
+    def _parse_batch_answer(text: str) -> Dict[str, str]:
         """
-        Try to get a field from:
-        - top-level dict
-        - rec.metadata (if object-like)
+        Parse the batch selection output: a JSON object {"1": "name", "2": "None", ...}.
+        Tolerates markdown code fences / text around the object; raises ValueError otherwise.
         """
-        if isinstance(rec, dict):
-            val = cls._get_from_mapping(rec, candidate_keys)
-            if val is not None:
-                return val
-            meta = rec.get("metadata") or {}
-            return cls._get_from_mapping(meta, candidate_keys)
-
-        # object-like result
-        meta = getattr(rec, "metadata", {}) or {}
-        # direct attributes first
-        for k in candidate_keys:
-            if hasattr(rec, k):
-                return getattr(rec, k)
-        # metadata attributes / keys 
-        val = cls._get_from_mapping(meta, candidate_keys)
-        if val is not None:
-            return val
-
-        return None
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            raise ValueError("no JSON object in batch selection output")
+        data = json.loads(text[start:end + 1])
+        if not isinstance(data, dict):
+            raise ValueError("batch selection output is not a JSON object")
+        answers = {}
+        for key, value in data.items():
+            if value is None:
+                value = "None"
+            if isinstance(value, str) and value.strip():
+                answers[str(key).strip()] = value.strip()
+        return answers
 
-    async def select_best_match(self, item_name: str, candidates: List[Any]) -> str:
-        if not candidates:
-            return "None"
-        
-        candidate_texts = []
-        for c in candidates:
-            # TRY to get structured content first
-            content_str = self._get_field(c, ["content_with_weight", "content", "text_content"])
-            
-            # If we found content strings, try to parse them if they look like header:value
-            if content_str and isinstance(content_str, str):
-                parsed = self._parse_chunk_text(content_str)
-                if parsed:
-                    # Successfully parsed structured data -> convert to JSON line or readable text
-                    candidate_texts.append(json.dumps(parsed, ensure_ascii=False))
-                else:
-                    # unstructured text
-                    candidate_texts.append(content_str)
-            else:
-                # Fallback: stringify the whole object if content not found
-                candidate_texts.append(str(c))
-        
-        candidate_list_str = "\n".join([f"- {c}" for c in candidate_texts])
+    async def _select_batch(self, requests: List[Tuple[str, str]]) -> List[Union[str, Exception]]:
+        """
+        Select the best match for several items with a single chat completion.
+        Items missing from (or malformed in) the model output fall back to one call each;
+        a failed call is returned as its exception, so that caller's selection fails (and
+        goes through the LLM backend's breaker and fallback) instead of resolving to "None".
+        Raises if the batch call itself fails.
+        """
+        if len(requests) == 1:
+            return [await self._select_single(*requests[0])]
 
-        system_prompt = self._load_prompt()
+        blocks = [
+            f"### Request {i}\nUser Input Item: {item_name}\n\nCandidate Items:\n{candidate_list_str}"
+            for i, (item_name, candidate_list_str) in enumerate(requests, start=1)
+        ]
+        system_prompt = self._load_prompt(self.batch_prompt_path)
         prompt = ChatPromptTemplate.from_messages([
             ("system", "{system_prompt}"),
-            ("user", "User Input Item: {item_name}\n\nCandidate Items:\n{candidates}")
+            ("user", "{requests}")
         ])
-        
         chain = prompt | self.llm
-        
+
+        count("llm_batches")
+        count("llm_batched_items", len(requests))
+        result = await chain.ainvoke({
+            "system_prompt": system_prompt,
+            "requests": "\n\n".join(blocks)
+        })
         try:
-            result = await chain.ainvoke({
-                "system_prompt": system_prompt,
-                "item_name": item_name,
-                "candidates": candidate_list_str
-            })
-            return result.content.strip()
+            answers = self._parse_batch_answer(result.content)
         except Exception as e:
-            print(f"[RAGFLOW] Error during selection: {e}")
-            return "None"
+            count("errors", stage="llm_batch_parse")
+            logger.warning("Malformed batch selection output (%s), falling back to per-item selection.", e)
+            answers = {}
+
+        results: List[Union[str, Exception, None]] = [answers.get(str(i)) for i in range(1, len(requests) + 1)]
+        missing = [i for i, answer in enumerate(results) if answer is None]
+        if missing:
+            fallback = await asyncio.gather(
+                *(self._select_single(*requests[i]) for i in missing), return_exceptions=True
+            )
+            for i, answer in zip(missing, fallback):
+                results[i] = answer
+        return results
+
+    async def resolve_item(self, item_name: str) -> Tuple[str, str]:
+        """
+        Resolves an input name to a categorylv5 value.
+        Returns (selected_item, resolved_by), resolved_by being the path that decided it:
+        "exact" / "normalized" / "fuzzy" (local catalog index), "cache" (resolution cache),
+        "shortcut" (one clear retrieval candidate, no LLM call), "llm" (RagFlow retrieve + LLM selection),
+        "llm_cache" (RagFlow retrieve, LLM answer reused from the selection cache) or "fallback" (a backend was unavailable; local retriever / top candidate, not cached).
+        """
+        selected_item, resolved_by = await self._resolve_item(item_name)
+        count("items_resolved", path=resolved_by)
+        return selected_item, resolved_by
+
+    async def _resolve_item(self, item_name: str) -> Tuple[str, str]:
+        with timed("prematch", item_name):
+            match = self.catalog_index.match_exact(item_name)
+        if match:
+            logger.debug("Catalog %s match: %r -> %s", match.method, item_name, match.name)
+            return match.name, match.method
+
+        cached = await self.resolution_cache.aget(item_name)
+        if cached:
+            count("cache_hits", cache="resolution")
+            logger.debug("Resolution cache hit: %r -> %s", item_name, cached)
+            return cached, "cache"
+        count("cache_misses", cache="resolution")
+
+        with timed("prematch", item_name):
+            match = self.catalog_index.match(item_name)
+        if match:
+            logger.debug("Catalog %s match (%s): %r -> %s", match.method, match.score, item_name, match.name)
+            return match.name, match.method
+
+        logger.debug("Processing item: %s", item_name)
+        candidates, degraded = await self._retrieve_candidates(item_name)
+        logger.debug("Retrieved %d candidates for %r.", len(candidates), item_name)
+        
+        selected_item, resolved_by = await self._select(item_name, candidates)
+        logger.debug("Selected item for %r: %s", item_name, selected_item)
+        if degraded or resolved_by == "fallback":
+            # degraded answers are not cached, the item is resolved properly once backends recover
+            return selected_item, "fallback"
+        await self.resolution_cache.aset(item_name, selected_item)
+        return selected_item, resolved_by
 
     async def process_item(self, item_name: str) -> str:
         """
         Retrieves candidates from RagFlow and selects the best match.
         """
-        print(f"[RAGFLOW] Processing item: {item_name}")
-        candidates = await self._retrieve(item_name)
-        print(f"[RAGFLOW] Retrieved {len(candidates)} candidates.")
-        
-        selected_item = await self.select_best_match(item_name, candidates)
-        print(f"[RAGFLOW] Selected item: {selected_item}")
+        selected_item, _ = await self.resolve_item(item_name)
         return selected_item
 
 if __name__ == "__main__":
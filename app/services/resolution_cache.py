@@ -0,0 +1,153 @@
+import json
+import asyncio
+import logging
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+from app.core import config
+from app.core.cache import TTLCache, SharedCache
+from app.core.metrics import add_gauge
+from app.core.text import normalize_item_name
+
+logger = logging.getLogger(__name__)
+
+
+def resolution_fingerprint(dataset_ids: List[str], prompt_text: str, model_name: Optional[str]) -> str:
+    """
+    Hash of everything that decides what an input name resolves to.
+    Entries stored under another fingerprint are never served.
+    """
+    payload = json.dumps(
+        {"dataset_ids": sorted(dataset_ids or []), "prompt": prompt_text or "", "model": model_name or ""},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResolutionCache:
+    """
+    Maps a normalized input item name -> selected_item (the matched categorylv5).
+
+    Memory tier: TTLCache (LRU + TTL).
+    Disk tier (optional): SharedCache SQLite file (same TTL and maxsize) so resolutions
+    survive restarts and are shared by the worker processes; disk keys include the
+    fingerprint, so entries from other dataset IDs / prompts are never read and age out.
+    Only real matches are cached, never "None".
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        fingerprint: str = "",
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.fingerprint = fingerprint
+        self._memory = TTLCache(maxsize=maxsize, ttl=self.ttl)
+        self._disk: Optional[SharedCache] = None
+        if path and maxsize > 0:
+            self._disk = SharedCache(path, "resolved_items", ttl=self.ttl, maxsize=maxsize)
+
+    def _disk_key(self, key: str) -> str:
+        payload = json.dumps([self.fingerprint, key], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        """Switch to a new fingerprint (dataset IDs / prompt / model changed): stop serving old entries."""
+        if fingerprint == self.fingerprint:
+            return
+        self.fingerprint = fingerprint
+        self._memory.clear()
+        logger.info("Dataset IDs or prompt changed, cached resolutions invalidated.")
+
+    def _from_disk(self, key: str) -> Optional[str]:
+        selected = self._disk.get(self._disk_key(key))
+        if selected is not None:
+            self._memory.set(key, selected)
+        return selected
+
+    def get(self, item_name: str) -> Optional[str]:
+        key = normalize_item_name(item_name)
+        if not key:
+            return None
+        selected = self._memory.get(key)
+        if selected is not None or self._disk is None:
+            return selected
+        return self._from_disk(key)
+
+    async def aget(self, item_name: str) -> Optional[str]:
+        """get() for the event loop: a disk lookup can wait on another worker's write lock, so it runs in a thread."""
+        key = normalize_item_name(item_name)
+        if not key:
+            return None
+        selected = self._memory.get(key)
+        if selected is not None or self._disk is None:
+            return selected
+        return await asyncio.to_thread(self._from_disk, key)
+
+    def set(self, item_name: str, selected_item: str) -> None:
+        key = normalize_item_name(item_name)
+        if not key or not selected_item or selected_item == "None":
+            return
+        self._memory.set(key, selected_item)
+        if self._disk is not None:
+            self._disk.set(self._disk_key(key), selected_item)
+
+    async def aset(self, item_name: str, selected_item: str) -> None:
+        """set() for the event loop, the disk write runs in a thread."""
+        if self._disk is None:
+            self.set(item_name, selected_item)
+        else:
+            await asyncio.to_thread(self.set, item_name, selected_item)
+
+    def invalidate(self, item_name: Optional[str] = None) -> None:
+        """Drop one input name, or everything when item_name is None."""
+        if item_name is None:
+            self._memory.clear()
+            if self._disk is not None:
+                self._disk.clear()
+            return
+        key = normalize_item_name(item_name)
+        self._memory.delete(key)
+        if self._disk is not None:
+            self._disk.delete(self._disk_key(key))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._memory.stats()
+        if self._disk is not None:
+            stats["disk_size"] = self._disk.stats()["size"]
+        return stats
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+
+_shared_cache: Optional[ResolutionCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_resolution_cache(prompt_text: str) -> ResolutionCache:
+    """
+    Process-wide resolution cache, shared by every RagFlowService instance.
+    The fingerprint is refreshed from the current dataset IDs / prompt / model on every call.
+    """
+    global _shared_cache
+    fingerprint = resolution_fingerprint(config.RAGFLOW_ITEM_NAME_IDS, prompt_text, config.MODEL_NAME)
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResolutionCache(
+                maxsize=config.RESOLUTION_CACHE_SIZE,
+                ttl=config.RESOLUTION_CACHE_TTL,
+                path=config.RESOLUTION_CACHE_PATH or None,
+                fingerprint=fingerprint,
+            )
+            add_gauge("resolution_cache", _shared_cache.stats)
+        else:
+            _shared_cache.set_fingerprint(fingerprint)
+        return _shared_cache
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Set, Tuple, Union
+
+# (item_name, rendered candidate list) -> selected item, one result per request, same order;
+# an exception in place of a result fails that request only
+BatchSelectFn = Callable[[List[Tuple[str, str]]], Awaitable[List[Union[str, BaseException]]]]
+
+
+class SelectionBatcher:
+    """
+    Micro-batcher for LLM selection.
+
+    Concurrent callers submit (item_name, candidates) and wait for their own answer.
+    Requests are flushed as one batch when batch_size is reached or max_wait seconds
+    after the first pending request, whichever comes first.
+    """
+
+    def __init__(self, select_batch: BatchSelectFn, batch_size: int, max_wait: float):
+        self.select_batch = select_batch
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._pending: List[Tuple[str, str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item_name: str, candidates_text: str) -> str:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # first use, or the previous event loop is gone (scripts calling asyncio.run twice)
+            self._loop, self._pending, self._timer = loop, [], None
+
+        future = loop.create_future()
+        self._pending.append((item_name, candidates_text, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # callers that already gave up (timeout / cancel) are not sent to the LLM
+        batch = [entry for entry in batch if not entry[2].done()]
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, str, asyncio.Future]]) -> None:
+        try:
+            results = await self.select_batch([(name, text) for name, text, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
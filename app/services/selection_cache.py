@@ -0,0 +1,187 @@
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from app.core import config
+from app.core.cache import TTLCache, SharedCache
+from app.core.metrics import add_gauge
+from app.core.text import compact_item_name
+
+logger = logging.getLogger(__name__)
+
+
+def selection_fingerprint(
+    prompt_text: str,
+    model_name: Optional[str],
+    temperature: float,
+    batch_prompt_text: Optional[str] = None,
+) -> str:
+    """
+    Hash of the selection prompt(s) and model settings; part of every selection cache key.
+    batch_prompt_text is the batched selection prompt when batching is on (None when off),
+    so turning batching on / off or editing that prompt also changes the fingerprint.
+    """
+    payload = json.dumps(
+        {
+            "prompt": prompt_text or "",
+            "model": model_name or "",
+            "temperature": temperature,
+            "batched": batch_prompt_text is not None,
+            "batch_prompt": batch_prompt_text or "",
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SelectionCache:
+    """
+    Maps (compact query, candidate set, prompt / model fingerprint) -> the item the LLM
+    selected, plus how long that chat completion took, so the same choice is answered
+    without calling the LLM again.
+
+    The query is compact_item_name (spacing, punctuation and case folded away) and the
+    candidate set ignores retrieval order, so spelling variants of a name that retrieve
+    the same candidates share an entry. The resolution cache, keyed on the exact
+    normalized name, misses on those variants.
+
+    Memory tier: TTLCache (LRU, no expiry: the answer depends on nothing outside the key).
+    Disk tier (optional): SharedCache SQLite file, bounded to maxsize rows as well, so the
+    selections survive restarts and are shared by the worker processes.
+    Only real selections are cached, never "None".
+    """
+
+    def __init__(self, maxsize: int, path: Optional[str] = None, fingerprint: str = ""):
+        self.maxsize = maxsize
+        self.fingerprint = fingerprint
+        self._memory = TTLCache(maxsize=maxsize)
+        self._disk: Optional[SharedCache] = None
+        if path and maxsize > 0:
+            self._disk = SharedCache(path, "selections", maxsize=maxsize)
+
+    def key(self, item_name: str, candidates_text: str) -> str:
+        candidates = sorted(set(candidates_text.splitlines()))
+        payload = json.dumps(
+            [self.fingerprint, compact_item_name(item_name) or item_name, candidates],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _from_disk(self, key: str) -> Optional[Tuple[str, float]]:
+        entry = self._disk.get(key)
+        if entry is not None:
+            self._memory.set(key, entry)
+        return entry
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """(selected_item, seconds the LLM call took) or None."""
+        if self.maxsize <= 0:
+            return None
+        entry = self._memory.get(key)
+        if entry is not None or self._disk is None:
+            return entry
+        return self._from_disk(key)
+
+    async def aget(self, key: str) -> Optional[Tuple[str, float]]:
+        """get() for the event loop: a disk lookup can wait on another worker's write lock, so it runs in a thread."""
+        if self.maxsize <= 0:
+            return None
+        entry = self._memory.get(key)
+        if entry is not None or self._disk is None:
+            return entry
+        return await asyncio.to_thread(self._from_disk, key)
+
+    def set(self, key: str, selected_item: str, latency: float) -> None:
+        if self.maxsize <= 0 or not selected_item or selected_item == "None":
+            return
+        entry = (selected_item, latency)
+        self._memory.set(key, entry)
+        if self._disk is not None:
+            self._disk.set(key, entry)
+
+    async def aset(self, key: str, selected_item: str, latency: float) -> None:
+        """set() for the event loop, the disk write runs in a thread."""
+        if self._disk is None:
+            self.set(key, selected_item, latency)
+        else:
+            await asyncio.to_thread(self.set, key, selected_item, latency)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._memory.stats()
+        if self._disk is not None:
+            stats["disk_size"] = self._disk.stats()["size"]
+        return stats
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
+
+
+class SelectionSavings:
+    """LLM calls a request did not make thanks to the selection cache, and their recorded latency."""
+
+    def __init__(self):
+        self.calls_avoided = 0
+        self.latency_saved = 0.0
+
+    def add(self, latency: float) -> None:
+        self.calls_avoided += 1
+        self.latency_saved += latency
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "llm_calls_avoided": self.calls_avoided,
+            "llm_latency_saved_ms": round(self.latency_saved * 1000, 1),
+        }
+
+
+# savings of the request the current task works for; each task gets its own copy of the
+# context, so set it at the top of the task (track_savings) rather than around it
+_savings: ContextVar[Optional[SelectionSavings]] = ContextVar("selection_savings", default=None)
+
+
+def track_savings(savings: SelectionSavings) -> None:
+    """Credit cache hits made by the current task (and the tasks it starts) to `savings`."""
+    _savings.set(savings)
+
+
+def record_saving(latency: float) -> None:
+    savings = _savings.get()
+    if savings is not None:
+        savings.add(latency)
+
+
+_shared_cache: Optional[SelectionCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_selection_cache(prompt_text: str, batch_prompt_text: Optional[str] = None) -> SelectionCache:
+    """
+    Process-wide selection cache, shared by every RagFlowService instance.
+    The fingerprint is refreshed from the current prompts / model settings on every call;
+    pass batch_prompt_text when selections are batched.
+    """
+    global _shared_cache
+    fingerprint = selection_fingerprint(prompt_text, config.MODEL_NAME, config.MODEL_TEMPERATURE, batch_prompt_text)
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = SelectionCache(
+                maxsize=config.SELECTION_CACHE_SIZE,
+                path=config.SELECTION_CACHE_PATH or None,
+                fingerprint=fingerprint,
+            )
+            add_gauge("selection_cache", _shared_cache.stats)
+        else:
+            _shared_cache.fingerprint = fingerprint
+        return _shared_cache
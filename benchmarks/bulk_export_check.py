@@ -0,0 +1,158 @@
+"""
+Bulk export throughput + crash/resume check with fake RagFlow / LLM / DB backends.
+
+Writes a CSV of synthetic item names (with duplicates and blank rows), runs the export until
+it "crashes" after a few chunks, resumes it, and checks every input row is in the output
+exactly once and in order. Then simulates a DB outage: the export must stop before the
+failing chunk without checkpointing it, and complete once the DB is back.
+
+    python -m benchmarks.bulk_export_check --items 5000 --concurrency 50 --format csv
+
+Exits 1 if the resumed output is wrong.
+"""
+import os
+import csv
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+from unittest import mock
+
+from app.pipeline import demand_forecast_pipeline
+from app.pipeline.bulk_export import export, iter_input_items
+from app.pipeline.demand_forecast_pipeline import DemandForecastPipeline
+from app.services.ragflow_service import RagFlowService
+from app.services.resolution_cache import ResolutionCache
+from app.services.selection_cache import SelectionCache
+from app.services.catalog_index import CatalogIndex
+from benchmarks.fakes import FakeRagClient, FakeChatModel, FakeForecastDB
+
+
+class CrashingPipeline(DemandForecastPipeline):
+    """Fails on the n-th chunk, like a process killed halfway through an export."""
+
+    def __init__(self, crash_after: int, **kwargs):
+        super().__init__(**kwargs)
+        self.crash_after = crash_after
+        self.runs = 0
+
+    async def run(self, input_data):
+        self.runs += 1
+        if self.runs > self.crash_after:
+            raise RuntimeError("simulated crash")
+        return await super().run(input_data)
+
+
+class OutageForecastDB(FakeForecastDB):
+    """Forecast lookups start failing after `fail_after` calls (None = healthy)."""
+
+    def __init__(self, latency: float, fail_after=None):
+        super().__init__(latency)
+        self.fail_after = fail_after
+
+    async def aget_demand_forecasts(self, item_names):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            self.calls += 1
+            raise ConnectionError("database unavailable")
+        return await super().aget_demand_forecasts(item_names)
+
+
+def build_pipeline(args, crash_after=None) -> DemandForecastPipeline:
+    service = RagFlowService(
+        resolution_cache=ResolutionCache(maxsize=args.cache_size),
+        catalog_index=CatalogIndex([]),
+        selection_cache=SelectionCache(maxsize=0),
+    )
+    service.rag_client = FakeRagClient(latency=args.rag_latency)
+    service.llm = FakeChatModel(latency=args.llm_latency)
+    if crash_after is None:
+        return DemandForecastPipeline(rag_service=service, concurrency=args.concurrency)
+    return CrashingPipeline(crash_after, rag_service=service, concurrency=args.concurrency)
+
+
+def read_rows(path: str, fmt: str) -> list:
+    if fmt == "csv":
+        with open(path, encoding="utf-8", newline="") as f:
+            return [int(r["row"]) for r in csv.DictReader(f)]
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["row"] for line in f]
+
+
+async def main(args) -> int:
+    workdir = tempfile.mkdtemp(prefix="bulk_export_")
+    input_path = os.path.join(workdir, "items.csv")
+    output_path = os.path.join(workdir, f"forecasts.{args.format}")
+    with open(input_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["item_name"])
+        for i in range(args.items):
+            # ~1 in 4 names repeats an earlier one, every 97th row is blank
+            writer.writerow(["" if i % 97 == 96 else f"procurement item {i if i % 4 else i // 8}"])
+    expected = [row for row, _ in iter_input_items(input_path)]
+
+    fake_db = FakeForecastDB(latency=args.db_latency)
+    with mock.patch.object(demand_forecast_pipeline, "aget_demand_forecasts", fake_db.aget_demand_forecasts):
+        kwargs = dict(chunk_size=args.chunk_size, prefetch=args.prefetch)
+        try:
+            await export(input_path, output_path, pipeline=build_pipeline(args, args.crash_after), **kwargs)
+            print("FAIL: the simulated crash did not happen")
+            return 1
+        except RuntimeError:
+            with open(f"{output_path}.checkpoint.json", encoding="utf-8") as f:
+                print(f"crashed after {json.load(f)['rows_done']} rows")
+
+        summary = await export(input_path, output_path, pipeline=build_pipeline(args), **kwargs)
+
+    print(f"resumed: {summary['rows']} rows in {summary['seconds']:.2f}s "
+          f"({summary['rows_per_second']:.1f} rows/s), resolved_by={summary['resolved_by']}")
+
+    rows = read_rows(output_path, args.format)
+    if rows != expected:
+        duplicates = len(rows) - len(set(rows))
+        print(f"FAIL: {len(rows)} output rows for {len(expected)} input rows ({duplicates} duplicates)")
+        return 1
+    print(f"OK: {len(rows)} rows, each input row exactly once and in order ({output_path})")
+
+    # DB outage: nothing is written or checkpointed past the failing chunk, then a re-run completes
+    outage_path = os.path.join(workdir, f"outage.{args.format}")
+    outage = OutageForecastDB(latency=args.db_latency, fail_after=2)
+    with mock.patch.object(demand_forecast_pipeline, "aget_demand_forecasts", outage.aget_demand_forecasts):
+        kwargs = dict(chunk_size=args.chunk_size, prefetch=0, retries=1, retry_delay=0.01)
+        failed = await export(input_path, outage_path, pipeline=build_pipeline(args), **kwargs)
+        with open(f"{outage_path}.checkpoint.json", encoding="utf-8") as f:
+            rows_done = json.load(f)["rows_done"]
+        print(f"db outage: complete={failed['complete']} failed_rows={failed['failed_rows']} "
+              f"checkpoint at row {rows_done}, {len(read_rows(outage_path, args.format))} rows written")
+        if failed["complete"] or not failed["failed_rows"] or rows_done != 2 * args.chunk_size:
+            print("FAIL: the export moved past a chunk whose forecast lookup failed")
+            return 1
+        outage.fail_after = None
+        resumed = await export(input_path, outage_path, pipeline=build_pipeline(args), **kwargs)
+    if not resumed["complete"] or read_rows(outage_path, args.format) != expected:
+        print("FAIL: the export did not complete after the DB recovered")
+        return 1
+    print(f"OK: resumed after the outage, {resumed['rows']} more rows")
+
+    try:
+        await export(input_path, os.path.join(workdir, "bad.jsonl"), column="no_such_column")
+        print("FAIL: an unknown --column did not stop the export")
+        return 1
+    except SystemExit as e:
+        print(f"unknown column: {e}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--chunk-size", type=int, default=200)
+    parser.add_argument("--prefetch", type=int, default=1)
+    parser.add_argument("--crash-after", type=int, default=3, help="chunks completed before the simulated crash")
+    parser.add_argument("--cache-size", type=int, default=4096, help="resolution cache size (0 disables)")
+    parser.add_argument("--rag-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.03)
+    parser.add_argument("--db-latency", type=float, default=0.01)
+    sys.exit(asyncio.run(main(parser.parse_args())))
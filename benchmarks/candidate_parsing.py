@@ -0,0 +1,183 @@
+"""
+Micro-benchmark: candidate extraction + prompt rendering, previous per-candidate path
+(_get_field + csv.reader parse + json.dumps) vs the CandidatePruner rendering the service
+uses (cached header schema, one split per value row), with every candidate kept.
+
+Uses recorded RagFlow payloads (JSONL lines {"question": ..., "chunks": [...]}, see
+benchmarks.local_retrieval_recall --record) or synthetic RagFlow-shaped chunks.
+
+    python -m benchmarks.candidate_parsing --recorded recorded.jsonl
+    python -m benchmarks.candidate_parsing --top-k 64 --payloads 500
+
+Also checks both paths parse every chunk into the same fields and that each rendered
+line carries the legacy-parsed name and fields; exits 1 if not.
+"""
+import csv
+import sys
+import json
+import time
+import random
+import argparse
+from typing import Any, Dict, List
+
+from app.services.candidate_parser import CandidateParser, CandidatePruner, NAME_KEYS
+
+
+# --- previous implementation (RagFlowService before the candidate parser), kept as the baseline ---
+
+def legacy_parse_chunk_text(text: str) -> Dict[str, Any]:
+    if not text or ":" not in text:
+        return {}
+    header_part, value_part = text.split(":", 1)
+    try:
+        headers = next(csv.reader([header_part]))
+        values = next(csv.reader([value_part]))
+    except StopIteration:
+        return {}
+    return {h.strip(): v.strip() for h, v in zip(headers, values)}
+
+
+def legacy_get_from_mapping(mapping, candidate_keys):
+    if not mapping:
+        return None
+    for k in candidate_keys:
+        if k in mapping:
+            return mapping[k]
+    norm_map = {"".join(ch for ch in key.lower() if ch.isalnum()): v for key, v in mapping.items()}
+    for k in candidate_keys:
+        norm_k = "".join(ch for ch in k.lower() if ch.isalnum())
+        if norm_k in norm_map:
+            return norm_map[norm_k]
+    return None
+
+
+def legacy_get_field(rec, candidate_keys):
+    val = legacy_get_from_mapping(rec, candidate_keys)
+    if val is not None:
+        return val
+    return legacy_get_from_mapping(rec.get("metadata") or {}, candidate_keys)
+
+
+def legacy_format(candidates: List[Any]) -> str:
+    texts = []
+    for c in candidates:
+        content = legacy_get_field(c, ["content_with_weight", "content", "text_content"])
+        if content and isinstance(content, str):
+            parsed = legacy_parse_chunk_text(content)
+            texts.append(json.dumps(parsed, ensure_ascii=False) if parsed else content)
+        else:
+            texts.append(str(c))
+    return "\n".join(f"- {t}" for t in texts)
+
+
+def expected_line(parsed: Dict[str, Any], fields: List[str]) -> str:
+    name = next((parsed[k] for k in NAME_KEYS if parsed.get(k)), None)
+    extras = "; ".join(f"{k}: {parsed[k]}" for k in fields if parsed.get(k) and parsed[k] != name)
+    return f"{name} ({extras})" if extras else name
+
+
+def synthetic_payloads(count: int, top_k: int, seed: int) -> List[List[Dict[str, Any]]]:
+    """Chunks shaped like the RagFlow retrieval API response."""
+    rng = random.Random(seed)
+    units = ["ชิ้น", "กล่อง", "ชุด", "ครั้ง", "เมตร"]
+    brands = ["Acme", '"Siam Steel, Co."', "3M", "Makita", "-"]
+    payloads = []
+    for p in range(count):
+        chunks = []
+        for i in range(top_k):
+            name = f"สินค้าทดสอบ {rng.randint(1, 5000)} รุ่น {i}"
+            content = f"categorylv5,categorylv4,unit,brand:{name},หมวด {rng.randint(1, 40)},{rng.choice(units)},{rng.choice(brands)}"
+            chunks.append({
+                "id": f"chunk-{p}-{i}",
+                "content": content,
+                "document_id": f"doc-{rng.randint(1, 20)}",
+                "document_keyword": "catalog.csv",
+                "highlight": content,
+                "image_id": "",
+                "important_keywords": [],
+                "dataset_id": "ds-catalog",
+                "positions": [],
+                "similarity": rng.random(),
+                "term_similarity": rng.random(),
+                "vector_similarity": rng.random(),
+            })
+        payloads.append(chunks)
+    return payloads
+
+
+def bench(fn, payloads, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for chunks in payloads:
+            fn(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(args) -> int:
+    if args.recorded:
+        with open(args.recorded, encoding="utf-8") as f:
+            payloads = [json.loads(line)["chunks"] for line in f if line.strip()]
+        source = args.recorded
+    else:
+        payloads = synthetic_payloads(args.payloads, args.top_k, args.seed)
+        source = "synthetic"
+    payloads = [chunks for chunks in payloads if chunks]
+    candidates = sum(len(chunks) for chunks in payloads)
+    if not candidates:
+        raise SystemExit("no candidates in the payloads")
+
+    parser = CandidateParser()
+    fields = ["categorylv4", "unit", "brand"]
+    # no similarity floor, token budget or shortcut: only parsing, dedupe and rendering are timed
+    pruner = CandidatePruner(parser, min_similarity=0, fields=fields, token_budget=0, shortcut_similarity=2)
+    mismatches = 0
+    for chunks in payloads:
+        for _, content, dataset_id in parser.iter_contents(chunks):
+            if not isinstance(content, str):
+                continue
+            parsed = legacy_parse_chunk_text(content)
+            if parsed != parser.parse(content, dataset_id):
+                mismatches += 1
+            elif parsed and parser.name(parsed) and parser.render(content, dataset_id, tuple(fields))[1] != expected_line(parsed, fields):
+                mismatches += 1
+
+    def compiled_format(chunks):
+        return pruner.prune(chunks).text
+
+    def render_only(chunks):
+        return "\n".join(f"- {pruner._line(c, content, dataset_id)[1]}" for c, content, dataset_id in parser.iter_contents(chunks))
+
+    legacy = bench(legacy_format, payloads, args.repeat)
+    rendered = bench(render_only, payloads, args.repeat)
+    compiled = bench(compiled_format, payloads, args.repeat)
+    legacy_chars = sum(len(legacy_format(chunks)) for chunks in payloads)
+    compact_chars = sum(len(compiled_format(chunks)) for chunks in payloads)
+
+    print(f"payloads={len(payloads)} ({source}), candidates={candidates}")
+    print(f"{'path':<10} {'us/candidate':>13} {'prompt chars':>13}")
+    print(f"{'legacy':<10} {legacy / candidates * 1e6:>13.2f} {legacy_chars:>13}")
+    print(f"{'render':<10} {rendered / candidates * 1e6:>13.2f} {'':>13}")
+    print(f"{'pruner':<10} {compiled / candidates * 1e6:>13.2f} {compact_chars:>13}")
+    print(f"pruner speedup {legacy / compiled:.1f}x over legacy, prompt size {compact_chars / legacy_chars:.0%} of before")
+    print("example:\n" + compiled_format(payloads[0][:3]))
+
+    failed = False
+    if mismatches:
+        print(f"FAIL: {mismatches} chunks parsed or rendered differently")
+        failed = True
+    if compiled >= legacy:
+        print("FAIL: the pruner path is slower than the legacy path")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recorded", help="JSONL of recorded RagFlow results")
+    parser.add_argument("--payloads", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,110 @@
+"""
+Pre-LLM candidate pruning: prompt tokens, LLM calls and latency vs TOP_K, before
+(every candidate, all fields) and after CandidatePruner (threshold, dedupe, name only,
+token budget, single-candidate shortcut). RagFlow-shaped synthetic candidates, fake LLM.
+
+    python -m benchmarks.candidate_pruning --items 200 --top-k 8,32,128 --token-budget 512
+
+Exits 1 if pruning ever drops the best (expected) candidate.
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+from app.services.ragflow_service import RagFlowService
+from app.services.resolution_cache import ResolutionCache
+from app.services.selection_cache import SelectionCache
+from app.services.catalog_index import CatalogIndex
+from app.services.candidate_parser import CandidatePruner, estimate_tokens
+from benchmarks.fakes import FakeChatModel
+
+
+def make_candidates(rng: random.Random, i: int, top_k: int) -> tuple:
+    """Best match first, then weaker ones; some duplicates and some clearly-unique items."""
+    expected = f"สินค้า {i}"
+    clear = rng.random() < 0.3
+    chunks = [(expected, rng.uniform(0.9, 0.99) if clear else rng.uniform(0.55, 0.9))]
+    for j in range(1, top_k):
+        if chunks and rng.random() < 0.2:
+            name = rng.choice(chunks)[0]
+        else:
+            name = f"สินค้าอื่น {rng.randint(1, 10000)}"
+        upper = 0.19 if clear else 0.6
+        chunks.append((name, rng.uniform(0.05, upper) * (1 - j / (2 * top_k))))
+    return expected, [
+        {
+            "content": f"categorylv5,categorylv4,unit,brand:{name},หมวด {k % 40},ชิ้น,Acme",
+            "dataset_id": "ds-catalog",
+            "similarity": round(similarity, 4),
+        }
+        for k, (name, similarity) in enumerate(chunks)
+    ]
+
+
+async def run(items, pruner: CandidatePruner, latency: float) -> dict:
+    service = RagFlowService(
+        resolution_cache=ResolutionCache(maxsize=0),
+        catalog_index=CatalogIndex([]),
+        candidate_pruner=pruner,
+        selection_cache=SelectionCache(maxsize=0),
+    )
+    service.llm = FakeChatModel(latency=latency)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(service._select(name, chunks) for name, chunks in items))
+    elapsed = time.perf_counter() - start
+    return {
+        "calls": service.llm.calls,
+        "shortcuts": sum(1 for _, path in results if path == "shortcut"),
+        "elapsed": elapsed,
+    }
+
+
+async def main(args) -> int:
+    rng = random.Random(args.seed)
+    failures = 0
+    print(f"{'top_k':>5} {'mode':<7} {'tokens/item':>11} {'llm calls':>9} {'shortcuts':>9} {'elapsed (s)':>11}")
+    for top_k in [int(k) for k in args.top_k.split(",")]:
+        items = []
+        for i in range(args.items):
+            expected, chunks = make_candidates(rng, i, top_k)
+            items.append((expected, chunks))
+
+        pruner = CandidatePruner(
+            min_similarity=args.min_similarity,
+            fields=[],
+            token_budget=args.token_budget,
+            shortcut_similarity=args.shortcut_similarity,
+        )
+        # "before": every field, no threshold / budget / shortcut (duplicates are always removed)
+        keep_all = CandidatePruner(min_similarity=0, fields=["categorylv4", "unit", "brand"], token_budget=0, shortcut_similarity=2)
+
+        for mode, p in (("before", keep_all), ("after", pruner)):
+            tokens = 0
+            for expected, chunks in items:
+                pruned = p.prune(chunks)
+                tokens += estimate_tokens(pruned.text)
+                if expected not in pruned.names:
+                    failures += 1
+            stats = await run(items, p, args.llm_latency)
+            print(f"{top_k:>5} {mode:<7} {tokens / len(items):>11.1f} {stats['calls']:>9} "
+                  f"{stats['shortcuts']:>9} {stats['elapsed']:>11.3f}")
+
+    print(f"example (after): {CandidatePruner(fields=[], token_budget=args.token_budget).prune(items[0][1]).text[:200]!r}")
+    if failures:
+        print(f"FAIL: the expected candidate was pruned {failures} times")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--top-k", default="8,32,128")
+    parser.add_argument("--min-similarity", type=float, default=0.2)
+    parser.add_argument("--token-budget", type=int, default=512)
+    parser.add_argument("--shortcut-similarity", type=float, default=0.9)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,106 @@
+"""
+Catalog ingestion throughput and memory: a synthetic catalog CSV is ingested from scratch,
+then again after changing, removing and adding a share of the rows (incremental run).
+
+    python -m benchmarks.catalog_ingest_throughput --rows 200000 --churn 0.01
+
+Reports rows/s for the initial and the incremental run, and the peak Python heap
+(tracemalloc) of an incremental run at --rows and at 4x --rows to show memory stays flat.
+Exits 1 if the emitted added / changed / removed counts are wrong or the peak heap grows
+more than --max-memory-growth times with the 4x catalog.
+"""
+import os
+import csv
+import sys
+import random
+import argparse
+import tempfile
+import tracemalloc
+from typing import Dict, Tuple
+
+from app.pipeline.catalog_ingest import ingest, iter_csv_rows
+
+COLUMNS = ["categorylv5", "categorylv4", "unit", "brand"]
+
+
+def write_catalog(path: str, rows: int, seed: int, churn: float = 0.0) -> Dict[str, int]:
+    """Rows 0..rows-1; with churn, that share of rows is changed, removed and added each."""
+    rng = random.Random(seed)
+    expected = {"added": 0, "changed": 0, "removed": 0}
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for i in range(rows):
+            unit = "ชิ้น"
+            if churn:
+                draw = rng.random()
+                if draw < churn:
+                    expected["removed"] += 1
+                    continue
+                if draw < 2 * churn:
+                    expected["changed"] += 1
+                    unit = "กล่อง"
+            writer.writerow([f"สินค้า {i}", f"หมวด {i % 400}", unit, "Acme, Co." if i % 7 == 0 else "Acme"])
+        if churn:
+            expected["added"] = int(rows * churn)
+            for i in range(rows, rows + expected["added"]):
+                writer.writerow([f"สินค้า {i}", f"หมวด {i % 400}", "ชิ้น", "Acme"])
+    return expected
+
+
+def run(rows: int, args, tmp: str, trace: bool = False) -> Tuple[dict, dict, dict, int]:
+    base = os.path.join(tmp, f"catalog-{rows}.csv")
+    changed = os.path.join(tmp, f"catalog-{rows}-changed.csv")
+    output = os.path.join(tmp, f"out-{rows}")
+    write_catalog(base, rows, args.seed)
+    expected = write_catalog(changed, rows, args.seed, args.churn)
+
+    initial = ingest(iter_csv_rows(base), output, fmt=args.format, batch_size=args.batch_size)
+    if trace:
+        tracemalloc.start()
+    incremental = ingest(iter_csv_rows(changed), output, fmt=args.format, batch_size=args.batch_size)
+    peak = 0
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return initial, incremental, expected, peak
+
+
+def main(args) -> int:
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        initial, incremental, expected, _ = run(args.rows, args, tmp)
+        print(f"rows={args.rows} churn={args.churn:.1%} format={args.format}")
+        print(f"{'run':<12} {'rows/s':>10} {'added':>8} {'changed':>8} {'removed':>8} {'files':>6}")
+        for name, s in (("initial", initial), ("incremental", incremental)):
+            print(f"{name:<12} {s['rows_per_second']:>10.0f} {s['added']:>8} {s['changed']:>8} "
+                  f"{s['removed']:>8} {len(s['files']):>6}")
+        if initial["added"] != args.rows:
+            failures.append(f"initial run added {initial['added']} of {args.rows} rows")
+        for key, value in expected.items():
+            if incremental[key] != value:
+                failures.append(f"incremental {key}={incremental[key]}, expected {value}")
+
+        peaks = {}
+        for rows in (args.rows, args.rows * 4):
+            peaks[rows] = run(rows, args, tmp, trace=True)[3]
+            print(f"peak heap, incremental run over {rows:>8} rows: {peaks[rows] / 1024:>8.0f} KiB")
+        growth = peaks[args.rows * 4] / peaks[args.rows]
+        print(f"memory growth with 4x rows: {growth:.2f}x")
+        if growth > args.max_memory_growth:
+            failures.append(f"peak heap grew {growth:.2f}x with 4x rows")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--churn", type=float, default=0.01)
+    parser.add_argument("--format", choices=["chunks", "ragflow"], default="chunks")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--max-memory-growth", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=7)
+    sys.exit(main(parser.parse_args()))
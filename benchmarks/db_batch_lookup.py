@@ -0,0 +1,82 @@
+"""
+Benchmark: N single-item forecast queries vs one batched query (get_demand_forecasts).
+
+Runs against the Postgres configured in .env (PG_*). Use --seed on a throwaway local
+Postgres to create taokae_internal_data.demand_forecast with synthetic rows first.
+
+    python -m benchmarks.db_batch_lookup --sizes 1,10,50,100,250,500
+    python -m benchmarks.db_batch_lookup --seed 500
+"""
+import time
+import argparse
+import statistics
+
+from app.services import db_service
+from app.services.db_service import pg_conn, get_demand_forecast, get_demand_forecasts
+
+
+def seed(categories: int, dates: int) -> None:
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("CREATE SCHEMA IF NOT EXISTS taokae_internal_data")
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS taokae_internal_data.demand_forecast (
+                    forecast_date date NOT NULL,
+                    categorylv5 text NOT NULL,
+                    demand_forecast numeric
+                )
+            """)
+            cur.execute("""
+                INSERT INTO taokae_internal_data.demand_forecast (forecast_date, categorylv5, demand_forecast)
+                SELECT current_date - d, 'bench-item-' || c, (random() * 1000)::numeric(12, 2)
+                FROM generate_series(1, %s) AS c, generate_series(0, %s - 1) AS d
+            """, (categories, dates))
+    print(f"Seeded {categories} categories x {dates} forecast dates.")
+
+
+def load_names(limit: int) -> list:
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT DISTINCT categorylv5 FROM taokae_internal_data.demand_forecast ORDER BY 1 LIMIT %s",
+                (limit,),
+            )
+            return [row[0] for row in cur.fetchall()]
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main(args):
+    db_service.init_pool()
+    if args.seed:
+        seed(args.seed, args.dates)
+
+    sizes = [int(x) for x in args.sizes.split(",")]
+    names = load_names(max(sizes))
+    if not names:
+        raise SystemExit("demand_forecast table is empty, run with --seed first")
+
+    print(f"{'N':>5} {'single (ms)':>12} {'batched (ms)':>13} {'speedup':>8}")
+    for n in sizes:
+        subset = names[:n]
+        single = timed(lambda: [get_demand_forecast(name) for name in subset], args.repeat)
+        batched = timed(lambda: get_demand_forecasts(subset), args.repeat)
+        print(f"{len(subset):>5} {single * 1000:>12.1f} {batched * 1000:>13.1f} {single / batched:>7.1f}x")
+
+    db_service.close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,5,10,50,100,250,500")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0, help="insert this many synthetic categories first")
+    parser.add_argument("--dates", type=int, default=12, help="forecast dates per seeded category")
+    main(parser.parse_args())
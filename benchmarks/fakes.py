@@ -0,0 +1,110 @@
+"""
+In-process fake backends (RagFlow client, chat model, forecast DB) used by the benchmarks.
+They only simulate latency, no network or database is touched.
+"""
+import re
+import json
+import time
+import asyncio
+import random
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class FakeRagClient:
+    """
+    Mimics AsyncRagFlowClient.retrieve with a fixed latency; `slow_rate` of the calls
+    take `slow_latency` instead (tail latency).
+    """
+
+    def __init__(self, latency: float = 0.2, fail_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.calls = 0
+
+    async def retrieve(self, dataset_ids: List[str], question: str, top_k: int = 5, **kwargs) -> List[Dict[str, Any]]:
+        self.calls += 1
+        slow = self.slow_rate and random.random() < self.slow_rate
+        await asyncio.sleep(self.slow_latency if slow else self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise RuntimeError("fake ragflow failure")
+        return [
+            {"content": f"categorylv5:{question}", "similarity": 0.95},
+            {"content": f"categorylv5:{question} (other)", "similarity": 0.40},
+        ]
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers with the user input item after a fixed latency.
+    Batched selection prompts ("### Request N" blocks) get a JSON mapping back;
+    batch_mode "malformed" returns non-JSON and "partial" drops every other request.
+    fail_rate of the calls raise instead.
+    """
+
+    latency: float = 0.3
+    fail_rate: float = 0.0
+    batch_mode: str = "ok"
+    calls: int = 0
+    prompt_chars: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages) -> str:
+        self.calls += 1
+        if self.fail_rate and random.random() < self.fail_rate:
+            raise RuntimeError("fake llm failure")
+        self.prompt_chars += sum(len(m.content) for m in messages)
+        text = messages[-1].content
+        names = re.findall(r"User Input Item:\s*(.+)", text)
+        if "### Request" not in text:
+            return names[0].strip() if names else "None"
+        if self.batch_mode == "malformed":
+            return "Sure! Here are the matches you asked for."
+        answers = {
+            str(i): name.strip()
+            for i, name in enumerate(names, start=1)
+            if self.batch_mode != "partial" or i % 2
+        }
+        return "```json\n" + json.dumps(answers, ensure_ascii=False) + "\n```"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+
+class FakeForecastDB:
+    """Replacement for the db_service forecast lookups with a fixed latency per round trip."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = 0
+
+    def get_demand_forecast(self, item_name: str) -> Optional[Dict[str, Any]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return {"forecast_date": "2025-01-01", "categorylv5": item_name, "demand_forecast": 42}
+
+    async def aget_demand_forecast(self, item_name: str) -> Optional[Dict[str, Any]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return {"forecast_date": "2025-01-01", "categorylv5": item_name, "demand_forecast": 42}
+
+    async def aget_demand_forecasts(self, item_names: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return {
+            name: {"forecast_date": "2025-01-01", "categorylv5": name, "demand_forecast": 42}
+            for name in item_names
+        }
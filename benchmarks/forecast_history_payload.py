@@ -0,0 +1,194 @@
+"""
+Forecast history query check: payload size and serialization cost of the columnar
+response vs the list-of-dicts shape the latest-forecast lookups return, for a
+multi-year, multi-category request.
+
+db_service.get_forecast_history runs for real against a fake server-side cursor
+(psycopg2 named cursor semantics: rows arrive itersize at a time), so the query
+building, streaming, array building and row cap are exercised without Postgres.
+POST /forecast/history is then called through the FastAPI app on the same fake, and the
+get_forecast_history MCP tool in memory, both with resolve=false.
+
+    python -m benchmarks.forecast_history_payload --categories 50 --years 3
+
+Exits 1 if the columnar series differ from the rows, the cursor was not server-side,
+the row cap did not apply, or the columnar payload is not smaller and faster to serialize.
+"""
+import sys
+import json
+import time
+import asyncio
+import random
+import argparse
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core import config
+from app.services import db_service
+
+
+def history_rows(categories: int, days: int, seed: int = 7) -> list:
+    """(categorylv5, forecast_date, demand_forecast) rows ordered like the history query."""
+    rng = random.Random(seed)
+    first = date(2022, 1, 1)
+    return [
+        (f"category {c:03d}", first + timedelta(days=d), Decimal(rng.randint(0, 50000)) / 100)
+        for c in range(categories) for d in range(days)
+    ]
+
+
+class FakeNamedCursor:
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.name = name
+        self.itersize = 2000
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.conn.executed.append((self.name, sql, params))
+        wanted = set(params[0])
+        self.rows = [row for row in self.conn.rows if row[0] in wanted]
+
+    def __iter__(self):
+        rows = self.rows
+        for i in range(0, len(rows), self.itersize):
+            self.conn.fetches += 1
+            yield from rows[i:i + self.itersize]
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+        self.fetches = 0
+
+    def cursor(self, name=None, **kwargs):
+        return FakeNamedCursor(self, name)
+
+
+def timed_best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(args) -> int:
+    failures = []
+    days = 365 * args.years
+    rows = history_rows(args.categories, days)
+    names = list(dict.fromkeys(row[0] for row in rows))
+    conn = FakeConn(rows)
+
+    @contextmanager
+    def fake_pg_conn():
+        yield conn
+
+    with mock.patch.object(db_service, "pg_conn", fake_pg_conn), \
+            mock.patch.object(db_service, "_get_pool"), \
+            mock.patch.object(config, "FORECAST_HISTORY_ITERSIZE", args.itersize):
+        start = time.perf_counter()
+        series = db_service.get_forecast_history(names + ["no forecast"], date(2022, 1, 1), date(2030, 1, 1))
+        build_ms = (time.perf_counter() - start) * 1000
+
+        cursor_name, sql, params = conn.executed[-1]
+        print(f"{len(rows)} rows, {args.categories} categories x {days} days: built series in {build_ms:.1f} ms, "
+              f"{conn.fetches} fetches of itersize={args.itersize}")
+        if not cursor_name:
+            failures.append("history query did not use a named (server-side) cursor")
+        if conn.fetches != -(-len(rows) // args.itersize):
+            failures.append(f"expected {-(-len(rows) // args.itersize)} fetches, got {conn.fetches}")
+        if "forecast_date >= %s" not in sql or "forecast_date <= %s" not in sql or len(params) != 3:
+            failures.append("date bounds missing from the history query")
+        if series.get("no forecast") != {"forecast_date": [], "demand_forecast": []}:
+            failures.append("a name without rows is missing or not empty")
+        rebuilt = [
+            (name, date.fromisoformat(d), v)
+            for name, column in series.items()
+            for d, v in zip(column["forecast_date"], column["demand_forecast"])
+        ]
+        if rebuilt != [(n, d, float(v)) for n, d, v in rows]:
+            failures.append("columnar series do not match the cursor rows")
+
+        try:
+            db_service.get_forecast_history(names, max_rows=len(rows) - 1)
+            failures.append("row cap did not raise")
+        except ValueError:
+            pass
+
+        # same data as the list of row dicts a RealDictCursor / response_model path would return
+        row_dicts = [{"categorylv5": n, "forecast_date": d, "demand_forecast": v} for n, d, v in rows]
+        dict_body = json.dumps(jsonable_encoder(row_dicts), ensure_ascii=False)
+        columnar_body = json.dumps({"series": series}, ensure_ascii=False, separators=(",", ":"))
+        dict_ms = timed_best(lambda: json.dumps(jsonable_encoder(row_dicts), ensure_ascii=False), args.repeat)
+        columnar_ms = timed_best(
+            lambda: json.dumps({"series": series}, ensure_ascii=False, separators=(",", ":")), args.repeat
+        )
+        print(f"list of dicts: {len(dict_body.encode()) / 1e6:7.2f} MB  serialize {dict_ms:8.1f} ms")
+        print(f"columnar:      {len(columnar_body.encode()) / 1e6:7.2f} MB  serialize {columnar_ms:8.1f} ms")
+        if len(columnar_body) >= len(dict_body):
+            failures.append("columnar payload is not smaller than the list of dicts")
+        if columnar_ms >= dict_ms:
+            failures.append("columnar payload is not faster to serialize")
+
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        with TestClient(app) as client:
+            start = time.perf_counter()
+            response = client.post("/forecast/history", json={
+                "input_data": names[:3], "start_date": "2022-01-01", "resolve": False,
+            })
+            http_ms = (time.perf_counter() - start) * 1000
+            bad = client.post("/forecast/history", json={
+                "input_data": names[:1], "start_date": "2024-01-01", "end_date": "2023-01-01", "resolve": False,
+            })
+        body = response.json() if response.status_code == 200 else {}
+        print(f"POST /forecast/history: {response.status_code} in {http_ms:.1f} ms, rows={body.get('rows')}, "
+              f"{len(response.content) / 1e6:.2f} MB; reversed range -> {bad.status_code}")
+        if response.status_code != 200 or set(body.get("series", {})) != set(names[:3]):
+            failures.append(f"POST /forecast/history returned {response.status_code}: {response.text[:200]}")
+        if bad.status_code != 400:
+            failures.append(f"reversed date range returned {bad.status_code}, expected 400")
+
+        from fastmcp import Client
+        from app.mcp_server import mcp
+
+        async def mcp_history():
+            async with Client(mcp) as client:
+                result = await client.call_tool("get_forecast_history", {
+                    "item_names": names[:2], "start_date": "2022-01-01", "resolve": False,
+                })
+            return "".join(getattr(block, "text", "") for block in result.content)
+
+        text = asyncio.run(mcp_history())
+        body = json.loads(text) if text.startswith("{") else {}
+        paths = {r.get("resolved_by") for r in body.get("results", [])}
+        print(f"MCP get_forecast_history(resolve=False): rows={body.get('rows')}, resolved_by={sorted(paths)}")
+        if set(body.get("series", {})) != set(names[:2]) or paths != {"input"}:
+            failures.append(f"MCP get_forecast_history with resolve=False returned: {text[:200]}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--itersize", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    sys.exit(main(parser.parse_args()))
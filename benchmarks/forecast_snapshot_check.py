@@ -0,0 +1,168 @@
+"""
+Query plan + latency check: latest forecast from the history table vs the snapshot table.
+
+Runs against the Postgres configured in .env (PG_*); use --seed on a throwaway local
+Postgres to create synthetic history first (see benchmarks.db_batch_lookup).
+
+    python -m benchmarks.forecast_snapshot_check --seed 2000 --dates 24
+    python -m benchmarks.forecast_snapshot_check --batch 100 --repeat 20
+
+Checks that snapshot lookups plan as index scans without a sort, are not slower than the
+history queries, and that after an incremental refresh the snapshot matches the history.
+Exits 1 if any check fails.
+"""
+import sys
+import json
+import time
+import argparse
+import statistics
+
+from app.services import db_service
+from app.services.db_service import pg_conn, FORECAST_TABLE, SNAPSHOT_TABLE
+from app.services.forecast_snapshot import refresh_snapshot
+from benchmarks.db_batch_lookup import seed, load_names
+
+QUERIES = {
+    "single": {
+        "history": f"""
+            SELECT forecast_date, categorylv5, demand_forecast FROM {FORECAST_TABLE}
+            WHERE categorylv5 = %s ORDER BY forecast_date DESC LIMIT 1
+        """,
+        "snapshot": f"SELECT forecast_date, categorylv5, demand_forecast FROM {SNAPSHOT_TABLE} WHERE categorylv5 = %s",
+    },
+    "batch": {
+        "history": f"""
+            SELECT DISTINCT ON (categorylv5) forecast_date, categorylv5, demand_forecast FROM {FORECAST_TABLE}
+            WHERE categorylv5 = ANY(%s) ORDER BY categorylv5, forecast_date DESC
+        """,
+        "snapshot": f"SELECT forecast_date, categorylv5, demand_forecast FROM {SNAPSHOT_TABLE} WHERE categorylv5 = ANY(%s)",
+    },
+}
+
+# rows in the snapshot that differ from DISTINCT ON over the history (0 when in sync)
+DIFF_SQL = f"""
+    SELECT count(*) FROM (
+        (SELECT DISTINCT ON (categorylv5) forecast_date, categorylv5, demand_forecast FROM {FORECAST_TABLE}
+         WHERE categorylv5 IS NOT NULL ORDER BY categorylv5, forecast_date DESC
+         EXCEPT
+         SELECT forecast_date, categorylv5, demand_forecast FROM {SNAPSHOT_TABLE})
+        UNION ALL
+        (SELECT forecast_date, categorylv5, demand_forecast FROM {SNAPSHOT_TABLE}
+         EXCEPT
+         SELECT DISTINCT ON (categorylv5) forecast_date, categorylv5, demand_forecast FROM {FORECAST_TABLE}
+         WHERE categorylv5 IS NOT NULL ORDER BY categorylv5, forecast_date DESC)
+    ) d
+"""
+
+
+def plan_nodes(plan: dict) -> list:
+    nodes = [plan["Node Type"]]
+    for child in plan.get("Plans", []):
+        nodes += plan_nodes(child)
+    return nodes
+
+
+def explain(cur, sql: str, params: tuple) -> tuple:
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+    result = cur.fetchone()[0]
+    result = json.loads(result) if isinstance(result, str) else result
+    return plan_nodes(result[0]["Plan"]), result[0]["Execution Time"]
+
+
+def median_ms(cur, sql: str, params: tuple, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def add_forecast_date(share: float) -> int:
+    """Land a new forecast_date for a share of the seeded categories (simulates the next batch)."""
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                INSERT INTO {FORECAST_TABLE} (forecast_date, categorylv5, demand_forecast)
+                SELECT max_date + 1, categorylv5, (random() * 1000)::numeric(12, 2)
+                FROM (SELECT DISTINCT categorylv5 FROM {FORECAST_TABLE}) c,
+                     (SELECT max(forecast_date) AS max_date FROM {FORECAST_TABLE}) m
+                WHERE random() < %s
+            """, (share,))
+            return cur.rowcount
+
+
+def main(args) -> int:
+    db_service.init_pool()
+    if args.seed:
+        seed(args.seed, args.dates)
+
+    failures = []
+    result = refresh_snapshot(full=True, index_source=args.index_source)
+    print(f"full refresh: {result['rows']} rows in {result['seconds'] * 1000:.1f} ms")
+
+    names = load_names(args.batch)
+    if not names:
+        raise SystemExit("demand_forecast table is empty, run with --seed first")
+
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT count(*) FROM {SNAPSHOT_TABLE}")
+            snapshot_rows = cur.fetchone()[0]
+            cur.execute(f"SELECT count(*) FROM {FORECAST_TABLE}")
+            history_rows = cur.fetchone()[0]
+            print(f"history={history_rows} rows, snapshot={snapshot_rows} rows")
+            print(f"{'query':<7} {'source':<9} {'median (ms)':>12} {'exec (ms)':>10}  plan")
+
+            for query, variants in QUERIES.items():
+                params = (names[0],) if query == "single" else (names,)
+                timings = {}
+                for source, sql in variants.items():
+                    nodes, exec_ms = explain(cur, sql, params)
+                    timings[source] = median_ms(cur, sql, params, args.repeat)
+                    print(f"{query:<7} {source:<9} {timings[source]:>12.3f} {exec_ms:>10.3f}  {' > '.join(nodes)}")
+
+                    # tiny tables are legitimately seq-scanned, only judge plans on real data sizes
+                    if source == "snapshot" and snapshot_rows >= args.min_rows:
+                        if not any("Index" in node for node in nodes):
+                            failures.append(f"{query}: snapshot lookup does not use an index")
+                        if "Sort" in nodes:
+                            failures.append(f"{query}: snapshot lookup sorts")
+                if timings["snapshot"] > timings["history"] * args.tolerance:
+                    failures.append(
+                        f"{query}: snapshot {timings['snapshot']:.3f} ms slower than history {timings['history']:.3f} ms"
+                    )
+
+    if args.seed:
+        added = add_forecast_date(args.new_share)
+        result = refresh_snapshot()
+        print(f"{result['mode']} refresh after {added} new rows: {result['rows']} rows in {result['seconds'] * 1000:.1f} ms")
+        if result["mode"] != "incremental":
+            failures.append(f"expected an incremental refresh, got {result['mode']}")
+
+    with pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(DIFF_SQL)
+            diff = cur.fetchone()[0]
+    print(f"snapshot rows out of sync with history: {diff}")
+    if diff:
+        failures.append(f"{diff} snapshot rows differ from the latest history rows")
+
+    db_service.close_pool()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="insert this many synthetic categories first")
+    parser.add_argument("--dates", type=int, default=24, help="forecast dates per seeded category")
+    parser.add_argument("--batch", type=int, default=50, help="names per batched lookup")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--index-source", action="store_true", help="create the forecast_date index on the history table")
+    parser.add_argument("--new-share", type=float, default=0.5, help="share of categories getting a new forecast_date")
+    parser.add_argument("--min-rows", type=int, default=1000, help="only check plans when the snapshot has this many rows")
+    parser.add_argument("--tolerance", type=float, default=1.2, help="allowed snapshot/history latency ratio")
+    sys.exit(main(parser.parse_args()))
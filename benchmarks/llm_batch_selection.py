@@ -0,0 +1,83 @@
+"""
+Batched LLM selection against a stub chat model: calls, prompt size and latency
+for per-item selection vs LLM_BATCH_SIZE batches, including malformed / partial
+batch outputs that must fall back to per-item calls, and a failing LLM that must open
+the LLM breaker and fall back to the top candidate (also for a lone batched request).
+Exits non-zero on a wrong answer.
+
+    python -m benchmarks.llm_batch_selection --items 30 --batch-size 10
+"""
+import sys
+import time
+import asyncio
+import argparse
+
+from app.services.ragflow_service import RagFlowService
+from app.services.resolution_cache import ResolutionCache
+from app.services.selection_cache import SelectionCache
+from app.services.catalog_index import CatalogIndex
+from benchmarks.fakes import FakeChatModel
+
+
+def candidates_for(name: str) -> list:
+    return [{"content": f"categorylv5:{name}"}, {"content": f"categorylv5:{name} (other)"}]
+
+
+async def run_scenario(
+    items, batch_size: int, batch_mode: str, latency: float, fail_rate: float = 0.0, sequential: bool = False
+) -> dict:
+    service = RagFlowService(
+        resolution_cache=ResolutionCache(maxsize=0),
+        catalog_index=CatalogIndex([]),
+        llm_batch_size=batch_size,
+        selection_cache=SelectionCache(maxsize=0),
+    )
+    service.llm = FakeChatModel(latency=latency, batch_mode=batch_mode, fail_rate=fail_rate)
+
+    start = time.perf_counter()
+    if sequential:
+        # one pending request per flush: the batcher's single-request path
+        selected = [await service._select(name, candidates_for(name)) for name in items]
+    else:
+        selected = await asyncio.gather(*(service._select(name, candidates_for(name)) for name in items))
+    elapsed = time.perf_counter() - start
+    expected_path = "fallback" if fail_rate else "llm"
+    ok = [name for name, _ in selected] == list(items) and all(path == expected_path for _, path in selected)
+    if fail_rate:
+        ok &= service.llm_backend.breaker.state == "open"
+    return {
+        "ok": ok,
+        "calls": service.llm.calls,
+        "prompt_chars": service.llm.prompt_chars,
+        "elapsed": elapsed,
+    }
+
+
+async def main(args) -> int:
+    items = [f"item {i}" for i in range(args.items)]
+    scenarios = [
+        ("per-item", 1, "ok"),
+        ("batched", args.batch_size, "ok"),
+        ("batched, partial output", args.batch_size, "partial"),
+        ("batched, malformed output", args.batch_size, "malformed"),
+    ]
+    failed = False
+    print(f"{'scenario':<28} {'ok':>3} {'LLM calls':>10} {'prompt chars':>13} {'elapsed (s)':>12}")
+    results = [(label, await run_scenario(items, size, mode, args.latency)) for label, size, mode in scenarios]
+    # LLM down: errors must reach the LLM backend (breaker opens) and _select's fallback
+    results.append(("batched, LLM down", await run_scenario(items, args.batch_size, "ok", args.latency, fail_rate=1.0)))
+    results.append(("lone batched requests, down", await run_scenario(
+        [f"lone item {i}" for i in range(6)], args.batch_size, "ok", args.latency, fail_rate=1.0, sequential=True,
+    )))
+    for label, res in results:
+        failed |= not res["ok"]
+        print(f"{label:<28} {'yes' if res['ok'] else 'NO':>3} {res['calls']:>10} {res['prompt_chars']:>13} {res['elapsed']:>12.3f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2)
+    sys.exit(asyncio.run(main(parser.parse_args())))
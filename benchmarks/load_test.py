@@ -0,0 +1,267 @@
+"""
+Load test for POST /pipeline/run (or the MCP get_demand_forecast tool) against local stubs:
+RagFlow and OpenAI-compatible stub servers with configurable latency / error rate, and a
+SQLite stand-in for the forecast tables (or a throwaway Postgres with --db postgres).
+
+Scenarios (each runs for --duration seconds):
+
+    single      1 client, 1 item per request (latency floor)
+    batch50     4 clients, 50 items per request
+    hotkey      --clients clients, 5 items per request, Zipf-skewed names (cache / coalescing)
+    concurrent  --clients clients, 1 item per request, uniform names
+
+    python -m benchmarks.load_test --duration 10 --clients 32
+    python -m benchmarks.load_test --target mcp --scenarios single,hotkey
+    python -m benchmarks.load_test --rag-error-rate 0.05 --llm-latency 0.5
+    python -m benchmarks.load_test --save-baseline baseline.json
+    python -m benchmarks.load_test --baseline baseline.json --tolerance 0.2
+
+Reports requests/s, items/s and p50/p95/p99 request latency per scenario. With --baseline,
+exits 1 when a scenario's req/s drops or its p95/p99 grows by more than --tolerance, or
+when the request error rate is above --max-error-rate.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+from unittest import mock
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+from benchmarks.stub_servers import StubServer, ragflow_stub_app, openai_stub_app
+from benchmarks.stub_db import SqliteForecastDB, seed_postgres
+
+# name -> (clients, items per request, zipf exponent); clients None = --clients
+SCENARIOS = {
+    "single": (1, 1, 0.0),
+    "batch50": (4, 50, 0.0),
+    "hotkey": (None, 5, 1.2),
+    "concurrent": (None, 1, 0.0),
+}
+
+
+def pct(samples: List[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000 if samples else 0.0
+
+
+def scenario_names(scenario: str, pool: int) -> List[str]:
+    return [f"{scenario} item {k}" for k in range(pool)]
+
+
+def name_picker(names: List[str], skew: float, rng: random.Random) -> Callable[[], str]:
+    if not skew:
+        return lambda: rng.choice(names)
+    cum_weights = list(itertools.accumulate(1 / (k + 1) ** skew for k in range(len(names))))
+    return lambda: rng.choices(names, cum_weights=cum_weights)[0]
+
+
+async def http_caller(url: str):
+    client = httpx.AsyncClient(timeout=120)
+
+    async def call(items: List[str]) -> int:
+        """Returns the number of item-level errors; raises when the request failed."""
+        response = await client.post(f"{url}/pipeline/run", json={"input_data": items})
+        response.raise_for_status()
+        return sum(
+            1 for r in response.json().get("results", [])
+            if (r.get("message") or "").startswith(("Error", "Timed out"))
+        )
+
+    return call, client.aclose
+
+
+async def mcp_caller():
+    from fastmcp import Client
+    from app.mcp_server import mcp
+
+    client = Client(mcp)
+    await client.__aenter__()
+
+    async def call(items: List[str]) -> int:
+        result = await client.call_tool("get_demand_forecast", {"item_names": items})
+        text = "".join(getattr(block, "text", "") for block in getattr(result, "content", result))
+        if text.startswith("Error"):
+            raise RuntimeError(text)
+        return 0
+
+    return call, lambda: client.__aexit__(None, None, None)
+
+
+async def run_scenario(call, scenario: str, clients: int, items: int, skew: float, pool: int,
+                       duration: float, seed: int) -> Dict[str, Any]:
+    pick = name_picker(scenario_names(scenario, pool), skew, random.Random(seed))
+    latencies: List[float] = []
+    errors = item_errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client_loop():
+        nonlocal errors, item_errors
+        while time.perf_counter() < deadline:
+            batch = [pick() for _ in range(items)]
+            start = time.perf_counter()
+            try:
+                item_errors += await call(batch)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    total = len(latencies) + errors
+    return {
+        "clients": clients,
+        "items_per_request": items,
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "item_errors": item_errors,
+        "rps": len(latencies) / elapsed,
+        "items_per_second": len(latencies) * items / elapsed,
+        "p50_ms": pct(latencies, 0.5),
+        "p95_ms": pct(latencies, 0.95),
+        "p99_ms": pct(latencies, 0.99),
+    }
+
+
+async def run_all(args, url: str = None) -> Dict[str, Dict[str, Any]]:
+    call, close = await (http_caller(url) if args.target == "http" else mcp_caller())
+    try:
+        await run_scenario(call, "warmup", args.clients, 1, 0.0, args.pool, args.warmup, args.seed)
+        reports = {}
+        for scenario in args.scenarios:
+            clients, items, skew = SCENARIOS[scenario]
+            reports[scenario] = await run_scenario(
+                call, scenario, clients or args.clients, items, skew, args.pool, args.duration, args.seed
+            )
+            print_report(scenario, reports[scenario])
+        return reports
+    finally:
+        await close()
+
+
+def print_report(scenario: str, r: Dict[str, Any]) -> None:
+    print(f"{scenario:<11} {r['clients']:>7} {r['items_per_request']:>5} {r['requests']:>8} {r['errors']:>6} "
+          f"{r['rps']:>8.1f} {r['items_per_second']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+
+
+def compare(reports: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    failures = []
+    for scenario, r in reports.items():
+        base = baseline.get(scenario)
+        if not base:
+            continue
+        if r["rps"] < base["rps"] * (1 - tolerance):
+            failures.append(f"{scenario}: {r['rps']:.1f} req/s vs baseline {base['rps']:.1f}")
+        for key in ("p95_ms", "p99_ms"):
+            if r[key] > base[key] * (1 + tolerance):
+                failures.append(f"{scenario}: {key} {r[key]:.1f} vs baseline {base[key]:.1f}")
+    return failures
+
+
+def main(args) -> int:
+    names = [name for scenario in ["warmup"] + args.scenarios for name in scenario_names(scenario, args.pool)]
+    rng = random.Random(args.seed)
+    # a share of the items has no forecast, like catalog entries that were never forecast
+    seeded = [name for name in names if rng.random() >= args.db_miss_rate]
+
+    rag_app = ragflow_stub_app(latency=args.rag_latency, error_rate=args.rag_error_rate)
+    with StubServer(rag_app) as rag, \
+            StubServer(openai_stub_app(latency=args.llm_latency, error_rate=args.llm_error_rate)) as llm:
+        os.environ.update({
+            "RAGFLOW_URL": rag.url,
+            "RAGFLOW_API_KEY": "stub",
+            "RAGFLOW_ITEM_NAME_IDS": "stub",
+            "MODEL_URL": f"{llm.url}/v1",
+            "MODEL_API_KEY": "stub",
+            "RESOLUTION_CACHE_SIZE": "0" if args.no_cache else os.getenv("RESOLUTION_CACHE_SIZE", "2048"),
+            "RESOLUTION_CACHE_PATH": "",
+            "CATALOG_SOURCE": "none",
+        })
+        from app.main import app
+        from app.pipeline import demand_forecast_pipeline
+        from app.services import db_service
+
+        db = None
+        patches = []
+        if args.db == "sqlite":
+            db = SqliteForecastDB(latency=args.db_latency, workers=args.db_workers)
+            db.seed(seeded)
+            patches = [
+                mock.patch.object(demand_forecast_pipeline, "aget_demand_forecasts", db.aget_demand_forecasts),
+                mock.patch.object(db_service, "init_pool"),
+            ]
+        else:
+            seed_postgres(seeded)
+
+        print(f"target={args.target} db={args.db} rag={args.rag_latency}s/{args.rag_error_rate:.0%} errors "
+              f"llm={args.llm_latency}s/{args.llm_error_rate:.0%} errors cache={'off' if args.no_cache else 'on'}")
+        print(f"{'scenario':<11} {'clients':>7} {'items':>5} {'requests':>8} {'errors':>6} "
+              f"{'req/s':>8} {'items/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        try:
+            for patch in patches:
+                patch.start()
+            if args.target == "http":
+                with StubServer(app) as api:
+                    reports = asyncio.run(run_all(args, api.url))
+            else:
+                reports = asyncio.run(run_all(args))
+        finally:
+            for patch in patches:
+                patch.stop()
+            if db is not None:
+                db.close()
+        print(f"stub ragflow requests={rag_app.state.stats['requests']}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+        print(f"baseline written to {args.save_baseline}")
+
+    failures = [
+        f"{scenario}: error rate {r['error_rate']:.1%}"
+        for scenario, r in reports.items() if r["error_rate"] > args.max_error_rate
+    ]
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures += compare(reports, json.load(f), args.tolerance)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("http", "mcp"), default="http")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), type=lambda s: s.split(","))
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--pool", type=int, default=5000, help="distinct item names per scenario")
+    parser.add_argument("--no-cache", action="store_true", help="disable the resolution cache")
+    parser.add_argument("--rag-latency", type=float, default=0.05)
+    parser.add_argument("--rag-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--db", choices=("sqlite", "postgres"), default="sqlite",
+                        help="postgres seeds the PG_* database: use a throwaway instance only")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="extra latency per SQLite round trip")
+    parser.add_argument("--db-workers", type=int, default=10)
+    parser.add_argument("--db-miss-rate", type=float, default=0.1)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--save-baseline", help="write this run's report as JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    sys.exit(main(args))
@@ -0,0 +1,145 @@
+"""
+Local TF-IDF retrieval vs RagFlow: recall@K against recorded RagFlow results and query latency.
+
+Record RagFlow results once (needs RAGFLOW_URL / RAGFLOW_API_KEY / RAGFLOW_ITEM_NAME_IDS):
+
+    python -m benchmarks.local_retrieval_recall --record recorded.jsonl --questions items.txt
+
+then compare offline (JSONL lines: {"question": ..., "chunks": [{"content": ...}, ...]}):
+
+    python -m benchmarks.local_retrieval_recall --recorded recorded.jsonl --top-k 5
+
+Without --recorded, queries are perturbed names of the (padded) catalog (dropped / swapped characters, extra
+words) and recall@K is the share of queries whose source name is in the local top-K.
+Also times an incremental add of new names against a full rebuild. Exits 1 when recall is
+below --min-recall.
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from typing import List
+
+from app.core import config
+from app.services.catalog_index import CatalogIndex
+from app.services.local_retriever import LocalCatalogRetriever
+from app.services.candidate_parser import CandidateParser
+
+
+def chunk_names(chunks: List[dict]) -> List[str]:
+    parser = CandidateParser()
+    names = []
+    for _, content, dataset_id in parser.iter_contents(chunks):
+        name = parser.name(parser.parse(content or "", dataset_id))
+        if name:
+            names.append(name)
+    return names
+
+
+def perturb(name: str, rng: random.Random) -> str:
+    if len(name) > 4:
+        i = rng.randrange(len(name) - 1)
+        kind = rng.choice(("drop", "swap", "suffix"))
+        if kind == "drop":
+            return name[:i] + name[i + 1:]
+        if kind == "swap":
+            return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return f"{name} {rng.choice(('ขนาดใหญ่', 'แบบใหม่', 'size L', '1 ชิ้น'))}"
+
+
+async def record(args) -> None:
+    from app.services.ragflow_client import AsyncRagFlowClient
+
+    client = AsyncRagFlowClient(base_url=config.RAGFLOW_URL, api_key=config.RAGFLOW_API_KEY)
+    with open(args.questions, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    try:
+        with open(args.record, "w", encoding="utf-8") as out:
+            for question in questions:
+                chunks = await client.retrieve(config.RAGFLOW_ITEM_NAME_IDS, question, top_k=args.top_k)
+                out.write(json.dumps({"question": question, "chunks": chunks}, ensure_ascii=False) + "\n")
+    finally:
+        await client.aclose()
+    print(f"recorded {len(questions)} questions -> {args.record}")
+
+
+def main(args) -> int:
+    index = CatalogIndex.from_csv(config.CATALOG_CSV_PATH)
+    rng = random.Random(args.seed)
+    names = list(index.names)
+    # pad small catalogs with synthetic names so the latency numbers mean something
+    names += [f"{rng.choice(names)} รุ่น {i}" for i in range(max(0, args.catalog_size - len(names)))] if names else []
+
+    start = time.perf_counter()
+    retriever = LocalCatalogRetriever(names)
+    retriever.search("warm up", 1)
+    build = time.perf_counter() - start
+
+    if args.recorded:
+        with open(args.recorded, encoding="utf-8") as f:
+            cases = [json.loads(line) for line in f if line.strip()]
+        queries = [(case["question"], chunk_names(case["chunks"])[:args.top_k]) for case in cases]
+    else:
+        # sample the padded catalog: the CSV alone may hold fewer names than --queries
+        sources = rng.sample(names, min(len(names), args.queries))
+        queries = [(perturb(name, rng), [name]) for name in sources]
+
+    latencies, hits, expected = [], 0, 0
+    for question, reference in queries:
+        start = time.perf_counter()
+        found = [name for name, _ in retriever.search(question, args.top_k)]
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found) & set(reference))
+        expected += len(set(reference))
+
+    recall = hits / expected if expected else 1.0
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+
+    # incremental add of new names vs building the whole index again
+    extra = [f"new catalog item {i}" for i in range(args.add)]
+    start = time.perf_counter()
+    retriever.sync(names + extra)
+    retriever.search("warm up", 1)
+    incremental = time.perf_counter() - start
+    start = time.perf_counter()
+    LocalCatalogRetriever(names + extra).search("warm up", 1)
+    rebuild = time.perf_counter() - start
+
+    source = args.recorded or "perturbed catalog names"
+    print(f"catalog={len(names)} names, queries={len(queries)} ({source}), top_k={args.top_k}")
+    print(f"build        {build * 1000:>9.1f} ms")
+    print(f"recall@{args.top_k:<5} {recall:>9.3f}")
+    print(f"query p50    {p(0.5):>9.3f} ms")
+    print(f"query p99    {p(0.99):>9.3f} ms")
+    print(f"query mean   {statistics.fmean(latencies) * 1000 if latencies else 0.0:>9.3f} ms")
+    print(f"add {args.add:<8} {incremental * 1000:>9.1f} ms (full rebuild {rebuild * 1000:.1f} ms)")
+
+    if recall < args.min_recall:
+        print(f"FAIL: recall {recall:.3f} < {args.min_recall}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recorded", help="JSONL of recorded RagFlow results to compare against")
+    parser.add_argument("--record", help="query live RagFlow and write results to this JSONL file")
+    parser.add_argument("--questions", help="text file, one question per line (with --record)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--catalog-size", type=int, default=20000)
+    parser.add_argument("--add", type=int, default=500)
+    parser.add_argument("--min-recall", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.questions:
+            parser.error("--record needs --questions")
+        asyncio.run(record(args))
+        sys.exit(0)
+    sys.exit(main(args))
@@ -0,0 +1,88 @@
+"""
+Cold start of the stdio MCP server: `python -X importtime -c "import app.mcp_server"` in
+fresh interpreters, the way an MCP client spawns the server for every session.
+
+    python -m benchmarks.mcp_cold_start --runs 5 --max-import-ms 2000
+
+Reports the median import time of app.mcp_server and of the whole interpreter start, the
+slowest imports, and how long the deferred pipeline build (first tool call / warm-up)
+takes. MODEL_TEMPERATURE, TOP_K and CONCURRENCY are blanked so the defaults are used.
+Exits 1 if the median import exceeds --max-import-ms or a heavy SDK is imported at start-up.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+# must only be imported on the first tool call / by the warm-up thread
+DEFERRED_MODULES = ("langchain_openai", "langchain_core", "openai", "psycopg2", "numpy")
+
+
+def run_python(code: str, importtime: bool = False) -> Tuple[float, str, str]:
+    env = dict(os.environ, MODEL_TEMPERATURE="", TOP_K="", CONCURRENCY="", MCP_WARMUP="false", CATALOG_SOURCE="none")
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} failed:\n{proc.stderr[-2000:]}")
+    return elapsed, proc.stdout, proc.stderr
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """module -> (self us, cumulative us)"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def main(args) -> int:
+    imports_ms: List[float] = []
+    wall_ms: List[float] = []
+    modules: Dict[str, Tuple[int, int]] = {}
+    for _ in range(args.runs):
+        elapsed, _, stderr = run_python("import app.mcp_server", importtime=True)
+        modules = parse_importtime(stderr)
+        imports_ms.append(modules["app.mcp_server"][1] / 1000)
+        wall_ms.append(elapsed * 1000)
+
+    pipeline_ms = []
+    for _ in range(max(1, args.runs // 2)):
+        _, stdout, _ = run_python(
+            "import time, app.mcp_server as m\n"
+            "start = time.perf_counter(); m.get_pipeline(); print(time.perf_counter() - start)"
+        )
+        pipeline_ms.append(float(stdout.strip().splitlines()[-1]) * 1000)
+
+    print(f"runs={args.runs}")
+    print(f"import app.mcp_server  median {statistics.median(imports_ms):8.1f} ms  (min {min(imports_ms):.1f})")
+    print(f"interpreter + import   median {statistics.median(wall_ms):8.1f} ms")
+    print(f"deferred pipeline build median {statistics.median(pipeline_ms):7.1f} ms (first tool call without warm-up)")
+    print("slowest imports (self time):")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda kv: -kv[1][0])[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  (cumulative {cumulative_us / 1000:8.1f} ms)  {name}")
+
+    failures = []
+    eager = [name for name in DEFERRED_MODULES if name in modules]
+    if eager:
+        failures.append(f"imported at start-up: {', '.join(eager)}")
+    if statistics.median(imports_ms) > args.max_import_ms:
+        failures.append(f"median import {statistics.median(imports_ms):.1f} ms > {args.max_import_ms} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=2000)
+    parser.add_argument("--top", type=int, default=10)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,281 @@
+"""
+Multi-worker serving check:
+
+1. shared caches: a second process resolving the same items reuses the first process's
+   resolutions (no LLM calls) and forecasts (no DB queries) through the SQLite files, and an
+   invalidation in one process makes another drop the forecasts in its memory tier
+2. a worker holding the resolution cache's write lock does not stall another worker's event
+   loop: the cache write waits in a thread while the loop keeps serving
+3. gunicorn: the app served by 1 and by --workers uvicorn workers against the RagFlow / LLM
+   stub servers and the SQLite forecast stand-in: req/s, p50/p95/p99 and RagFlow calls, and
+   every worker starting up and shutting down cleanly
+
+    python -m benchmarks.multi_worker_check --workers 4 --duration 10 --clients 64
+
+Part 3 is skipped when gunicorn is not installed. Exits 1 if a check fails.
+"""
+import os
+import sys
+import time
+import signal
+import random
+import sqlite3
+import threading
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load_test import http_caller, run_scenario, scenario_names
+from benchmarks.stub_db import SqliteForecastDB
+from benchmarks.stub_servers import StubServer, ragflow_stub_app, openai_stub_app, _free_port
+
+
+def resolve_in_process(cache_path: str, names: List[str]) -> int:
+    """Resolve names with fake RagFlow / LLM clients; returns the number of LLM calls."""
+    from app.services.ragflow_service import RagFlowService
+    from app.services.resolution_cache import ResolutionCache
+    from app.services.selection_cache import SelectionCache
+    from app.services.catalog_index import CatalogIndex
+    from benchmarks.fakes import FakeRagClient, FakeChatModel
+
+    service = RagFlowService(
+        resolution_cache=ResolutionCache(maxsize=len(names), path=cache_path, fingerprint="check"),
+        catalog_index=CatalogIndex([]),
+        selection_cache=SelectionCache(maxsize=0),
+    )
+    service.rag_client = FakeRagClient(latency=0.001)
+    service.llm = FakeChatModel(latency=0.001)
+
+    async def run():
+        return [await service.resolve_item(name) for name in names]
+
+    asyncio.run(run())
+    return service.llm.calls
+
+
+def forecasts_in_process(cache_path: str, names: List[str]) -> int:
+    """Look up forecasts with the DB query stubbed out; returns the DB queries made by this process so far."""
+    os.environ["FORECAST_CACHE_PATH"] = cache_path
+    from app.services import db_service
+
+    def query(snapshot_sql, history_sql, params=()):
+        db_service.stub_queries += 1
+        return [{"forecast_date": "2025-01-01", "categorylv5": name, "demand_forecast": 42} for name in params[0]]
+
+    # counted across calls made in the same process
+    db_service.stub_queries = getattr(db_service, "stub_queries", 0)
+    db_service._query_forecasts = query
+    db_service.check_forecast_freshness = lambda force=False: False
+    results = db_service.get_demand_forecasts(names)
+    assert all(results[name]["categorylv5"] == name for name in names)
+    return db_service.stub_queries
+
+
+def invalidate_in_process(cache_path: str) -> None:
+    os.environ["FORECAST_CACHE_PATH"] = cache_path
+    from app.services import db_service
+
+    db_service.invalidate_forecast_cache()
+
+
+def in_fresh_process(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def check_shared_caches(tmp: str) -> List[str]:
+    failures = []
+    names = [f"shared item {i}" for i in range(50)]
+    resolutions = os.path.join(tmp, "resolutions.sqlite")
+    first, second = (in_fresh_process(resolve_in_process, resolutions, names) for _ in range(2))
+    print(f"resolutions: LLM calls in process 1={first}, process 2={second}")
+    if first != len(names) or second != 0:
+        failures.append("second process did not reuse the shared resolutions")
+
+    forecasts = os.path.join(tmp, "forecasts.sqlite")
+    first, second = (in_fresh_process(forecasts_in_process, forecasts, names) for _ in range(2))
+    print(f"forecasts:   DB queries in process 1={first}, process 2={second}")
+    if first != 1 or second != 0:
+        failures.append("second process did not reuse the shared forecasts")
+
+    # a worker that has the forecasts in its memory tier drops them when another worker invalidates
+    forecasts = os.path.join(tmp, "invalidated.sqlite")
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as worker:
+        before = worker.submit(forecasts_in_process, forecasts, names).result()
+        warm = worker.submit(forecasts_in_process, forecasts, names).result()
+        in_fresh_process(invalidate_in_process, forecasts)
+        after = worker.submit(forecasts_in_process, forecasts, names).result()
+    print(f"invalidation: DB queries in the worker before={before}, warm={warm - before}, "
+          f"after another process invalidated={after - warm}")
+    if warm != before or after != warm + 1:
+        failures.append("a worker kept serving its memory tier after another worker invalidated the cache")
+    return failures
+
+
+def check_locked_cache(tmp: str, hold: float = 1.0) -> List[str]:
+    from app.services.ragflow_service import RagFlowService
+    from app.services.resolution_cache import ResolutionCache
+    from app.services.selection_cache import SelectionCache
+    from app.services.catalog_index import CatalogIndex
+    from benchmarks.fakes import FakeRagClient, FakeChatModel
+
+    failures = []
+    path = os.path.join(tmp, "locked.sqlite")
+    cache = ResolutionCache(maxsize=16, path=path, fingerprint="check")
+    service = RagFlowService(resolution_cache=cache, catalog_index=CatalogIndex([]), selection_cache=SelectionCache(maxsize=0))
+    service.rag_client = FakeRagClient(latency=0.001)
+    service.llm = FakeChatModel(latency=0.001)
+
+    # another worker in the middle of a long write transaction on the same file
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(hold, lambda: other.execute("COMMIT")).start()
+
+    async def run():
+        stall = 0.0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal stall
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                stall = max(stall, time.perf_counter() - start - 0.01)
+
+        task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await service.resolve_item("locked item")
+        elapsed = time.perf_counter() - start
+        done.set()
+        await task
+        return elapsed, stall
+
+    elapsed, stall = asyncio.run(run())
+    other.close()
+    print(f"locked cache: resolve took {elapsed * 1000:.0f} ms behind a {hold * 1000:.0f} ms write lock, "
+          f"worst event loop stall {stall * 1000:.1f} ms")
+    if stall > hold / 4:
+        failures.append(f"event loop stalled {stall * 1000:.0f} ms on the cache write lock")
+    if cache.stats().get("disk_size") != 1:
+        failures.append("resolution was not written once the lock was released")
+    cache.close()
+    return failures
+
+
+def serve(workers: int, env: Dict[str, str], tmp: str, args) -> Dict[str, object]:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ, **env,
+        WEB_CONCURRENCY=str(workers),
+        BIND=f"127.0.0.1:{port}",
+        CACHE_DIR=os.path.join(tmp, f"cache-{workers}"),
+        ACCESS_LOG="",
+        LOG_LEVEL="INFO",
+    )
+    log_path = os.path.join(tmp, f"gunicorn-{workers}.log")
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "benchmarks.stub_app:app"],
+            env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"gunicorn did not start, see {log_path}")
+            time.sleep(0.2)
+
+        async def load():
+            call, close = await http_caller(url)
+            try:
+                await run_scenario(call, "warmup", args.clients, 1, 0.0, args.pool, args.warmup, args.seed)
+                return await run_scenario(call, "hotkey", args.clients, 5, 1.2, args.pool, args.duration, args.seed)
+            finally:
+                await close()
+
+        report = asyncio.run(load())
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        report_exit = proc.wait(timeout=60)
+
+    with open(log_path) as f:
+        log_text = f.read()
+    report["ready"] = log_text.count("ready.")
+    report["exit_code"] = report_exit
+    return report
+
+
+def check_gunicorn(tmp: str, args) -> List[str]:
+    failures = []
+    names = [name for scenario in ("warmup", "hotkey") for name in scenario_names(scenario, args.pool)]
+    db_path = os.path.join(tmp, "forecast.sqlite")
+    db = SqliteForecastDB(path=db_path)
+    db.seed(names)
+    db.close()
+
+    print(f"\n{'workers':>7} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'rag calls':>9}")
+    for workers in sorted({1, args.workers}):
+        rag_app = ragflow_stub_app(latency=args.rag_latency)
+        with StubServer(rag_app) as rag, StubServer(openai_stub_app(latency=args.llm_latency)) as llm:
+            env = {
+                "RAGFLOW_URL": rag.url,
+                "RAGFLOW_API_KEY": "stub",
+                "RAGFLOW_ITEM_NAME_IDS": "stub",
+                "MODEL_URL": f"{llm.url}/v1",
+                "MODEL_API_KEY": "stub",
+                "CATALOG_SOURCE": "none",
+                "STUB_FORECAST_DB": db_path,
+            }
+            r = serve(workers, env, tmp, args)
+            rag_calls = rag_app.state.stats["requests"]
+        print(f"{workers:>7} {r['requests']:>8} {r['errors']:>6} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {rag_calls:>9}")
+        if r["ready"] != workers:
+            failures.append(f"{r['ready']} of {workers} workers started")
+        if r["exit_code"] != 0:
+            failures.append(f"gunicorn with {workers} workers exited with {r['exit_code']}")
+        if r["errors"]:
+            failures.append(f"{r['errors']} failed requests with {workers} workers")
+    return failures
+
+
+def main(args) -> int:
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        failures = check_shared_caches(tmp)
+        failures += check_locked_cache(tmp)
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            print("gunicorn is not installed, skipping the served comparison")
+        else:
+            failures += check_gunicorn(tmp, args)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1))
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--pool", type=int, default=2000)
+    parser.add_argument("--rag-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    sys.exit(main(parser.parse_args()))
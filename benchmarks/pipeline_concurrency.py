@@ -0,0 +1,69 @@
+"""
+Latency benchmark for DemandForecastPipeline.run: sequential vs concurrent fan-out.
+
+Uses fake RagFlow / LLM / DB backends so the numbers only reflect pipeline orchestration.
+
+    python -m benchmarks.pipeline_concurrency --items 20 --concurrency 20
+"""
+import time
+import asyncio
+import argparse
+from unittest import mock
+
+from app.pipeline import demand_forecast_pipeline
+from app.pipeline.demand_forecast_pipeline import DemandForecastPipeline
+from app.services.ragflow_service import RagFlowService
+from app.services.resolution_cache import ResolutionCache
+from app.services.selection_cache import SelectionCache
+from app.services.catalog_index import CatalogIndex
+from benchmarks.fakes import FakeRagClient, FakeChatModel, FakeForecastDB
+
+
+def build_pipeline(args, concurrency: int) -> DemandForecastPipeline:
+    # resolution cache and catalog pre-match off: every run must pay for retrieve + select
+    service = RagFlowService(
+        resolution_cache=ResolutionCache(maxsize=0),
+        catalog_index=CatalogIndex([]),
+        selection_cache=SelectionCache(maxsize=0),
+    )
+    service.rag_client = FakeRagClient(latency=args.rag_latency, fail_rate=args.fail_rate)
+    service.llm = FakeChatModel(latency=args.llm_latency)
+    return DemandForecastPipeline(rag_service=service, concurrency=concurrency, item_timeout=args.item_timeout)
+
+
+async def measure(pipeline: DemandForecastPipeline, items, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await pipeline.run(items)
+        timings.append(time.perf_counter() - start)
+        assert [r["input_item"] for r in result["results"]] == items, "results out of input order"
+    return timings
+
+
+async def main(args):
+    items = [f"item-{i}" for i in range(args.items)]
+    fake_db = FakeForecastDB(latency=args.db_latency)
+
+    with mock.patch.object(demand_forecast_pipeline, "aget_demand_forecasts", fake_db.aget_demand_forecasts):
+        sequential = await measure(build_pipeline(args, 1), items, args.repeat)
+        concurrent = await measure(build_pipeline(args, args.concurrency), items, args.repeat)
+
+    seq_best, con_best = min(sequential), min(concurrent)
+    print(f"items={args.items} rag={args.rag_latency}s llm={args.llm_latency}s db={args.db_latency}s")
+    print(f"sequential (concurrency=1): best={seq_best:.3f}s")
+    print(f"concurrent (concurrency={args.concurrency}): best={con_best:.3f}s")
+    print(f"speedup: {seq_best / con_best:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rag-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--db-latency", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--item-timeout", type=float, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
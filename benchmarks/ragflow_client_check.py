@@ -0,0 +1,77 @@
+"""
+AsyncRagFlowClient against a local stub RagFlow server:
+- parsed chunks and request body
+- a timeout cancels the HTTP request (stub sees the disconnect, nothing keeps running)
+- the in-flight limit caps concurrent retrievals
+- throughput of N concurrent retrieves over keep-alive connections
+Exits non-zero when a check fails.
+
+    python -m benchmarks.ragflow_client_check --requests 200 --max-in-flight 16
+"""
+import sys
+import time
+import asyncio
+import argparse
+
+from app.services.ragflow_client import AsyncRagFlowClient
+from benchmarks.stub_servers import StubServer, ragflow_stub_app
+
+
+async def check_parse(url: str) -> bool:
+    client = AsyncRagFlowClient(url, "stub", max_in_flight=4)
+    try:
+        chunks = await client.retrieve(dataset_ids=["ds"], question="flap box", top_k=5)
+    finally:
+        await client.aclose()
+    return len(chunks) == 5 and chunks[0]["content"] == "categorylv5:flap box"
+
+
+async def check_timeout(url: str, stats: dict) -> bool:
+    client = AsyncRagFlowClient(url, "stub", read_timeout=30, max_in_flight=4)
+    cancelled_before = stats["cancelled"]
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(client.retrieve(dataset_ids=["ds"], question="slow"), timeout=0.2)
+        return False
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await client.aclose()
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.2)  # let the server notice the disconnect
+    return elapsed < 0.5 and stats["cancelled"] > cancelled_before and stats["in_flight"] == 0
+
+
+async def check_in_flight(url: str, stats: dict, requests: int, max_in_flight: int) -> tuple:
+    client = AsyncRagFlowClient(url, "stub", max_in_flight=max_in_flight)
+    stats["max_in_flight"] = 0
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(client.retrieve(dataset_ids=["ds"], question=f"q{i}") for i in range(requests)))
+    finally:
+        await client.aclose()
+    elapsed = time.perf_counter() - start
+    return stats["max_in_flight"] <= max_in_flight, requests / elapsed, stats["max_in_flight"]
+
+
+async def main(args) -> int:
+    fast_app = ragflow_stub_app(latency=args.latency)
+    slow_app = ragflow_stub_app(latency=5)
+    with StubServer(fast_app) as fast, StubServer(slow_app) as slow:
+        parse_ok = await check_parse(fast.url)
+        timeout_ok = await check_timeout(slow.url, slow_app.state.stats)
+        limit_ok, rps, peak = await check_in_flight(fast.url, fast_app.state.stats, args.requests, args.max_in_flight)
+
+    print(f"parse chunks:          {'ok' if parse_ok else 'FAIL'}")
+    print(f"timeout cancels call:  {'ok' if timeout_ok else 'FAIL'}")
+    print(f"in-flight limit:       {'ok' if limit_ok else 'FAIL'} (peak {peak} <= {args.max_in_flight})")
+    print(f"throughput:            {rps:.1f} retrieves/s ({args.requests} requests, stub latency {args.latency}s)")
+    return 0 if parse_ok and timeout_ok and limit_ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,185 @@
+"""
+Resilience check for the retrieve / LLM backends with fake RagFlow and LLM clients:
+
+1. tail latency: retrieve p50/p99 with and without hedging when a share of calls is slow,
+   measured after a warm-up that gives the backend enough latency samples to hedge;
+   hedged p99 must stay below a fraction of the injected slow latency
+2. adaptive timeout: the retrieve timeout follows the observed latency instead of RAGFLOW_TIMEOUT
+3. RagFlow down: the breaker opens, calls fail fast and items resolve via the local retriever
+4. LLM down: items fall back to the top candidate and are not cached; recovery after reset
+5. failure accounting: a retried call counts as one breaker failure, and RagFlow errors
+   (code != 0) and 4xx responses are not retried
+
+    python -m benchmarks.resilience_check --calls 1000 --slow-rate 0.05
+
+Prints the /health backend states along the way. Exits 1 if a check fails.
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+import httpx
+
+from app.core.resilience import backend_states
+from app.services.ragflow_service import RagFlowService
+from app.services.resolution_cache import ResolutionCache
+from app.services.selection_cache import SelectionCache
+from app.services.catalog_index import CatalogIndex
+from app.services.local_retriever import LocalCatalogRetriever
+from app.services.ragflow_client import RagFlowError
+from benchmarks.fakes import FakeRagClient, FakeChatModel
+
+
+class ErrorRagClient(FakeRagClient):
+    """Every retrieve fails with the given exception."""
+
+    def __init__(self, error: Exception):
+        super().__init__(latency=0.001)
+        self.error = error
+
+    async def retrieve(self, dataset_ids, question, top_k=5, **kwargs):
+        await super().retrieve(dataset_ids, question, top_k)
+        raise self.error
+
+
+def http_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://ragflow/api/v1/retrieval")
+    return httpx.HTTPStatusError(f"{status}", request=request, response=httpx.Response(status, request=request))
+
+
+def build_service(args, hedge: bool) -> RagFlowService:
+    service = RagFlowService(
+        resolution_cache=ResolutionCache(maxsize=1024),
+        catalog_index=CatalogIndex([]),
+        selection_cache=SelectionCache(maxsize=0),
+    )
+    service.rag_client = FakeRagClient(latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    service.llm = FakeChatModel(latency=args.latency)
+    service.fallback_retriever = LocalCatalogRetriever([f"item {i}" for i in range(100)])
+    backend = service.retrieve_backend
+    backend.hedge_percentile = 0.9 if hedge else 0.0
+    backend.retries = 2
+    backend.breaker.failure_threshold = 5
+    backend.breaker.reset_timeout = args.reset_timeout
+    service.llm_backend.breaker.reset_timeout = args.reset_timeout
+    return service
+
+
+async def retrieve_latencies(service: RagFlowService, calls: int, concurrency: int = 10) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await service._retrieve(f"item {i}")
+            samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    return sorted(samples)
+
+
+def pct(samples: list, q: float) -> float:
+    return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+
+
+async def main(args) -> int:
+    failures = []
+
+    # 1 + 2: tail latency with / without hedging, adaptive timeout
+    random.seed(args.seed)
+    results = {}
+    for hedge in (False, True):
+        service = build_service(args, hedge)
+        # no hedging before min_samples latencies are known: keep the warm-up out of the percentiles
+        await retrieve_latencies(service, service.retrieve_backend.min_samples * 2)
+        samples = await retrieve_latencies(service, args.calls)
+        results[hedge] = samples
+        print(f"hedging={'on ' if hedge else 'off'} p50={pct(samples, 0.5):7.1f} ms  p99={pct(samples, 0.99):7.1f} ms  "
+              f"rag calls={service.rag_client.calls}  timeout={service.retrieve_backend.timeout():.2f}s")
+    slow_ms = args.slow_latency * 1000
+    if pct(results[False], 0.99) < slow_ms * 0.9:
+        failures.append(f"no tail to hedge: unhedged p99 {pct(results[False], 0.99):.1f} ms "
+                        f"(raise --slow-rate or --calls so over 1% of calls are slow)")
+    if pct(results[True], 0.99) >= slow_ms * args.hedge_fraction:
+        failures.append(f"hedged p99 {pct(results[True], 0.99):.1f} ms is not below "
+                        f"{args.hedge_fraction:.0%} of the {slow_ms:.0f} ms slow latency")
+    if service.retrieve_backend.timeout() >= service.retrieve_backend.max_timeout:
+        failures.append("retrieve timeout did not adapt to the observed latency")
+
+    # 3: RagFlow down -> breaker opens, fail fast, local fallback
+    service = build_service(args, hedge=False)
+    await retrieve_latencies(service, 30)
+    service.rag_client.fail_rate = 1.0
+    # keep the breaker open for the whole scenario (retry backoff can outlast a short reset timeout)
+    service.retrieve_backend.breaker.reset_timeout = 60
+    paths = [(await service.resolve_item(f"item {i}"))[1] for i in range(10)]
+    start = time.perf_counter()
+    _, path = await service.resolve_item("item 42")
+    fast = (time.perf_counter() - start) * 1000
+    print(f"ragflow down: paths={set(paths)} breaker={service.retrieve_backend.breaker.state} "
+          f"resolve with open breaker={fast:.1f} ms")
+    print(f"/health backends: {backend_states()}")
+    if service.retrieve_backend.breaker.state != "open":
+        failures.append("retrieve breaker did not open")
+    if path != "fallback" or fast > args.latency * 1000 * 2 + 50:
+        failures.append(f"open breaker did not fail fast to the local retriever ({path}, {fast:.1f} ms)")
+
+    # 4: LLM down -> top candidate fallback, not cached; recovery after the reset timeout
+    service.rag_client.fail_rate = 0.0
+    service.retrieve_backend.breaker.reset_timeout = args.reset_timeout
+    await asyncio.sleep(args.reset_timeout)
+    service.llm.fail_rate = 1.0
+    selected, path = await service.resolve_item("unique item")
+    cached = service.resolution_cache.get("unique item")
+    print(f"llm down: {selected!r} via {path}, cached={cached!r}, ragflow breaker={service.retrieve_backend.breaker.state}")
+    if path != "fallback" or cached:
+        failures.append("LLM failure did not fall back to an uncached top candidate")
+
+    service.llm.fail_rate = 0.0
+    await asyncio.sleep(args.reset_timeout)
+    selected, path = await service.resolve_item("unique item")
+    print(f"recovered: {selected!r} via {path}, llm breaker={service.llm_backend.breaker.state}")
+    if path != "llm":
+        failures.append(f"LLM path did not recover ({path})")
+
+    # 5: one breaker failure per call; only transient errors are retried
+    for label, error, attempts in [
+        ("transient (503)", http_error(503), 3),
+        ("timeout", httpx.ReadTimeout("read timeout"), 3),
+        ("RagFlow code != 0", RagFlowError("dataset not found"), 1),
+        ("404", http_error(404), 1),
+    ]:
+        service = build_service(args, hedge=False)
+        service.retrieve_backend.backoff = 0.0
+        service.rag_client = ErrorRagClient(error)
+        try:
+            await service._retrieve("item 1")
+        except Exception:
+            pass
+        breaker = service.retrieve_backend.breaker
+        print(f"{label}: {service.rag_client.calls} attempts, breaker failures={breaker.failures}")
+        if service.rag_client.calls != attempts:
+            failures.append(f"{label}: {service.rag_client.calls} attempts, expected {attempts}")
+        if breaker.failures != 1:
+            failures.append(f"{label}: one failed call counted as {breaker.failures} breaker failures")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # enough calls that the ~slow_rate^2 share where the hedge is slow too stays well under 1%
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    parser.add_argument("--reset-timeout", type=float, default=0.5)
+    parser.add_argument("--hedge-fraction", type=float, default=0.25,
+                        help="hedged p99 must be below this fraction of --slow-latency")
+    parser.add_argument("--seed", type=int, default=7)
+    sys.exit(asyncio.run(main(parser.parse_args())))
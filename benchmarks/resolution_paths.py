@@ -0,0 +1,70 @@
+"""
+Resolution latency by path: catalog exact / normalized / fuzzy, resolution cache, RagFlow + LLM.
+
+The catalog comes from CATALOG_CSV_PATH; RagFlow and the LLM are fakes with fixed latency.
+
+    python -m benchmarks.resolution_paths --rag-latency 0.3 --llm-latency 0.8
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from collections import defaultdict
+
+from app.core import config
+from app.services.ragflow_service import RagFlowService
+from app.services.resolution_cache import ResolutionCache
+from app.services.selection_cache import SelectionCache
+from app.services.catalog_index import CatalogIndex
+from benchmarks.fakes import FakeRagClient, FakeChatModel
+
+
+def variants(name: str) -> dict:
+    """Inputs that should resolve through each catalog path."""
+    return {
+        "exact": name,
+        "normalized": f"  {name.upper()} ",
+        "fuzzy": name[:-1] if len(name) > 6 else name + "s",
+    }
+
+
+async def main(args):
+    index = CatalogIndex.from_csv(config.CATALOG_CSV_PATH)
+    service = RagFlowService(
+        resolution_cache=ResolutionCache(maxsize=4096),
+        catalog_index=index,
+        selection_cache=SelectionCache(maxsize=0),
+    )
+    service.rag_client = FakeRagClient(latency=args.rag_latency)
+    service.llm = FakeChatModel(latency=args.llm_latency)
+
+    timings = defaultdict(list)
+    for name in index.names:
+        for _, text in variants(name).items():
+            start = time.perf_counter()
+            _, path = await service.resolve_item(text)
+            timings[path].append(time.perf_counter() - start)
+
+    # unknown names go through RagFlow + LLM once, then hit the resolution cache
+    unknown = [f"unknown item {i}" for i in range(args.unknown)]
+    for _ in range(2):
+        for text in unknown:
+            start = time.perf_counter()
+            _, path = await service.resolve_item(text)
+            timings[path].append(time.perf_counter() - start)
+
+    print(f"catalog={len(index)} names, rag={args.rag_latency}s llm={args.llm_latency}s")
+    print(f"{'path':<11} {'count':>6} {'p50 (ms)':>10} {'max (ms)':>10}")
+    for path in ("exact", "normalized", "fuzzy", "cache", "llm"):
+        samples = timings.get(path)
+        if not samples:
+            continue
+        print(f"{path:<11} {len(samples):>6} {statistics.median(samples) * 1000:>10.3f} {max(samples) * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rag-latency", type=float, default=0.3)
+    parser.add_argument("--llm-latency", type=float, default=0.8)
+    parser.add_argument("--unknown", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,162 @@
+"""
+LLM selection cache check with fake RagFlow / LLM / DB backends.
+
+Runs the same request twice with the resolution cache disabled, so the second run gets
+the same candidate lists back from retrieval and has to be answered by the selection
+cache: no chat completions, and the response reports the calls avoided and the latency
+saved. Then, with the resolution cache on, spelling variants of the items (case, spacing,
+punctuation) that retrieve the same candidates in another order: the resolution cache
+misses on them and the selection cache has to answer. Then checks the cache survives a restart through its SQLite file, stays within
+maxsize, and misses once the prompt / model fingerprint changes.
+
+    python -m benchmarks.selection_cache_check --items 50 --llm-latency 0.3
+
+Exits 1 if a check fails.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from unittest import mock
+
+from app.pipeline import demand_forecast_pipeline
+from app.pipeline.demand_forecast_pipeline import DemandForecastPipeline
+from app.services.ragflow_service import RagFlowService
+from app.services.resolution_cache import ResolutionCache
+from app.services.selection_cache import SelectionCache, selection_fingerprint
+from app.services.catalog_index import CatalogIndex
+from app.core.text import compact_item_name
+from benchmarks.fakes import FakeRagClient, FakeChatModel, FakeForecastDB
+
+
+class CloseCandidatesRagClient(FakeRagClient):
+    """Several equally similar candidates, so the pruner cannot shortcut the LLM."""
+
+    async def retrieve(self, dataset_ids, question, top_k=5, **kwargs):
+        await super().retrieve(dataset_ids, question, top_k)
+        return [{"content": f"categorylv5:{question} {variant}", "similarity": 0.9} for variant in ("a", "b", "c")]
+
+
+class VariantRagClient(FakeRagClient):
+    """Candidates depend on the compact query only and come back in a per-spelling order."""
+
+    async def retrieve(self, dataset_ids, question, top_k=5, **kwargs):
+        await super().retrieve(dataset_ids, question, top_k)
+        base = compact_item_name(question)
+        chunks = [{"content": f"categorylv5:{base} {variant}", "similarity": 0.9} for variant in ("a", "b", "c")]
+        random.Random(question).shuffle(chunks)
+        return chunks
+
+
+def spelling_variant(name: str) -> str:
+    return name.title().replace(" ", "-", 1)
+
+
+def build_pipeline(args, selection_cache: SelectionCache, resolution_cache=None, rag_client=None) -> DemandForecastPipeline:
+    service = RagFlowService(
+        resolution_cache=resolution_cache or ResolutionCache(maxsize=0),
+        catalog_index=CatalogIndex([]),
+        llm_batch_size=1,
+        selection_cache=selection_cache,
+    )
+    service.rag_client = rag_client or CloseCandidatesRagClient(latency=args.rag_latency)
+    service.llm = FakeChatModel(latency=args.llm_latency)
+    return DemandForecastPipeline(rag_service=service, concurrency=args.concurrency)
+
+
+async def timed_run(pipeline: DemandForecastPipeline, items: list):
+    start = time.perf_counter()
+    result = await pipeline.run(items)
+    return result, time.perf_counter() - start
+
+
+async def main(args) -> int:
+    failures = []
+    items = [f"selection item {i}" for i in range(args.items)]
+    fingerprint = selection_fingerprint("prompt", "model", 0.0)
+    path = os.path.join(tempfile.mkdtemp(prefix="selection-cache-"), "selections.sqlite")
+
+    with mock.patch.object(demand_forecast_pipeline, "aget_demand_forecasts", FakeForecastDB(0.0).aget_demand_forecasts):
+        cache = SelectionCache(maxsize=args.items * 2, path=path, fingerprint=fingerprint)
+        pipeline = build_pipeline(args, cache)
+        llm = pipeline.rag_service.llm
+
+        cold, cold_s = await timed_run(pipeline, items)
+        cold_calls = llm.calls
+        warm, warm_s = await timed_run(pipeline, items)
+        paths = {r["resolved_by"] for r in warm["results"]}
+        print(f"cold: {cold_s * 1000:7.1f} ms  llm calls={cold_calls}  avoided={cold['llm_calls_avoided']}")
+        print(f"warm: {warm_s * 1000:7.1f} ms  llm calls={llm.calls - cold_calls}  avoided={warm['llm_calls_avoided']}  "
+              f"saved={warm['llm_latency_saved_ms']:.0f} ms  paths={sorted(paths)}")
+        if cold_calls != args.items or cold["llm_calls_avoided"]:
+            failures.append(f"cold run: {cold_calls} LLM calls, {cold['llm_calls_avoided']} avoided")
+        if llm.calls != cold_calls or warm["llm_calls_avoided"] != args.items or paths != {"llm_cache"}:
+            failures.append(f"warm run still called the LLM ({llm.calls - cold_calls} calls, paths {sorted(paths)})")
+        if warm["llm_latency_saved_ms"] < args.items * args.llm_latency * 1000 * 0.9:
+            failures.append(f"latency saved {warm['llm_latency_saved_ms']:.0f} ms is below the LLM time of the cold run")
+        if [r["selected_item"] for r in warm["results"]] != [r["selected_item"] for r in cold["results"]]:
+            failures.append("cached selections differ from the LLM answers")
+        cache.close()
+
+        # spelling variants: new input names for the resolution cache, same query and candidates
+        resolutions = ResolutionCache(maxsize=args.items * 4)
+        variants = [spelling_variant(name) for name in items]
+        variant_cache = SelectionCache(maxsize=args.items * 2, fingerprint=fingerprint)
+        pipeline = build_pipeline(args, variant_cache, resolutions, VariantRagClient(latency=args.rag_latency))
+        await timed_run(pipeline, items)
+        result, _ = await timed_run(pipeline, variants)
+        paths = [r["resolved_by"] for r in result["results"]]
+        print(f"variants (e.g. {variants[0]!r}): resolution cache hits {paths.count('cache')}/{len(variants)}, "
+              f"selection cache hits {paths.count('llm_cache')}/{len(variants)}, "
+              f"llm calls {pipeline.rag_service.llm.calls - args.items}")
+        if paths.count("llm_cache") != len(variants) or pipeline.rag_service.llm.calls != args.items:
+            failures.append(f"spelling variants were not answered by the selection cache (paths {sorted(set(paths))})")
+
+        # restart: a new cache on the same file answers from disk
+        restarted = SelectionCache(maxsize=args.items * 2, path=path, fingerprint=fingerprint)
+        pipeline = build_pipeline(args, restarted)
+        result, _ = await timed_run(pipeline, items)
+        print(f"restart: avoided={result['llm_calls_avoided']}  llm calls={pipeline.rag_service.llm.calls}")
+        if result["llm_calls_avoided"] != args.items or pipeline.rag_service.llm.calls:
+            failures.append("selections were not reused from the SQLite file after a restart")
+
+        # new prompt / model settings: nothing is reused
+        restarted.fingerprint = selection_fingerprint("prompt v2", "model", 0.0)
+        result, _ = await timed_run(pipeline, items)
+        print(f"new fingerprint: avoided={result['llm_calls_avoided']}  llm calls={pipeline.rag_service.llm.calls}")
+        if result["llm_calls_avoided"] or pipeline.rag_service.llm.calls != args.items:
+            failures.append("selections were reused after the prompt fingerprint changed")
+        restarted.close()
+
+        # batching on / off and the batch prompt are part of the fingerprint too
+        variants = {
+            "batch off": fingerprint,
+            "batch on": selection_fingerprint("prompt", "model", 0.0, "batch prompt"),
+            "batch prompt v2": selection_fingerprint("prompt", "model", 0.0, "batch prompt v2"),
+        }
+        if len(set(variants.values())) != len(variants):
+            failures.append(f"batch mode / batch prompt do not change the fingerprint ({sorted(variants)})")
+
+        # size bound
+        small = SelectionCache(maxsize=args.items // 2, fingerprint=fingerprint)
+        for i in range(args.items * 3):
+            small.set(small.key(f"item {i}", "candidates"), f"item {i}", 0.1)
+        print(f"bounded: {small.stats()['size']} entries for maxsize={small.maxsize}")
+        if small.stats()["size"] > small.maxsize:
+            failures.append("selection cache grew beyond maxsize")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rag-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,88 @@
+"""
+Requests/sec of POST /pipeline/run with a new pipeline per request (old behaviour)
+vs the lifespan-managed shared pipeline, against local RagFlow / OpenAI stub servers.
+The DB lookup is replaced by an in-process fake; resolution cache and catalog
+pre-match are disabled so every request goes through RagFlow + LLM.
+
+    python -m benchmarks.shared_pipeline_rps --clients 20 --duration 10
+"""
+import os
+import time
+import asyncio
+import argparse
+import itertools
+from unittest import mock
+
+import httpx
+
+from benchmarks.stub_servers import StubServer, ragflow_stub_app, openai_stub_app
+
+
+async def load(url: str, clients: int, duration: float, items_per_request: int) -> dict:
+    counter = itertools.count()
+    done, errors = 0, 0
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal done, errors
+        while time.perf_counter() < deadline:
+            items = [f"bench item {next(counter)}" for _ in range(items_per_request)]
+            response = await client.post(f"{url}/pipeline/run", json={"input_data": items})
+            if response.status_code == 200:
+                done += 1
+            else:
+                errors += 1
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    return {"requests": done, "errors": errors, "rps": done / elapsed}
+
+
+def main(args):
+    with StubServer(ragflow_stub_app(latency=args.rag_latency)) as rag, \
+            StubServer(openai_stub_app(latency=args.llm_latency)) as llm:
+        os.environ.update({
+            "RAGFLOW_URL": rag.url,
+            "MODEL_URL": f"{llm.url}/v1",
+            "MODEL_API_KEY": "stub",
+            "RESOLUTION_CACHE_SIZE": "0",
+            "CATALOG_SOURCE": "none",
+        })
+        from app.main import app
+        from app.fastapi.routers import get_pipeline
+        from app.pipeline import demand_forecast_pipeline
+        from app.pipeline.demand_forecast_pipeline import DemandForecastPipeline
+        from app.services import db_service
+        from benchmarks.fakes import FakeForecastDB
+
+        fake_db = FakeForecastDB(latency=args.db_latency)
+        with mock.patch.object(demand_forecast_pipeline, "aget_demand_forecasts", fake_db.aget_demand_forecasts), \
+                mock.patch.object(db_service, "init_pool"):
+            results = {}
+            for mode in ("per-request", "shared"):
+                if mode == "per-request":
+                    app.dependency_overrides[get_pipeline] = lambda: DemandForecastPipeline()
+                else:
+                    app.dependency_overrides.clear()
+                with StubServer(app) as api:
+                    asyncio.run(load(api.url, args.clients, args.warmup, args.items))
+                    results[mode] = asyncio.run(load(api.url, args.clients, args.duration, args.items))
+
+    print(f"clients={args.clients} items/request={args.items} rag={args.rag_latency}s llm={args.llm_latency}s")
+    for mode, res in results.items():
+        print(f"{mode:<12} {res['rps']:>8.1f} req/s  ({res['requests']} ok, {res['errors']} errors)")
+    print(f"speedup: {results['shared']['rps'] / results['per-request']['rps']:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--items", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--rag-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    main(parser.parse_args())
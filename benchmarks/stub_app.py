@@ -0,0 +1,18 @@
+"""
+ASGI entry point serving the real app against the load-test stubs from separate worker
+processes: forecast lookups read the SQLite stand-in at STUB_FORECAST_DB instead of Postgres.
+
+    STUB_FORECAST_DB=/tmp/forecast.sqlite RAGFLOW_URL=... MODEL_URL=... \
+        gunicorn -c gunicorn.conf.py benchmarks.stub_app:app
+"""
+import os
+
+from app.pipeline import demand_forecast_pipeline
+from app.services import db_service
+from benchmarks.stub_db import SqliteForecastDB
+
+_db = SqliteForecastDB(path=os.environ["STUB_FORECAST_DB"], latency=float(os.getenv("STUB_DB_LATENCY", 0.002)))
+demand_forecast_pipeline.aget_demand_forecasts = _db.aget_demand_forecasts
+db_service.init_pool = lambda *args, **kwargs: None
+
+from app.main import app  # noqa: E402
@@ -0,0 +1,144 @@
+"""
+Forecast database stand-ins for the load tests:
+
+- SqliteForecastDB: a SQLite copy of the forecast history + latest-forecast snapshot
+  tables, queried on a worker pool sized like the Postgres pool. Drop-in for
+  db_service.aget_demand_forecasts, so real SQL runs per lookup without a Postgres server.
+- seed_postgres: fills a throwaway Postgres (PG_* env vars) with the same synthetic
+  history and builds the snapshot, for runs against the real db_service code path.
+
+    db = SqliteForecastDB(latency=0.002)
+    db.seed(names)
+    with mock.patch.object(demand_forecast_pipeline, "aget_demand_forecasts", db.aget_demand_forecasts):
+        ...
+"""
+import os
+import time
+import random
+import asyncio
+import sqlite3
+import tempfile
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# SQLite's default limit on bound parameters per statement
+_MAX_PARAMS = 900
+
+
+def forecast_rows(names: Iterable[str], days: int = 3, seed: int = 7) -> Iterator[Tuple[str, str, int]]:
+    """(forecast_date, categorylv5, demand_forecast) history rows, `days` forecast batches per name."""
+    rng = random.Random(seed)
+    latest = date(2025, 1, 1)
+    for name in names:
+        for d in range(days):
+            yield (latest - timedelta(days=30 * d)).isoformat(), name, rng.randint(0, 500)
+
+
+class SqliteForecastDB:
+    """SQLite stand-in for the forecast tables with one connection per worker thread."""
+
+    def __init__(self, path: Optional[str] = None, latency: float = 0.0, workers: int = 10):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="forecast-", suffix=".sqlite")
+            os.close(fd)
+            self._owned = True
+        else:
+            self._owned = False
+        self.path = path
+        self.latency = latency
+        self.calls = 0
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="sqlite")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def seed(self, names: Iterable[str], days: int = 3) -> int:
+        """Load the synthetic history and rebuild the latest-forecast snapshot; returns the snapshot size."""
+        conn = sqlite3.connect(self.path)
+        try:
+            conn.executescript("""
+                DROP TABLE IF EXISTS demand_forecast;
+                DROP TABLE IF EXISTS demand_forecast_latest;
+                CREATE TABLE demand_forecast (forecast_date TEXT, categorylv5 TEXT, demand_forecast INTEGER);
+                CREATE INDEX demand_forecast_category_date ON demand_forecast (categorylv5, forecast_date DESC);
+                CREATE TABLE demand_forecast_latest (
+                    categorylv5 TEXT PRIMARY KEY, forecast_date TEXT, demand_forecast INTEGER
+                );
+            """)
+            conn.executemany("INSERT INTO demand_forecast VALUES (?, ?, ?)", forecast_rows(names, days))
+            conn.execute("""
+                INSERT INTO demand_forecast_latest (categorylv5, forecast_date, demand_forecast)
+                SELECT categorylv5, forecast_date, demand_forecast FROM (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY categorylv5 ORDER BY forecast_date DESC) AS rn
+                    FROM demand_forecast WHERE categorylv5 IS NOT NULL
+                ) WHERE rn = 1
+            """)
+            conn.commit()
+            return conn.execute("SELECT COUNT(*) FROM demand_forecast_latest").fetchone()[0]
+        finally:
+            conn.close()
+
+    def get_demand_forecasts(self, item_names: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Same contract as db_service.get_demand_forecasts (snapshot read, None when not found)."""
+        names = list(dict.fromkeys(n for n in item_names if n))
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        results: Dict[str, Optional[Dict[str, Any]]] = {name: None for name in names}
+        conn = self._conn()
+        for i in range(0, len(names), _MAX_PARAMS):
+            chunk = names[i:i + _MAX_PARAMS]
+            rows = conn.execute(
+                "SELECT forecast_date, categorylv5, demand_forecast FROM demand_forecast_latest "
+                f"WHERE categorylv5 IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for row in rows:
+                results[row["categorylv5"]] = dict(row)
+        return results
+
+    async def aget_demand_forecasts(self, item_names: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.get_demand_forecasts, item_names)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self._owned and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def seed_postgres(names: Iterable[str], days: int = 3) -> Dict[str, Any]:
+    """
+    Replace the forecast history in the configured (throwaway!) Postgres with synthetic
+    rows and rebuild the snapshot table. Never point this at a shared database.
+    """
+    from psycopg2.extras import execute_values
+    from app.services import db_service
+    from app.services.forecast_snapshot import refresh_snapshot
+
+    db_service.init_pool()
+    schema = db_service.FORECAST_TABLE.split(".")[0]
+    with db_service.pg_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+            cur.execute(f"""
+                CREATE TABLE IF NOT EXISTS {db_service.FORECAST_TABLE} (
+                    forecast_date DATE, categorylv5 TEXT, demand_forecast NUMERIC
+                )
+            """)
+            cur.execute(f"TRUNCATE {db_service.FORECAST_TABLE}")
+            execute_values(
+                cur,
+                f"INSERT INTO {db_service.FORECAST_TABLE} (forecast_date, categorylv5, demand_forecast) VALUES %s",
+                forecast_rows(names, days),
+                page_size=5000,
+            )
+    return refresh_snapshot(full=True)
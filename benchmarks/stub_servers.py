@@ -0,0 +1,138 @@
+"""
+Local stub HTTP servers for the RagFlow retrieval API and an OpenAI-compatible
+chat completions API, with configurable latency and error rate. Each server runs
+uvicorn in a background thread:
+
+    with StubServer(ragflow_stub_app(latency=0.2)) as rag, StubServer(openai_stub_app()) as llm:
+        os.environ["RAGFLOW_URL"] = rag.url
+        os.environ["MODEL_URL"] = llm.url + "/v1"
+"""
+import re
+import json
+import time
+import socket
+import random
+import asyncio
+import threading
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _sleep_unless_disconnected(request: Request, latency: float) -> bool:
+    """Simulate work; returns False as soon as the client drops the connection."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + latency
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return True
+        await asyncio.sleep(min(0.01, remaining))
+        if await request.is_disconnected():
+            return False
+
+
+def ragflow_stub_app(latency: float = 0.2, error_rate: float = 0.0, candidates: int = 5) -> Starlette:
+    """
+    POST /api/v1/retrieval -> chunks whose content is "categorylv5:<question> ...".
+    app.state.stats tracks requests, in-flight / max in-flight and client disconnects.
+    """
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "cancelled": 0}
+
+    async def retrieval(request: Request):
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            stats["cancelled"] += 1
+            return JSONResponse({"code": 499, "message": "client disconnected"}, status_code=499)
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            if not await _sleep_unless_disconnected(request, latency):
+                stats["cancelled"] += 1
+                return JSONResponse({"code": 499, "message": "client disconnected"}, status_code=499)
+        finally:
+            stats["in_flight"] -= 1
+        if error_rate and random.random() < error_rate:
+            return JSONResponse({"code": 500, "message": "stub ragflow error"}, status_code=500)
+        question = body.get("question", "")
+        chunks = [
+            {
+                "id": f"chunk-{i}",
+                "content": f"categorylv5:{question}" if i == 0 else f"categorylv5:{question} variant {i}",
+                "dataset_id": (body.get("dataset_ids") or ["stub"])[0],
+                "document_id": "doc",
+                "similarity": round(0.95 - i * 0.1, 3),
+                "vector_similarity": round(0.95 - i * 0.1, 3),
+                "term_similarity": round(0.95 - i * 0.1, 3),
+            }
+            for i in range(candidates)
+        ]
+        return JSONResponse({"code": 0, "data": {"chunks": chunks, "total": len(chunks)}})
+
+    app = Starlette(routes=[Route("/api/v1/retrieval", retrieval, methods=["POST"])])
+    app.state.stats = stats
+    return app
+
+
+def openai_stub_app(latency: float = 0.3, error_rate: float = 0.0) -> Starlette:
+    """
+    POST /v1/chat/completions -> answers with the "User Input Item" of the last message,
+    or a JSON mapping for batched selection prompts ("### Request N" blocks).
+    """
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency)
+        if error_rate and random.random() < error_rate:
+            return JSONResponse({"error": {"message": "stub llm error", "type": "server_error"}}, status_code=500)
+        text = body["messages"][-1]["content"]
+        names = [name.strip() for name in re.findall(r"User Input Item:\s*(.+)", text)]
+        if "### Request" in text:
+            content = json.dumps({str(i): name for i, name in enumerate(names, start=1)}, ensure_ascii=False)
+        else:
+            content = names[0] if names else "None"
+        prompt_chars = sum(len(m.get("content") or "") for m in body["messages"])
+        return JSONResponse({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": 4, "total_tokens": prompt_chars // 4 + 4},
+        })
+
+    return Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+
+
+class StubServer:
+    """Run an ASGI app with uvicorn on a free local port in a background thread."""
+
+    def __init__(self, app, port: int = None):
+        self.port = port or _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "StubServer":
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"stub server on port {self.port} did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
@@ -0,0 +1,43 @@
+"""
+Production server: gunicorn supervising uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Every worker imports the app after the fork (preload_app stays off), so each one opens its
+own Postgres pool and RagFlow / LLM HTTP clients in the FastAPI lifespan and closes them on
+shutdown; no socket is inherited from the master. Size PG_POOL_MAX so that
+WEB_CONCURRENCY * PG_POOL_MAX stays below the database's connection limit.
+
+Item resolutions, LLM selections and forecasts are shared between the workers through
+SQLite files under CACHE_DIR (RESOLUTION_CACHE_PATH / SELECTION_CACHE_PATH /
+FORECAST_CACHE_PATH, set them to "" to disable). When one worker sees a new forecast batch and
+clears the forecast cache, the others drop their in-memory forecasts on their next lookup.
+"""
+import os
+import multiprocessing
+
+from dotenv import load_dotenv
+
+# .env first, so values set there win over the defaults below
+load_dotenv()
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = False
+
+# a worker silent for longer than this is restarted; keep it above ITEM_TIMEOUT
+timeout = int(os.getenv("WORKER_TIMEOUT", 120))
+# time for in-flight requests to finish and the lifespan to close the pools on shutdown
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+max_requests = int(os.getenv("MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 0))
+
+accesslog = os.getenv("ACCESS_LOG", "-") or None
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+cache_dir = os.getenv("CACHE_DIR", "/tmp/demand-forecast-cache")
+os.environ.setdefault("RESOLUTION_CACHE_PATH", os.path.join(cache_dir, "resolutions.sqlite"))
+os.environ.setdefault("SELECTION_CACHE_PATH", os.path.join(cache_dir, "selections.sqlite"))
+os.environ.setdefault("FORECAST_CACHE_PATH", os.path.join(cache_dir, "forecasts.sqlite"))
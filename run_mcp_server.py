@@ -1,9 +1,16 @@
+import sys
+
 if __name__ == "__main__":
-    from app.mcp_server import mcp
-    
-    print("Starting Demand Forecast MCP Server...")
-    print("Available tools:")
-    print("  - get_demand_forecast: Get forecast for item(s) as string or list")
-    print("\nServer is running...")
+    from app.mcp_server import mcp, start_warmup, start_catalog_reloader
+
+    # stdout carries the stdio MCP protocol, so the banner goes to stderr
+    print("Starting Demand Forecast MCP Server...", file=sys.stderr)
+    print("Available tools:", file=sys.stderr)
+    print("  - get_demand_forecast: Get forecast for item(s) as string or list", file=sys.stderr)
+    print("  - stream_demand_forecast: Same, reporting progress as each item finishes", file=sys.stderr)
+    print("  - get_forecast_history: Forecast series of item(s) over a date range", file=sys.stderr)
+    print("\nServer is running...", file=sys.stderr)
     
+    start_warmup()
+    start_catalog_reloader()
     mcp.run()